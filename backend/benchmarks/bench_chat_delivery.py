@@ -0,0 +1,118 @@
+"""Chat delivery: database reads per delivered message, polling vs. /ws/chat push.
+
+    python -m backend.benchmarks.bench_chat_delivery --poll-seconds 1 3 10 --message-seconds 30
+
+Runs the app in-process (TestClient) and counts MongoDB calls. It measures:
+- an empty poll and a poll that returns a new message, both
+  GET /messages/chat/{id}?after=<cursor>
+- the extra calls POST /messages/send makes when the receiver has a
+  socket open on /ws/chat
+
+Reads per delivered message are then derived for a chat that gets a
+message every --message-seconds while the client polls every
+--poll-seconds. Use --uri to run against a real MongoDB.
+"""
+import argparse
+import time
+
+from backend.benchmarks.common import RoundTrips, add_database_args, init_database, print_table, use_database
+
+READS = ("find_one", "find", "aggregate", "count_documents", "find_one_and_update")
+
+
+def _split(trips: RoundTrips):
+    reads = sum(n for (name, method), n in trips.calls.items() if method in READS)
+    return reads, sum(trips.calls.values()) - reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--poll-seconds", type=float, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--message-seconds", type=float, default=30)
+    parser.add_argument("--samples", type=int, default=20)
+    add_database_args(parser)
+    args = parser.parse_args()
+    use_database(args.uri)
+
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.models import DOCUMENT_MODELS, Match, User, match_pair_key
+    from backend.routers.users import create_access_token
+    from backend.services.chat_summary import rebuild_chat_summaries
+
+    async def seed():
+        await init_database()
+        ann = await User(username="ann", email="ann@example.com", password="x").insert()
+        bob = await User(username="bob", email="bob@example.com", password="x").insert()
+        match = await Match(user1_id=str(ann.id), user2_id=str(bob.id), pair_key=match_pair_key(str(ann.id), str(bob.id))).insert()
+        await rebuild_chat_summaries()
+        return str(match.id), create_access_token({"sub": str(ann.id)}), create_access_token({"sub": str(bob.id)})
+
+    with TestClient(app) as client:
+        match_id, ann_token, bob_token = client.portal.call(seed)
+        ann = {"Authorization": f"Bearer {ann_token}"}
+        bob = {"Authorization": f"Bearer {bob_token}"}
+        url = f"/messages/chat/{match_id}"
+        trips = RoundTrips(by_method=True).watch(*DOCUMENT_MODELS)
+
+        def send(text):
+            response = client.post("/messages/send", json={"match_id": match_id, "content": text}, headers=ann)
+            assert response.status_code == 200, response.text
+
+        # Warm the auth caches so neither path pays for token lookups
+        send("hello")
+        cursor = client.get(url, headers=bob).headers["X-After-Cursor"]
+
+        empty, hit, send_plain, send_push = [], [], [], []
+        push_ms = []
+        for i in range(args.samples):
+            trips.reset()
+            response = client.get(url, params={"after": cursor}, headers=bob)
+            assert response.json() == []
+            empty.append(_split(trips))
+
+            send(f"polled {i}")
+            trips.reset()
+            response = client.get(url, params={"after": cursor}, headers=bob)
+            assert [m["content"] for m in response.json()] == [f"polled {i}"]
+            cursor = response.headers["X-After-Cursor"]
+            hit.append(_split(trips))
+
+            trips.reset()
+            send(f"unseen {i}")
+            send_plain.append(_split(trips))
+            cursor = client.get(url, params={"after": cursor}, headers=bob).headers["X-After-Cursor"]
+
+        with client.websocket_connect(f"/ws/chat?token={bob_token}") as ws:
+            for i in range(args.samples):
+                trips.reset()
+                started = time.perf_counter()
+                send(f"pushed {i}")
+                event = ws.receive_json()
+                while event["type"] != "message":  # notification pushes share the socket
+                    event = ws.receive_json()
+                push_ms.append((time.perf_counter() - started) * 1000)
+                send_push.append(_split(trips))
+                assert event["type"] == "message" and event["message"]["content"] == f"pushed {i}", event
+                cursor = client.get(url, params={"after": cursor}, headers=bob).headers["X-After-Cursor"]
+
+    def mean(samples, index):
+        return sum(s[index] for s in samples) / len(samples)
+
+    empty_reads, hit_reads = mean(empty, 0), mean(hit, 0)
+    push_reads = mean(send_push, 0) - mean(send_plain, 0)
+    print(f"empty poll: {empty_reads:.1f} reads, {mean(empty, 1):.1f} writes | "
+          f"poll with a message: {hit_reads:.1f} reads, {mean(hit, 1):.1f} writes | "
+          f"push: {push_reads:+.1f} reads on send, {sum(push_ms) / len(push_ms):.1f} ms send-to-socket")
+
+    rows = []
+    for poll in args.poll_seconds:
+        polls = max(1.0, args.message_seconds / poll)
+        polling = (polls - 1) * empty_reads + hit_reads
+        rows.append((poll, args.message_seconds, polls, polling, poll / 2 * 1000, push_reads))
+    print_table(("poll every s", "message every s", "polls/message", "poll reads/message",
+                 "poll avg delay ms", "push reads/message"), rows)
+
+
+if __name__ == "__main__":
+    main()
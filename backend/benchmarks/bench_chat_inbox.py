@@ -0,0 +1,98 @@
+"""GET /messages/chats: per-match queries (3N+1) vs. the single inbox aggregation.
+
+    python -m backend.benchmarks.bench_chat_inbox --matches 10 100 1000 [--uri mongodb://localhost:27017]
+
+The inbox pipeline uses $lookup with ``let``, which mongomock does not
+implement: without --uri only the old path is measured.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.benchmarks.common import (
+    RoundTrips, add_database_args, init_database, print_table, time_async, use_database,
+)
+
+MESSAGES_PER_MATCH = 3
+
+
+async def seed(matches: int) -> str:
+    from backend.models import Match, Message, User, match_pair_key
+    from backend.services.chat_summary import rebuild_chat_summaries
+
+    await init_database()
+    me = await User.get_motor_collection().insert_one({"username": "me", "email": "me@example.com", "email_key": "me@example.com", "password": "x"})
+    me_id = str(me.inserted_id)
+    others = await User.get_motor_collection().insert_many([
+        {"username": f"user{i}", "email": f"user{i}@example.com", "email_key": f"user{i}@example.com", "password": "x"} for i in range(matches)
+    ])
+    started = datetime.utcnow() - timedelta(days=1)
+    match_docs = [
+        {"user1_id": me_id, "user2_id": str(other), "matched_at": started, "pair_key": match_pair_key(me_id, str(other))}
+        for other in others.inserted_ids
+    ]
+    result = await Match.get_motor_collection().insert_many(match_docs)
+    messages = []
+    for match_id, doc in zip(result.inserted_ids, match_docs):
+        for n in range(MESSAGES_PER_MATCH):
+            sender, receiver = (doc["user2_id"], me_id) if n % 2 == 0 else (me_id, doc["user2_id"])
+            messages.append({
+                "match_id": str(match_id), "sender_id": sender, "receiver_id": receiver,
+                "content": f"message {n}", "sent_at": started + timedelta(minutes=n), "is_read": n < 2,
+            })
+    await Message.get_motor_collection().insert_many(messages)
+    await rebuild_chat_summaries()
+    return me_id
+
+
+async def legacy_inbox(user_id: str) -> list:
+    """The original get_user_chats loop: a user, last-message and unread query per match."""
+    from backend.models import Match, Message, User
+
+    rows = []
+    for match in await Match.find({"$or": [{"user1_id": user_id}, {"user2_id": user_id}]}).to_list():
+        other_id = match.user2_id if match.user1_id == user_id else match.user1_id
+        other = await User.get(other_id)
+        if not other:
+            continue
+        last = await Message.find({"match_id": str(match.id)}).sort(-Message.sent_at).limit(1).to_list()
+        unread = await Message.find({"match_id": str(match.id), "receiver_id": user_id, "is_read": False}).count()
+        rows.append((other.username, last[0].content if last else None, unread))
+    return rows
+
+
+async def main(args) -> None:
+    from backend.models import Chat, Match, Message, User
+    from backend.services.chat_inbox import fetch_inbox
+
+    rows = []
+    for matches in args.matches:
+        me_id = await seed(matches)
+        trips = RoundTrips().watch(Chat, Match, Message, User)
+
+        await legacy_inbox(me_id)
+        legacy_trips = trips.total
+        legacy_ms = await time_async(lambda: legacy_inbox(me_id), args.repeat)
+
+        trips.reset()
+        try:
+            inbox = await fetch_inbox(me_id)
+        except NotImplementedError:
+            rows.append((matches, legacy_trips, legacy_ms, "n/a", "n/a"))
+            continue
+        assert len(inbox) == matches
+        inbox_trips = trips.total
+        inbox_ms = await time_async(lambda: fetch_inbox(me_id), args.repeat)
+        rows.append((matches, legacy_trips, legacy_ms, inbox_trips, inbox_ms))
+
+    print_table(("matches", "per-match queries", "ms", "inbox queries", "ms"), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    add_database_args(parser)
+    args = parser.parse_args()
+    use_database(args.uri)
+    asyncio.run(main(args))
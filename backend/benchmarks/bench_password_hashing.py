@@ -0,0 +1,72 @@
+"""Event-loop latency under concurrent logins: hashing on the loop vs. the passwords pool.
+
+    python -m backend.benchmarks.bench_password_hashing --logins 100
+
+Each mode verifies --logins passwords concurrently while a heartbeat task
+sleeps --tick ms at a time and records how late it wakes up. That lateness
+is what every other request on the worker waits. Hashes use the app's
+CryptContext (argon2 by default); no database is involved.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from backend.benchmarks.common import print_table, use_database
+
+use_database()  # passwords imports backend.config, which builds a Motor client
+
+from backend.services import passwords  # noqa: E402
+
+
+async def _heartbeat(tick: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+async def _on_loop(password, hashed):
+    # The pre-pool login: verify inline, blocking the event loop
+    return passwords.verify_password(password, hashed)
+
+
+async def run(mode, logins: int, tick: float, hashed: str):
+    verify = _on_loop if mode == "on loop" else passwords.verify_password_async
+    lags, stop = [], asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(tick, lags, stop))
+    await asyncio.sleep(tick * 2)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify("correct horse", hashed) for _ in range(logins)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+    assert all(results)
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    return (mode, logins, wall, logins / wall, len(lags),
+            statistics.median(lags) if lags else 0.0, p99, lags[-1] if lags else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--tick", type=float, default=10.0, help="heartbeat interval in ms")
+    args = parser.parse_args()
+
+    hashed = passwords.hash_password("correct horse")
+    rows = [asyncio.run(run(mode, args.logins, args.tick / 1000, hashed)) for mode in ("on loop", "pool")]
+    passwords.shutdown()
+
+    print(f"executor={passwords.PASSWORD_HASH_EXECUTOR} workers={passwords.PASSWORD_HASH_WORKERS} "
+          f"concurrency={passwords.PASSWORD_HASH_CONCURRENCY}")
+    print_table(
+        ("mode", "logins", "wall s", "logins/s", "heartbeats", "lag p50 ms", "lag p99 ms", "lag max ms"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
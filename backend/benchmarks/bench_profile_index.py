@@ -0,0 +1,54 @@
+"""Candidate scoring: full scan with compatibility_score vs. the inverted ProfileIndex.
+
+    python -m backend.benchmarks.bench_profile_index --sizes 10000 100000 1000000
+
+Pure in-process: profiles are synthetic dicts, no database involved.
+"""
+import argparse
+import time
+
+from backend.benchmarks.common import print_table, synthetic_profiles, time_call
+from backend.services.matching import SCORE_WEIGHTS, compatibility_score
+from backend.services.profile_index import ProfileIndex
+
+
+class Profile:
+    """Attribute access, like the User documents compatibility_score gets."""
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+
+
+def full_scan(user, profiles):
+    """The pre-index path: score every user, keep the positive ones, sort."""
+    scored = [(str(i), compatibility_score(user, other)) for i, other in enumerate(profiles)]
+    return sorted([t for t in scored if t[1] > 0], key=lambda t: (-t[1], t[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        raw = synthetic_profiles(size)
+        profiles = [Profile(p) for p in raw]
+        started = time.perf_counter()
+        index = ProfileIndex(SCORE_WEIGHTS)
+        for i, profile in enumerate(raw):
+            index.upsert(str(i), profile)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        user = profiles[0]
+        assert index.ranked(user) == full_scan(user, profiles), "index and full scan disagree"
+        scan_ms = time_call(lambda: full_scan(user, profiles), args.queries)
+        index_ms = time_call(lambda: index.ranked(user), args.queries)
+        rows.append((size, build_ms, scan_ms, index_ms, scan_ms / index_ms))
+
+    print_table(("users", "index build ms", "full scan ms/query", "index ms/query", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Study room fan-out: sequential awaited sends vs. QueuedWebSocket.
+
+    python -m backend.benchmarks.bench_room_fanout --clients 500 --messages 20
+
+A room of --clients fake sockets, where --slow of them take --slow-ms per
+send, one stalls for --stall-s and one raises on every send. "sequential" is
+the pre-queue broadcast: json.dumps per socket and ``await send_text`` one
+socket after the other, so a raising socket aborts the rest of that
+broadcast. "queued" serializes once and calls QueuedWebSocket.send.
+
+Reported: how long each broadcast call holds the room (p50/max), how long
+until every healthy socket has every message, and how many healthy
+deliveries were lost. No database is involved.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from backend.benchmarks.common import print_table, use_database
+
+use_database()  # ws_connection imports backend.config, which builds a Motor client
+
+from backend.services.fast_json import dumps_text  # noqa: E402
+from backend.services.ws_connection import QueuedWebSocket  # noqa: E402
+
+
+class FakeSocket:
+    def __init__(self, delay: float = 0.0, fails: bool = False):
+        self.delay = delay
+        self.fails = fails
+        self.received = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.delay == 0.0 and not self.fails
+
+    async def send_text(self, text: str) -> None:
+        if self.fails:
+            raise ConnectionResetError("client went away")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)  # one write to the transport
+        self.received += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _room(args):
+    sockets = [FakeSocket() for _ in range(args.clients)]
+    for i in range(args.slow):
+        sockets[1 + 2 * i].delay = args.slow_ms / 1000  # spread through the room
+    sockets[len(sockets) // 2].delay = args.stall_s
+    sockets[len(sockets) // 3].fails = True
+    return sockets
+
+
+def _message(i: int) -> dict:
+    return {"type": "chat_message", "seq": i, "username": "ann", "message": f"message {i}",
+            "timestamp": "2024-05-01T12:00:00"}
+
+
+async def sequential(args):
+    sockets = _room(args)
+    holds = []
+    started = time.perf_counter()
+    for i in range(args.messages):
+        began = time.perf_counter()
+        try:
+            for ws in sockets:
+                await ws.send_text(json.dumps(_message(i)))
+        except Exception:
+            pass  # the old broadcast raised here; later sockets missed the message
+        holds.append((time.perf_counter() - began) * 1000)
+    return holds, time.perf_counter() - started, sockets
+
+
+async def queued(args):
+    sockets = _room(args)
+    conns = []
+    conns += [QueuedWebSocket(ws, maxsize=64, timeout=args.timeout,
+                             on_close=lambda dropped: conns.remove(dropped)) for ws in sockets]
+    holds = []
+    started = time.perf_counter()
+    for i in range(args.messages):
+        began = time.perf_counter()
+        text = dumps_text(_message(i))
+        for conn in list(conns):
+            conn.send(text)
+        holds.append((time.perf_counter() - began) * 1000)
+        await asyncio.sleep(0)  # other work on the loop between chat messages
+    healthy = [ws for ws in sockets if ws.healthy]
+    while any(ws.received < args.messages for ws in healthy):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    for conn in conns:
+        await conn.aclose()
+    return holds, elapsed, sockets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=5)
+    parser.add_argument("--slow-ms", type=float, default=50.0)
+    parser.add_argument("--stall-s", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=0.5, help="QueuedWebSocket send timeout (s)")
+    args = parser.parse_args()
+
+    rows = []
+    for name, run in (("sequential", sequential), ("queued", queued)):
+        holds, elapsed, sockets = asyncio.run(run(args))
+        healthy = [ws for ws in sockets if ws.healthy]
+        lost = sum(args.messages - ws.received for ws in healthy)
+        rows.append((name, args.clients, args.messages, statistics.median(holds), max(holds),
+                     elapsed * 1000, lost, f"{lost / (len(healthy) * args.messages):.1%}"))
+
+    print_table(("mode", "clients", "messages", "hold p50 ms", "hold max ms",
+                 "all delivered ms", "lost", "lost %"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Batch scoring: compatibility_score in a Python loop vs. the NumPy FeatureMatrix.
+
+    python -m backend.benchmarks.bench_scoring --sizes 10000 100000
+
+One-vs-all scores a single profile against everyone (score_one); all pairs
+computes whole rows of the n x n matrix (all_pairs). The Python all-pairs
+path is timed on --pair-rows rows and reported per row. Pure in-process:
+profiles are synthetic dicts, no database involved.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.benchmarks.bench_profile_index import Profile
+from backend.benchmarks.common import print_table, synthetic_profiles, time_call
+from backend.services.matching import compatibility_score
+from backend.services.scoring import FeatureMatrix
+
+
+def python_one(user, profiles):
+    return [compatibility_score(user, other) for other in profiles]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--pair-rows", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        raw = synthetic_profiles(size)
+        profiles = [Profile(p) for p in raw]
+        started = time.perf_counter()
+        matrix = FeatureMatrix([str(i) for i in range(size)], raw)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        user = profiles[0]
+        assert matrix.score_one(raw[0]).tolist() == python_one(user, profiles), "scores disagree"
+        loop_ms = time_call(lambda: python_one(user, profiles), args.queries)
+        numpy_ms = time_call(lambda: matrix.score_one(raw[0]), args.queries)
+
+        pair_rows = min(args.pair_rows, size)
+        started = time.perf_counter()
+        for other in profiles[:pair_rows]:
+            python_one(other, profiles)
+        loop_row_ms = (time.perf_counter() - started) * 1000 / pair_rows
+
+        chunk = max(1, min(1024, 2**26 // size))  # keep each float32 block around 256 MB
+        pairs = matrix.all_pairs(chunk_size=chunk)
+        started = time.perf_counter()
+        start, block = next(pairs)
+        block_row_ms = (time.perf_counter() - started) * 1000 / len(block)
+        assert np.array_equal(block[0], matrix.score_one(raw[0]))
+
+        rows.append((size, build_ms, loop_ms, numpy_ms, loop_ms / numpy_ms,
+                     loop_row_ms, block_row_ms, loop_row_ms / block_row_ms))
+
+    print_table(
+        ("users", "matrix build ms", "loop ms/query", "score_one ms", "speedup",
+         "loop ms/row", "all_pairs ms/row", "speedup"),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Response encoding: FastAPI response_model + stdlib json vs. orjson fast_response.
+
+    python -m backend.benchmarks.bench_serialization --rows 50 200
+
+For three hot bodies the old path is FastAPI's own serialize_response
+(validate against response_model, then encode for JSON) followed by
+JSONResponse rendering with json.dumps. The new path is fast_json's
+fast_response. The bodies are:
+- chat history: MessageResponse models
+- swipe recommendations: dicts
+- the match list: dicts
+A /ws/chat frame compares json.dumps(default=str) with dumps_text.
+Pure in-process, no database.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+from backend.benchmarks.common import print_table, synthetic_profile, time_async, time_call, use_database
+
+use_database()  # the routers import backend.config, which builds a Motor client
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from backend.routers.messages import MessageResponse  # noqa: E402
+from backend.services.fast_json import dumps_text, fast_response  # noqa: E402
+
+
+def chat_history(rows: int, rng: random.Random) -> list:
+    sent = datetime(2024, 5, 1)
+    return [MessageResponse(
+        id=str(ObjectId()), match_id=str(ObjectId()), sender_id=str(ObjectId()), sender_username="ann",
+        receiver_id=str(ObjectId()), content="".join(rng.choice("abcdef gh") for _ in range(rng.randint(5, 200))),
+        sent_at=sent + timedelta(seconds=i), is_read=i % 3 == 0,
+    ) for i in range(rows)]
+
+
+def recommendations(rows: int, rng: random.Random) -> list:
+    cards = []
+    for i in range(rows):
+        profile = synthetic_profile(rng)
+        user_id = str(ObjectId())
+        cards.append({
+            "id": user_id, "_id": user_id, "username": f"user{i}", "email": f"user{i}@example.com",
+            "subjects": profile["subjects"], "availability": profile["availability"],
+            "studyHabits": profile["study_habits"], "interests": profile["interests"],
+            "bio": "hello " * 20, "academicLevel": "undergraduate", "studyLocation": "library",
+            "preferredStudyTime": "evening", "compatibility_score": rng.randint(1, 20),
+        })
+    return cards
+
+
+def matches(rows: int, rng: random.Random) -> list:
+    return [{
+        "id": (match_id := str(ObjectId())), "match_id": match_id, "user_id": str(ObjectId()),
+        "username": f"user{i}", "email": f"user{i}@example.com", "bio": "hello " * 20,
+        "matched_at": (datetime(2024, 5, 1) + timedelta(hours=i)).isoformat(),
+        **{k: v for k, v in synthetic_profile(rng).items() if k in ("subjects", "availability")},
+    } for i in range(rows)]
+
+
+BODIES = (
+    ("chat history", chat_history, List[MessageResponse]),
+    ("recommendations", recommendations, List[dict]),
+    ("matches", matches, List[dict]),
+)
+
+
+async def old_path(field, content) -> bytes:
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def run(args) -> list:
+    rng = random.Random(3)
+    results = []
+    for rows in args.rows:
+        for name, make, response_model in BODIES:
+            content = make(rows, rng)
+            field = create_model_field(name=f"Response_{name}", type_=response_model, mode="serialization")
+            old = await old_path(field, content)
+            new = fast_response(content).body
+            assert json.loads(old) == json.loads(new), f"{name}: bodies differ"
+
+            old_ms = await time_async(lambda: old_path(field, content), args.repeat)
+            new_ms = time_call(lambda: fast_response(content).body, args.repeat)
+            results.append((name, rows, len(old), len(new), old_ms, new_ms, old_ms / new_ms))
+
+        frame = {"type": "message", "message": chat_history(1, rng)[0].model_dump()}
+        old_ms = time_call(lambda: [json.dumps(frame, default=str) for _ in range(rows)], args.repeat)
+        new_ms = time_call(lambda: [dumps_text(frame) for _ in range(rows)], args.repeat)
+        results.append((f"ws frame x{rows}", rows, len(json.dumps(frame, default=str)), len(dumps_text(frame)),
+                        old_ms, new_ms, old_ms / new_ms))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    print_table(("body", "rows", "old bytes", "new bytes", "old ms", "orjson ms", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
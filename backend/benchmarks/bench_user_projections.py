@@ -0,0 +1,97 @@
+"""Loading users: full User documents vs. the projection read models.
+
+    python -m backend.benchmarks.bench_user_projections --users 2000 --batch 100 [--uri mongodb://localhost:27017]
+
+For each read model, a batch of users is loaded by ``_id $in``, as
+UserLoader and the listings do. Three things are measured:
+- BSON bytes returned: what crosses the wire
+- pydantic validation time per document, in-process
+- end-to-end Beanie query time: full User vs ``.project(Model)``
+
+Profiles are synthetic, with an argon2-sized password hash and a 300
+character bio. --extra-bytes adds a legacy field of that size, such as
+an inlined avatar.
+"""
+import argparse
+import asyncio
+import random
+
+import bson
+
+from backend.benchmarks.common import (
+    add_database_args, init_database, print_table, synthetic_profile, time_async, time_call, use_database,
+)
+
+
+def _projection(model) -> dict:
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
+
+
+async def seed(users: int, extra_bytes: int) -> list:
+    from backend.models import User
+
+    await init_database()
+    rng = random.Random(5)
+    docs = []
+    for i in range(users):
+        doc = {
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "email_key": f"user{i}@example.com",
+            "password": "$argon2id$v=19$m=65536,t=3,p=4$" + "x" * 66,
+            "bio": "".join(rng.choice("abcdefghij ") for _ in range(300)),
+            "study_style": "visual",
+            "preferred_study_time": "evening",
+            "study_location": "library",
+            "academic_level": "undergraduate",
+            "goals": ["pass finals", "learn rust"],
+            "profile_version": 3,
+            "matches_version": 7,
+            **synthetic_profile(rng),
+        }
+        if extra_bytes:
+            doc["avatar"] = "A" * extra_bytes
+        docs.append(doc)
+    result = await User.get_motor_collection().insert_many(docs)
+    return result.inserted_ids
+
+
+async def run(args):
+    from backend.models import ChatHeaderUser, MatchListUser, ScoringProfile, User, UserCard
+
+    ids = await seed(args.users, args.extra_bytes)
+    batch = ids[:args.batch]
+    query = {"_id": {"$in": batch}}
+    collection = User.get_motor_collection()
+
+    full_docs = await collection.find(query).to_list(None)
+    full_bytes = sum(len(bson.encode(doc)) for doc in full_docs) / len(full_docs)
+    full_validate = time_call(lambda: [User.model_validate(doc) for doc in full_docs], args.repeat) * 1000 / len(full_docs)
+    full_query = await time_async(lambda: User.find(query).to_list(), args.repeat)
+
+    rows = [("User (full)", full_bytes, 1.0, full_validate, full_query)]
+    for model in (MatchListUser, UserCard, ScoringProfile, ChatHeaderUser):
+        docs = await collection.find(query, _projection(model)).to_list(None)
+        size = sum(len(bson.encode(doc)) for doc in docs) / len(docs)
+        validate = time_call(lambda: [model.model_validate(doc) for doc in docs], args.repeat) * 1000 / len(docs)
+        query_ms = await time_async(lambda: User.find(query).project(model).to_list(), args.repeat)
+        rows.append((model.__name__, size, full_bytes / size, validate, query_ms))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--extra-bytes", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_database_args(parser)
+    args = parser.parse_args()
+    use_database(args.uri)
+
+    rows = asyncio.run(run(args))
+    print_table(("read model", "bytes/doc", "x smaller", "validate us/doc", f"query ms/{args.batch} users"), rows)
+
+
+if __name__ == "__main__":
+    main()
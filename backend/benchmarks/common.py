@@ -0,0 +1,142 @@
+"""Helpers shared by the benchmark scripts.
+
+Run a benchmark from the repo root, e.g.
+``python -m backend.benchmarks.bench_profile_index --sizes 10000 100000``.
+
+Database-backed benchmarks default to an in-memory mongomock-motor database
+(see requirements-dev.txt), which needs no Atlas cluster and gives query
+counts and relative timings. Pass ``--uri mongodb://localhost:27017`` to run
+them against a real MongoDB instead; they always use the ``synapso_bench``
+database, which they drop and reseed.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+SUBJECTS = [f"subject {i}" for i in range(60)]
+SLOTS = [f"{day} {part}" for day in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+         for part in ("morning", "afternoon", "evening")]
+INTERESTS = [f"interest {i}" for i in range(40)]
+HABITS = ["pomodoro", "flashcards", "group", "silent", "music", "notes", "practice tests", "mind maps"]
+
+
+def synthetic_profile(rng: random.Random) -> Dict[str, List[str]]:
+    return {
+        "subjects": rng.sample(SUBJECTS, rng.randint(1, 5)),
+        "availability": rng.sample(SLOTS, rng.randint(1, 6)),
+        "interests": rng.sample(INTERESTS, rng.randint(0, 4)),
+        "study_habits": rng.sample(HABITS, rng.randint(0, 3)),
+    }
+
+
+def synthetic_profiles(count: int, seed: int = 7) -> List[Dict[str, List[str]]]:
+    rng = random.Random(seed)
+    return [synthetic_profile(rng) for _ in range(count)]
+
+
+def time_call(func: Callable[[], object], repeat: int = 5) -> float:
+    """Median wall time of ``func()`` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def time_async(func: Callable[[], object], repeat: int = 5) -> float:
+    """Median wall time of ``await func()`` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence[object]]) -> None:
+    cells = [[str(h) for h in headers]] + [
+        [f"{c:.2f}" if isinstance(c, float) else str(c) for c in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+
+BENCH_DB = "synapso_bench"
+
+
+def add_database_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--uri", help="MongoDB to run against (default: in-memory mongomock)")
+
+
+def use_database(uri: Optional[str] = None) -> None:
+    """Point backend.config at ``uri``, or at mongomock. Call before importing backend modules."""
+    import motor.motor_asyncio
+
+    # config.py insists on an Atlas URI; the client below ignores it anyway
+    os.environ.setdefault("MONGO_URI", "mongodb+srv://synapso-bench.invalid")
+    os.environ["DB_NAME"] = BENCH_DB
+    if uri is None:
+        from mongomock_motor import AsyncMongoMockClient
+
+        def factory(*args, **kwargs):
+            return AsyncMongoMockClient()
+    else:
+        real_client = motor.motor_asyncio.AsyncIOMotorClient
+
+        def factory(*args, **kwargs):
+            return real_client(uri, event_listeners=kwargs.get("event_listeners", []))
+    motor.motor_asyncio.AsyncIOMotorClient = factory
+
+
+async def init_database():
+    """Fresh database with every Beanie document initialized (after use_database)."""
+    from beanie import init_beanie
+    from backend.config import MONGO_DB, client, db
+    from backend.models import DOCUMENT_MODELS
+
+    await client.drop_database(MONGO_DB)
+    await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+    return db
+
+
+class RoundTrips:
+    """Counts calls to collection methods: one call = one round trip to MongoDB."""
+
+    METHODS = (
+        "find_one", "find", "aggregate", "count_documents", "insert_one", "insert_many",
+        "update_one", "update_many", "find_one_and_update", "bulk_write", "delete_many",
+    )
+
+    def __init__(self, by_method: bool = False):
+        self.by_method = by_method  # count per (collection, method) instead of per collection
+        self.calls = Counter()
+
+    def watch(self, *documents) -> "RoundTrips":
+        for document in documents:
+            collection = document.get_motor_collection()
+            for method in self.METHODS:
+                original = getattr(collection, method)
+                key = (collection.name, method) if self.by_method else collection.name
+                setattr(collection, method, self._counted(key, original))
+        return self
+
+    def _counted(self, key, original):
+        def call(*args, **kwargs):
+            self.calls[key] += 1
+            return original(*args, **kwargs)
+        return call
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
@@ -0,0 +1,24 @@
+import asyncio
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from backend.models import DOCUMENT_MODELS
+from backend.config import MONGO_URI, MONGO_DB
+from backend.services.index_check import QUERY_SHAPES, uncovered_query_shapes
+
+async def check_indexes() -> int:
+    # Connect to MongoDB (init_beanie also creates the declared indexes)
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[MONGO_DB]
+    await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+
+    report = await uncovered_query_shapes()
+    for entry in report:
+        print(f"❌ {entry['collection']}: {entry['filter']} sort={entry['sort']} -> {', '.join(entry['stages'])}")
+    print(f"✅ {len(QUERY_SHAPES) - len(report)}/{len(QUERY_SHAPES)} query shapes covered by an index")
+
+    client.close()
+    return 1 if report else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check_indexes()))
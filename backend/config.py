@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from backend.services.metrics import command_listener
 
 load_dotenv()
 
@@ -20,7 +21,8 @@ client = AsyncIOMotorClient(
     connectTimeoutMS=15000,
     maxPoolSize=20,  # Render optimization
     minPoolSize=2,
-    retryWrites=True
+    retryWrites=True,
+    event_listeners=[command_listener],  # per-request query counts for /metrics
 )
 db = client[MONGO_DB]
 
@@ -34,3 +36,57 @@ CORS_ORIGINS = [o.strip() for o in os.getenv(
     "CORS_ORIGINS", 
     "https://synapso-app.onrender.com,http://localhost:5173,http://127.0.0.1:5173"
 ).split(",")]
+
+# Index coverage check: explain the routers' query shapes at startup
+CHECK_INDEXES = os.getenv("CHECK_INDEXES", "false").lower() == "true"
+
+# Precomputed recommendation queues
+RECOMMENDATION_QUEUE_SIZE = int(os.getenv("RECOMMENDATION_QUEUE_SIZE", "100"))
+RECOMMENDATION_REFRESH_SECONDS = float(os.getenv("RECOMMENDATION_REFRESH_SECONDS", "30"))
+RECOMMENDATION_ACTIVE_MINUTES = int(os.getenv("RECOMMENDATION_ACTIVE_MINUTES", "30"))
+
+# In-process auth caches (per worker; size 0 disables)
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+# Password hashing pool ("thread" or "process")
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "8"))
+
+# Logging: production default stays quiet on the per-request path (DEBUG/INFO)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+
+# Per-request X-DB-Query-Count / X-DB-Time-Ms response headers
+METRICS_DEBUG_HEADERS = os.getenv("METRICS_DEBUG_HEADERS", "true").lower() == "true"
+
+# Study room fan-out across workers: "memory" (single process) or "mongo" (change streams; needs a replica set)
+STUDYROOM_BACKPLANE = os.getenv("STUDYROOM_BACKPLANE", "memory").lower()
+STUDYROOM_HEARTBEAT_SECONDS = float(os.getenv("STUDYROOM_HEARTBEAT_SECONDS", "10"))
+# Per-socket outbound queue: a client this far behind, or a send this slow, is dropped
+STUDYROOM_SEND_QUEUE_SIZE = int(os.getenv("STUDYROOM_SEND_QUEUE_SIZE", "64"))
+STUDYROOM_SEND_TIMEOUT_SECONDS = float(os.getenv("STUDYROOM_SEND_TIMEOUT_SECONDS", "5"))
+# Study room chat: in-memory replay buffer per room, persisted to Mongo in batches
+STUDYROOM_HISTORY_SIZE = int(os.getenv("STUDYROOM_HISTORY_SIZE", "200"))
+STUDYROOM_HISTORY_FLUSH_SECONDS = float(os.getenv("STUDYROOM_HISTORY_FLUSH_SECONDS", "1"))
+# Study room Pomodoro phases
+STUDYROOM_FOCUS_SECONDS = int(os.getenv("STUDYROOM_FOCUS_SECONDS", "1500"))
+STUDYROOM_BREAK_SECONDS = int(os.getenv("STUDYROOM_BREAK_SECONDS", "300"))
+
+# /ws/chat push: cross-worker fan-out (defaults to the study room backplane) and per-socket limits
+CHAT_BACKPLANE = os.getenv("CHAT_BACKPLANE", STUDYROOM_BACKPLANE).lower()
+CHAT_WS_SEND_QUEUE_SIZE = int(os.getenv("CHAT_WS_SEND_QUEUE_SIZE", "256"))
+CHAT_WS_SEND_TIMEOUT_SECONDS = float(os.getenv("CHAT_WS_SEND_TIMEOUT_SECONDS", "5"))
+# How often each worker re-publishes which users have a /ws/chat socket on it
+CHAT_PRESENCE_SECONDS = float(os.getenv("CHAT_PRESENCE_SECONDS", "10"))
+
+# In-process event bus (swipes/messages -> notifications); events beyond this backlog are dropped
+EVENT_BUS_QUEUE_SIZE = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "10000"))
+
+# Per-user response cache for conditional GETs (per worker; size 0 disables body caching)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+# How long a worker trusts its copy of a user's version counters (0: read them on every request)
+RESPONSE_VERSION_TTL_SECONDS = float(os.getenv("RESPONSE_VERSION_TTL_SECONDS", "5"))
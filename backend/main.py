@@ -1,15 +1,45 @@
-from fastapi import FastAPI
+import os
+import sys
+import time
+
+# Works both as `uvicorn main:app` (from backend/) and `uvicorn backend.main:app`
+# (from the repo root). Everything below is imported through the `backend.`
+# package only: a second import root would load a second, uninitialized copy
+# of every module (Beanie documents, caches, the profile index...).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers.users import router as users_router
-from routers.swipes import router as swipes_router
-from routers.matches import router as matches_router
-from routers.messages import router as messages_router
-from routers.studyroom import router as studyroom_router
-from models import User, Match, Group, Swipe, Message, Chat
-from config import CORS_ORIGINS, db
+from backend.routers.users import backfill_email_keys, router as users_router
+from backend.routers.swipes import router as swipes_router
+from backend.routers.matches import router as matches_router
+from backend.routers.messages import router as messages_router, ws_router as chat_ws_router
+from backend.routers.notifications import router as notifications_router
+from backend.routers.studyroom import router as studyroom_router, manager as studyroom_manager
+from backend.models import DOCUMENT_MODELS, Swipe, User
+from backend.config import CORS_ORIGINS, CHECK_INDEXES, METRICS_DEBUG_HEADERS, db
+from backend.services.index_check import uncovered_query_shapes
+from backend.services import auth_cache, passwords, recommendation_queue, response_cache
+from backend.services.log import get_logger, new_request_id, request_id_var, setup_logging, shutdown_logging
+from backend.services.chat_hub import chat_hub
+from backend.services.chat_summary import backfill_missing_chats
+from backend.services.fast_json import ORJSONResponse
+from backend.services.events import event_bus
+from backend.services.notifications import register_handlers as register_notification_handlers
+from backend.services.metrics import RequestDbStats, observe_request, render_prometheus, request_db_stats
+from backend.services.matching import backfill_match_pair_keys, dedupe_swipes, profile_index
 from beanie import init_beanie
 
-app = FastAPI(title="Synapso API", version="1.0.0", description="Study Partner Matching Platform")
+setup_logging()
+logger = get_logger("main")
+
+app = FastAPI(
+    title="Synapso API",
+    version="1.0.0",
+    description="Study Partner Matching Platform",
+    default_response_class=ORJSONResponse,
+)
 
 # ---------- CORS ----------
 app.add_middleware(
@@ -18,45 +48,126 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Before-Cursor", "X-After-Cursor", "X-Has-More", "X-Request-ID", "X-DB-Query-Count", "X-DB-Time-Ms", "ETag"],
 )
 
+# ---------- Request IDs (attached to every log record) ----------
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# ---------- Latency + Mongo query metrics (exported on /metrics) ----------
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    stats = RequestDbStats()
+    token = request_db_stats.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        request_db_stats.reset(token)
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "<unmatched>")
+        observe_request(request.method, route, status, time.perf_counter() - started, stats)
+    if METRICS_DEBUG_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.queries)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+    return response
+
 # ---------- FIXED Startup: Safe route debugging ----------
 @app.on_event("startup")
 async def app_init():
     try:
-        # ✅ Initialize Beanie
-        await init_beanie(
-            database=db,
-            document_models=[User, Match, Group, Swipe, Message, Chat]
-        )
-        print("✅ Beanie initialized with config db!")
-        print("✅ Models ready: User, Match, Group, Swipe, Message, Chat")
+        # ✅ Repeated swipes of a pair would stop the unique swipe index from being built
+        deduped = await dedupe_swipes(db[Swipe.Settings.name])
+        if deduped:
+            logger.info("Deleted %d repeated swipes", deduped)
+        
+        # ✅ Initialize Beanie (also creates the indexes declared in each model's Settings)
+        await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+        logger.info("Beanie initialized: %s", ", ".join(model.__name__ for model in DOCUMENT_MODELS))
+        
+        # ✅ Optional: report query shapes that are not served by an index
+        if CHECK_INDEXES:
+            for entry in await uncovered_query_shapes():
+                logger.warning("Unindexed query on %s: %s -> %s", entry['collection'], entry['filter'], ', '.join(entry['stages']))
         
         # ✅ SAFE: Only HTTP routes (skip WebSocket)
-        print("\n🚀 HTTP ROUTES REGISTERED:")
         route_count = 0
         for route in app.routes:
             # ✅ FIX: Check if route has methods attribute
             if hasattr(route, 'methods') and route.methods:
-                print(f"  {list(route.methods)} {getattr(route, 'path', 'unknown')}")
+                logger.debug("Route %s %s", list(route.methods), getattr(route, 'path', 'unknown'))
                 route_count += 1
-        print(f"✅ TOTAL HTTP ROUTES: {route_count}")
+        logger.info("HTTP routes registered: %d", route_count)
         
         # ✅ Verify users exist for recommendations
         user_count = await User.count()
-        print(f"✅ USERS IN DB: {user_count}")
+        logger.info("Users in DB: %d", user_count)
+        
+        # ✅ Legacy matches need a pair_key for the unique pair constraint
+        backfilled = await backfill_match_pair_keys()
+        if backfilled:
+            logger.info("Backfilled pair_key on %d matches", backfilled)
+        
+        # ✅ Legacy accounts need an email_key for the unique email constraint
+        keyed = await backfill_email_keys()
+        if keyed:
+            logger.info("Backfilled email_key on %d users", keyed)
+        
+        # ✅ Matches made before chat summaries existed still belong in the inbox
+        created = await backfill_missing_chats()
+        if created:
+            logger.info("Created chat summaries for %d matches", created)
+        
+        # ✅ Build the in-process candidate index
+        indexed = await profile_index.rebuild()
+        logger.info("Profile index built: %d users", indexed)
+        
+        # ✅ Background refill of precomputed recommendation queues
+        recommendation_queue.start_worker()
+        logger.info("Recommendation queue worker started")
         
-    except Exception as e:
-        print(f"❌ Startup failed: {e}")
-        import traceback
-        traceback.print_exc()
+        # ✅ Study room fan-out across workers
+        await studyroom_manager.start()
+        logger.info("Study room backplane started: %s", type(studyroom_manager.backplane).__name__)
+        
+        # ✅ /ws/chat push delivery across workers
+        await chat_hub.start()
+        
+        # ✅ Side effects of swipes/messages (notifications) run off the request path
+        register_notification_handlers(event_bus)
+        event_bus.start()
+        
+    except Exception:
+        logger.exception("Startup failed")
         raise
 
+@app.on_event("shutdown")
+async def app_shutdown():
+    await recommendation_queue.stop_worker()
+    await studyroom_manager.stop()
+    await event_bus.stop()
+    await chat_hub.stop()
+    passwords.shutdown()
+    shutdown_logging()
+
 # ---------- ROUTERS ----------
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(swipes_router, prefix="/swipes", tags=["swipes"])
 app.include_router(matches_router, prefix="/matches", tags=["matches"])
-app.include_router(messages_router, prefix="/messages", tags=["messages"])
+app.include_router(messages_router)  # the router carries its own /messages prefix
+app.include_router(chat_ws_router)
+app.include_router(notifications_router, prefix="/notifications", tags=["notifications"])
 app.include_router(studyroom_router, prefix="/studyroom", tags=["studyroom"])
 
 @app.get("/")
@@ -75,6 +186,11 @@ async def root():
         "status": "ALL ROUTES READY"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request latency and Mongo command metrics"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "database": "connected"}
@@ -92,3 +208,42 @@ async def debug_routes():
                 "name": getattr(route, 'name', 'unknown')
             })
     return {"total_http_routes": len(routes), "routes": routes}
+
+@app.get("/debug/recommendation-queues")
+async def debug_recommendation_queues():
+    """Recommendation queue hit rate and refill latency"""
+    return recommendation_queue.metrics.snapshot()
+
+@app.get("/debug/auth-cache")
+async def debug_auth_cache():
+    """Auth user/token cache hit and miss counters"""
+    return auth_cache.stats()
+
+@app.get("/debug/password-hashing")
+async def debug_password_hashing():
+    """Password hashing pool queueing metrics"""
+    return passwords.metrics.snapshot()
+
+@app.get("/debug/studyrooms")
+async def debug_studyrooms():
+    """Local study room sockets and slow/dead sockets dropped by broadcast"""
+    return {
+        "worker": studyroom_manager.backplane.worker_id,
+        "rooms": {room_id: len(conns) for room_id, conns in studyroom_manager.active_connections.items()},
+        "dropped_connections": studyroom_manager.dropped_connections,
+    }
+
+@app.get("/debug/chat-sockets")
+async def debug_chat_sockets():
+    """Users and sockets connected to /ws/chat on this worker"""
+    return chat_hub.stats()
+
+@app.get("/debug/event-bus")
+async def debug_event_bus():
+    """In-process event bus backlog and delivery counters"""
+    return event_bus.stats()
+
+@app.get("/debug/response-cache")
+async def debug_response_cache():
+    """Conditional GET cache: 304s, body cache hits/misses and hit rate"""
+    return response_cache.stats()
@@ -1,11 +1,14 @@
-from beanie import Document
-from typing import List, Optional
+from beanie import Document, Insert, PydanticObjectId, before_event
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # ---------- User Collection ----------
 class User(Document):
     username: str
     email: str
+    email_key: Optional[str] = None  # = email, under the unique constraint
     password: str  # hashed password stored here
     subjects: List[str] = []
     availability: List[str] = []
@@ -20,17 +23,97 @@ class User(Document):
     academic_level: Optional[str] = None
     goals: Optional[List[str]] = []
 
+    # Bumped on every change that alters the user's cached GET responses (ETags)
+    profile_version: int = 0
+    matches_version: int = 0
+
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)]),
+            # Legacy accounts that share an email are left out of the constraint
+            IndexModel(
+                [("email_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"email_key": {"$type": "string"}},
+            ),
+        ]
+
+    @before_event(Insert)
+    def _set_email_key(self):
+        self.email_key = self.email
+
+# ---------- User read models ----------
+# Projections for listing endpoints: loaded with .project(...) so only these
+# fields leave Mongo and get validated (never the password hash).
+
+class UserCard(BaseModel):
+    """Recommendation card (schemas.ProfileSummary)"""
+    id: PydanticObjectId = Field(alias="_id")
+    username: str
+    subjects: List[str] = []
+    availability: List[str] = []
+    bio: Optional[str] = None
+    academic_level: Optional[str] = None
+    profile_completed: bool = False
+
+class MatchListUser(BaseModel):
+    """The other user of a match listing (schemas.MatchWithUser)"""
+    id: PydanticObjectId = Field(alias="_id")
+    username: str
+    email: str
+    subjects: List[str] = []
+    availability: List[str] = []
+    bio: Optional[str] = None
+    study_habits: Optional[List[str]] = []
+    interests: Optional[List[str]] = []
+
+class ChatHeaderUser(BaseModel):
+    """Name shown above a chat or next to a message"""
+    id: PydanticObjectId = Field(alias="_id")
+    username: str
+
+class ScoringProfile(BaseModel):
+    """What recommend_users needs to rank candidates for a user"""
+    id: PydanticObjectId = Field(alias="_id")
+    subjects: List[str] = []
+    availability: List[str] = []
+    study_habits: Optional[List[str]] = []
+    interests: Optional[List[str]] = []
+
+class UserIdView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
 
 # ---------- Match Collection ----------
+def match_pair_key(user_a: str, user_b: str) -> str:
+    """Canonical, order-independent key for a pair of users."""
+    return ":".join(sorted([user_a, user_b]))
+
 class Match(Document):
     user1_id: str
     user2_id: str
     matched_at: Optional[datetime] = None
+    pair_key: Optional[str] = None  # match_pair_key(user1_id, user2_id)
 
     class Settings:
         name = "matches"
+        indexes = [
+            IndexModel([("user1_id", ASCENDING)]),
+            IndexModel([("user2_id", ASCENDING)]),
+            # Legacy matches without a pair_key are left out of the constraint
+            IndexModel(
+                [("pair_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"pair_key": {"$type": "string"}},
+            ),
+        ]
+
+class MatchParticipants(BaseModel):
+    """Match read model for listings and membership checks"""
+    id: PydanticObjectId = Field(alias="_id")
+    user1_id: str
+    user2_id: str
+    matched_at: Optional[datetime] = None
 
 # ---------- Group Collection ----------
 class Group(Document):
@@ -41,6 +124,9 @@ class Group(Document):
 
     class Settings:
         name = "groups"
+        indexes = [
+            IndexModel([("member_ids", ASCENDING)]),
+        ]
 
 # ---------- Swipe Collection ----------
 class Swipe(Document):
@@ -51,6 +137,10 @@ class Swipe(Document):
 
     class Settings:
         name = "swipes"
+        indexes = [
+            # One swipe per pair; also serves "who did I swipe" and reciprocal lookups
+            IndexModel([("swiper_id", ASCENDING), ("swipee_id", ASCENDING)], unique=True),
+        ]
 
 # ---------- Message Collection ----------
 class Message(Document):
@@ -65,6 +155,12 @@ class Message(Document):
 
     class Settings:
         name = "messages"
+        indexes = [
+            # Keyset pagination of chat history
+            IndexModel([("match_id", ASCENDING), ("sent_at", ASCENDING), ("_id", ASCENDING)]),
+            # Unread lookups / bulk mark-as-read
+            IndexModel([("match_id", ASCENDING), ("receiver_id", ASCENDING), ("is_read", ASCENDING)]),
+        ]
 
 # ---------- Chat/Conversation Collection ----------
 class Chat(Document):
@@ -72,8 +168,107 @@ class Chat(Document):
     participants: List[str]  # [user1_id, user2_id]
     last_message: Optional[str] = None
     last_message_at: Optional[datetime] = None
-    created_at: datetime = datetime.utcnow()
+    last_sender_id: Optional[str] = None
+    unread_counts: Dict[str, int] = {}  # user_id -> unread messages for that user
+    created_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = True
 
     class Settings:
-        name = "chats"
\ No newline at end of file
+        name = "chats"
+        indexes = [
+            IndexModel([("match_id", ASCENDING)], unique=True),
+            IndexModel([("participants", ASCENDING), ("last_message_at", DESCENDING)]),
+        ]
+
+# ---------- Recommendation Queue Collection ----------
+class RecommendationQueue(Document):
+    user_id: str
+    candidates: List[dict] = []  # ranked recommend_users() rows, best first
+    size: int = 0  # len(candidates), kept in sync by every write
+    exhausted: bool = False  # last refill returned every remaining candidate
+    stale: bool = False
+    refreshed_at: Optional[datetime] = None
+    last_requested_at: Optional[datetime] = None
+
+    class Settings:
+        name = "recommendation_queues"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+            IndexModel([("candidates.id", ASCENDING)]),
+            IndexModel([("last_requested_at", DESCENDING)]),
+            # Signups re-open exhausted queues; only those are indexed
+            IndexModel(
+                [("exhausted", ASCENDING), ("stale", ASCENDING)],
+                partialFilterExpression={"exhausted": True},
+            ),
+        ]
+
+# ---------- Study Room Backplane Events ----------
+class StudyRoomEvent(Document):
+    channel: str = "studyroom"  # "studyroom" or "chat"
+    worker: str  # publishing worker; it never consumes its own events
+    room_id: str
+    event: dict
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "studyroom_events"
+        indexes = [
+            # Only needed long enough for the change stream to deliver them
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=300),
+        ]
+
+# ---------- Study Room Chat History ----------
+class StudyRoomMessage(Document):
+    room_id: str
+    seq: int  # per-room ordering; also the client's replay cursor
+    username: str
+    message: str
+    timestamp: str  # as broadcast to clients
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "studyroom_messages"
+        indexes = [
+            IndexModel([("room_id", ASCENDING), ("seq", DESCENDING)]),
+        ]
+
+# ---------- Notification Collection ----------
+NOTIFICATION_TTL_SECONDS = 30 * 24 * 3600  # read notifications are kept 30 days
+
+class Notification(Document):
+    user_id: str  # recipient
+    type: str  # "match", "message", "system"
+    title: str
+    message: str
+    ref_id: Optional[str] = None  # match_id for "match" / "message"
+    read: bool = False
+    read_at: Optional[datetime] = None  # set by mark_read; the TTL counts from here
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "notifications"
+        indexes = [
+            # Inbox pages, newest first
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            # Read notifications expire; unread ones have no read_at and stay,
+            # so the unread counter stays exact
+            IndexModel([("read_at", ASCENDING)], expireAfterSeconds=NOTIFICATION_TTL_SECONDS),
+        ]
+
+# ---------- Notification Unread Counters ----------
+class NotificationCounter(Document):
+    user_id: str
+    unread: int = 0  # $inc on create, decremented by the number actually marked read
+
+    class Settings:
+        name = "notification_counters"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True),
+        ]
+
+# Every collection, in the order main.py passes them to init_beanie
+DOCUMENT_MODELS = [
+    User, Match, Group, Swipe, Message, Chat, RecommendationQueue,
+    StudyRoomEvent, StudyRoomMessage, Notification, NotificationCounter,
+]
@@ -0,0 +1,20 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from backend.models import Chat, Match, Message
+from backend.config import MONGO_URI, MONGO_DB
+from backend.services.chat_summary import rebuild_chat_summaries
+
+async def rebuild():
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[MONGO_DB]
+    await init_beanie(database=db, document_models=[Chat, Match, Message])
+
+    written = await rebuild_chat_summaries()
+    print(f"✅ Rebuilt {written} chat summaries")
+
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -1,58 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from backend.models import User, Match
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from backend.models import User, Match, MatchParticipants
 from backend.routers.users import get_current_user
+from backend.services import response_cache
+from backend.services.fast_json import fast_response
+from backend.services.log import get_logger
+from backend.services.response_cache import MATCHES_VERSION
+from backend.services.user_loader import UserLoader, get_user_loader
 from typing import List
 from datetime import datetime
 
 # ✅ FIXED: Move to /users prefix OR add both endpoints
 router = APIRouter(prefix="/users", tags=["matches"])  # ✅ CHANGED PREFIX
+logger = get_logger("routers.matches")
 
 @router.get("/matches", response_model=List[dict])  # ✅ /users/matches
-async def get_matches(current_user: User = Depends(get_current_user)):
-    """Get all matches for the current user"""
+async def get_matches(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    loader: UserLoader = Depends(get_user_loader)
+):
+    """Get all matches for the current user (conditional GET via ETag)"""
     try:
-        print(f"Getting matches for user: {current_user.email} (ID: {current_user.id})")
-        
-        matches = await Match.find(
-            {"$or": [
-                {"user1_id": str(current_user.id)},
-                {"user2_id": str(current_user.id)}
-            ]}
-        ).to_list()
-        
-        print(f"Found {len(matches)} matches in database")
-        
-        result = []
-        for match in matches:
-            other_user_id = match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
-            
-            try:
-                other_user = await User.get(other_user_id)
-                if other_user:
-                    match_data = {
-                        "id": str(match.id),  # ✅ Frontend expects "id"
-                        "match_id": str(match.id),
-                        "user_id": str(other_user.id),
-                        "username": other_user.username,
-                        "email": other_user.email,
-                        "subjects": getattr(other_user, 'subjects', []),
-                        "availability": getattr(other_user, 'availability', []),
-                        "bio": getattr(other_user, 'bio', ''),
-                        "matched_at": match.matched_at.isoformat() if hasattr(match, 'matched_at') else datetime.utcnow().isoformat()
-                    }
-                    result.append(match_data)
-                    print(f"Added match with user: {other_user.username}")
-            except Exception as e:
-                print(f"Error getting user {other_user_id}: {e}")
-        
-        print(f"Returning {len(result)} matches")
-        return result
-        
-    except Exception as e:
-        print(f"Error fetching matches: {e}")
-        import traceback
-        traceback.print_exc()
+        body = await response_cache.conditional(
+            request, response, current_user, "matches.matches", (MATCHES_VERSION,),
+            lambda user: _match_list(user, loader)
+        )
+        return fast_response(body, response)
+    except Exception:
+        logger.exception("Error fetching matches")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch matches"
         )
+
+async def _match_list(current_user: User, loader: UserLoader) -> List[dict]:
+    matches = await Match.find(
+        {"$or": [
+            {"user1_id": str(current_user.id)},
+            {"user2_id": str(current_user.id)}
+        ]}
+    ).project(MatchParticipants).to_list()
+    
+    logger.debug("Found %d matches for user %s", len(matches), current_user.id)
+    
+    other_user_ids = [
+        match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
+        for match in matches
+    ]
+    users = await loader.load_many(other_user_ids)
+    
+    result = []
+    for match, other_user_id in zip(matches, other_user_ids):
+        other_user = users.get(other_user_id)
+        if not other_user:
+            logger.debug("Match %s: user %s not found", match.id, other_user_id)
+            continue
+        
+        result.append({
+            "id": str(match.id),  # ✅ Frontend expects "id"
+            "match_id": str(match.id),
+            "user_id": str(other_user.id),
+            "username": other_user.username,
+            "email": other_user.email,
+            "subjects": other_user.subjects,
+            "availability": other_user.availability,
+            "bio": other_user.bio or '',
+            "matched_at": match.matched_at.isoformat() if match.matched_at else datetime.utcnow().isoformat()
+        })
+    
+    return result
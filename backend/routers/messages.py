@@ -1,12 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from backend.models import User, Match, Message, Chat
-from backend.routers.users import get_current_user
-from typing import List
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from backend.config import CHAT_WS_SEND_QUEUE_SIZE, CHAT_WS_SEND_TIMEOUT_SECONDS
+from backend.models import User, Match, MatchParticipants, Message
+from backend.routers.users import authenticate_token, get_current_user
+from backend.services.chat_hub import chat_hub
+from backend.services.chat_inbox import fetch_inbox
+from backend.services.chat_summary import record_message
+from backend.services.events import MESSAGE_SENT, event_bus
+from backend.services.fast_json import dumps_text, fast_response
+from backend.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from backend.services.read_receipts import is_within_watermark, mark_messages_read
+from backend.services.log import get_logger
+from backend.services.user_loader import UserLoader, get_chat_header_loader
+from backend.services.ws_connection import QueuedWebSocket
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import json
 from pydantic import BaseModel
-import traceback
+from beanie import PydanticObjectId
+from bson import ObjectId
+from bson.errors import InvalidId
 
 router = APIRouter(prefix="/messages", tags=["messages"])
+ws_router = APIRouter()  # mounted without a prefix: /ws/chat
+logger = get_logger("routers.messages")
 
 # ---- Schemas ----
 class MessageCreate(BaseModel):
@@ -23,6 +39,15 @@ class MessageResponse(BaseModel):
     sent_at: datetime
     is_read: bool
 
+class ReadReceiptInput(BaseModel):
+    up_to_id: Optional[str] = None  # read up to (and including) this message
+    up_to: Optional[datetime] = None  # or up to this sent_at timestamp
+
+class ReadReceiptResponse(BaseModel):
+    success: bool
+    read_count: int
+    read_at: Optional[datetime] = None
+
 class ChatResponse(BaseModel):
     id: str
     match_id: str
@@ -32,139 +57,189 @@ class ChatResponse(BaseModel):
     last_message_at: datetime
     unread_count: int
 
+# ---- Helpers ----
+
+async def _resolve_watermark(
+    match_id: str,
+    up_to: Optional[datetime],
+    up_to_id: Optional[str],
+    loaded: Optional[List[Message]] = None
+) -> Optional[Tuple[datetime, Optional[ObjectId]]]:
+    """Turn a message id / timestamp watermark into a (sent_at, _id) pair."""
+    if up_to_id:
+        try:
+            message_id = ObjectId(up_to_id)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid message id")
+        message = next((m for m in loaded or [] if m.id == message_id), None)
+        if message is None:
+            message = await Message.get(message_id)
+        if not message or message.match_id != match_id:
+            raise HTTPException(status_code=404, detail="Message not found in this chat")
+        return message.sent_at, message.id
+    if up_to:
+        if up_to.tzinfo is not None:
+            # Message.sent_at is naive UTC; browsers send toISOString() ("...Z")
+            up_to = up_to.astimezone(timezone.utc).replace(tzinfo=None)
+        return up_to, None
+    return None
+
+async def _fetch_message_page(
+    match_id: str,
+    before: Optional[str],
+    after: Optional[str],
+    limit: int
+) -> Tuple[List[Message], bool]:
+    """Keyset page over (sent_at, _id), returned oldest first.
+
+    ``after`` pages forward (newer), ``before`` pages back (older); with
+    neither the latest ``limit`` messages are returned. Served by the
+    (match_id, sent_at, _id) index.
+    """
+    query = {"match_id": match_id}
+    try:
+        if after:
+            query.update(keyset_filter("sent_at", *decode_cursor(after), after=True))
+        elif before:
+            query.update(keyset_filter("sent_at", *decode_cursor(before), after=False))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    direction = 1 if after else -1
+    messages = await Message.find(query).sort(
+        [("sent_at", direction), ("_id", direction)]
+    ).limit(limit + 1).to_list()
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == -1:
+        messages.reverse()
+    return messages, has_more
+
+async def _get_match(match_id: str) -> Optional[MatchParticipants]:
+    """Load only the participants of a match (None if missing or malformed)."""
+    try:
+        object_id = PydanticObjectId(match_id)
+    except (InvalidId, TypeError):
+        return None
+    return await Match.find_one(Match.id == object_id).project(MatchParticipants)
+
+def _other_participant(match: MatchParticipants, user_id: str) -> str:
+    return match.user2_id if match.user1_id == user_id else match.user1_id
+
+async def _push_read_receipt(match_id: str, sender_id: str, reader_id: str, read_at: datetime, read_count: int):
+    """Tell the sender (on /ws/chat) that their messages were read."""
+    await chat_hub.push([sender_id], {
+        "type": "read_receipt",
+        "match_id": match_id,
+        "reader_id": reader_id,
+        "read_at": read_at.isoformat(),
+        "read_count": read_count,
+    })
+
 # ---- Endpoints ----
 
 @router.get("/chats", response_model=List[ChatResponse])
 async def get_user_chats(current_user: User = Depends(get_current_user)):
     """Get all chats for the current user"""
     try:
-        print(f"\n=== GET CHATS ===")
-        print(f"User: {current_user.email} (ID: {current_user.id})")
-        
-        # Get all matches for current user
-        matches = await Match.find({
-            "$or": [
-                {"user1_id": str(current_user.id)},
-                {"user2_id": str(current_user.id)}
-            ]
-        }).to_list()
+        # One indexed query over the chat summaries (+ other username lookup)
+        rows = await fetch_inbox(str(current_user.id))
 
-        print(f"Found {len(matches)} matches")
+        logger.debug("Inbox for user %s: %d chats", current_user.id, len(rows))
 
         chats = []
-        for match in matches:
-            try:
-                # Get other user
-                other_user_id = match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
-                print(f"\nProcessing match {match.id}")
-                print(f"Other user ID: {other_user_id}")
-                
-                other_user = await User.get(other_user_id)
-                
-                if not other_user:
-                    print(f"⚠️ User not found: {other_user_id}")
-                    continue
+        for row in rows:
+            if row.get("last_message_at"):
+                last_message_text = row.get("last_message")
+                last_message_time = row["last_message_at"]
+            else:
+                last_message_text = "Start a conversation!"
+                # Use when the chat was created (matched_at), otherwise current time
+                last_message_time = row.get("created_at") or datetime.utcnow()
 
-                print(f"Other user: {other_user.username}")
-
-                # Get last message for this match
-                last_messages = await Message.find(
-                    {"match_id": str(match.id)}
-                ).sort(-Message.sent_at).limit(1).to_list()
-
-                print(f"Messages found: {len(last_messages)}")
-
-                # Count unread messages
-                unread_count = await Message.find({
-                    "match_id": str(match.id),
-                    "receiver_id": str(current_user.id),
-                    "is_read": False
-                }).count()
-
-                print(f"Unread count: {unread_count}")
-
-                # Determine last message and time
-                if last_messages and len(last_messages) > 0:
-                    last_message_text = last_messages[0].content
-                    last_message_time = last_messages[0].sent_at
-                    print(f"Last message: '{last_message_text}' at {last_message_time}")
-                else:
-                    last_message_text = "Start a conversation!"
-                    # Use matched_at if it exists, otherwise current time
-                    if hasattr(match, 'matched_at') and match.matched_at:
-                        last_message_time = match.matched_at
-                    else:
-                        last_message_time = datetime.utcnow()
-                    print(f"No messages yet, using time: {last_message_time}")
-
-                chat_data = ChatResponse(
-                    id=str(match.id),
-                    match_id=str(match.id),
-                    other_user_id=str(other_user.id),
-                    other_user_username=other_user.username,
-                    last_message=last_message_text,
-                    last_message_at=last_message_time,
-                    unread_count=unread_count
-                )
-                chats.append(chat_data)
-                print(f"✅ Added chat with {other_user.username}")
-                
-            except Exception as e:
-                print(f"❌ Error processing match {match.id}: {e}")
-                traceback.print_exc()
-                continue
+            chats.append(ChatResponse(
+                id=row["match_id"],
+                match_id=row["match_id"],
+                other_user_id=row["other_user_id"],
+                other_user_username=row["other_user_username"],
+                last_message=last_message_text,
+                last_message_at=last_message_time,
+                unread_count=row["unread_count"]
+            ))
 
         # Sort by last message time
         chats.sort(key=lambda x: x.last_message_at, reverse=True)
-        
-        print(f"\n=== RETURNING {len(chats)} CHATS ===\n")
         return chats
 
     except Exception as e:
-        print(f"❌ Error fetching chats: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching chats")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/chat/{match_id}", response_model=List[MessageResponse])
-async def get_chat_messages(match_id: str, current_user: User = Depends(get_current_user)):
-    """Get all messages for a specific chat"""
+async def get_chat_messages(
+    match_id: str,
+    response: Response,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    read_up_to: Optional[datetime] = None,
+    read_up_to_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    loader: UserLoader = Depends(get_chat_header_loader)
+):
+    """Get a page of messages for a specific chat (latest ``limit`` by default).
+
+    Cursor tokens are returned in the ``X-Before-Cursor`` (older page) and
+    ``X-After-Cursor`` (newer page) headers; ``X-Has-More`` tells whether more
+    messages exist in the requested direction.
+
+    Unread messages are acknowledged up to ``read_up_to_id`` / ``read_up_to``
+    when given, otherwise up to the last message returned.
+    """
     try:
-        print(f"\n=== GET CHAT MESSAGES ===")
-        print(f"Match ID: {match_id}")
-        print(f"User: {current_user.email}")
-        
         # Verify user is part of this match
-        match = await Match.get(match_id)
+        match = await _get_match(match_id)
         if not match or (str(current_user.id) not in [match.user1_id, match.user2_id]):
-            print(f"❌ User not authorized for match {match_id}")
+            logger.debug("User %s not authorized for match %s", current_user.id, match_id)
             raise HTTPException(status_code=403, detail="Not authorized to view this chat")
 
-        print(f"✅ User authorized")
+        # Get one page of messages
+        messages, has_more = await _fetch_message_page(match_id, before, after, limit)
+        logger.debug("Match %s: %d messages in page", match_id, len(messages))
 
-        # Get messages
-        messages = await Message.find({"match_id": match_id}).sort(Message.sent_at).to_list()
-        
-        print(f"Found {len(messages)} messages")
+        if messages:
+            response.headers["X-Before-Cursor"] = encode_cursor(messages[0].sent_at, messages[0].id)
+            response.headers["X-After-Cursor"] = encode_cursor(messages[-1].sent_at, messages[-1].id)
+        elif after:
+            response.headers["X-After-Cursor"] = after  # Nothing new yet: poll again from here
+        response.headers["X-Has-More"] = "true" if has_more else "false"
         
-        # Mark messages as read
-        unread_messages = await Message.find({
-            "match_id": match_id,
-            "receiver_id": str(current_user.id),
-            "is_read": False
-        }).to_list()
-        
-        if unread_messages:
-            print(f"Marking {len(unread_messages)} messages as read")
-            for msg in unread_messages:
-                msg.is_read = True
-                msg.read_at = datetime.utcnow()
-                await msg.save()
-
-        # Format response
-        response = []
+        # Mark messages as read - one update_many up to the watermark. Without an
+        # explicit watermark only the messages returned here are acknowledged.
+        watermark = await _resolve_watermark(match_id, read_up_to, read_up_to_id, messages)
+        if watermark is None and messages:
+            watermark = (messages[-1].sent_at, messages[-1].id)
+        if watermark is not None:
+            read_at, read_count = await mark_messages_read(match_id, str(current_user.id), *watermark)
+            if read_count:
+                logger.debug("Match %s: marked %d messages read", match_id, read_count)
+                await _push_read_receipt(
+                    match_id, _other_participant(match, str(current_user.id)), str(current_user.id), read_at, read_count
+                )
+                # Patch the loaded messages instead of re-querying them
+                for msg in messages:
+                    if (msg.receiver_id == str(current_user.id) and not msg.is_read
+                            and is_within_watermark(msg, *watermark)):
+                        msg.is_read = True
+                        msg.read_at = read_at
+
+        # Format response - one lookup per distinct sender, not per message
+        senders = await loader.load_many({msg.sender_id for msg in messages})
+        result = []
         for msg in messages:
-            sender = await User.get(msg.sender_id)
-            response.append(MessageResponse(
+            sender = senders.get(msg.sender_id)
+            result.append(MessageResponse(
                 id=str(msg.id),
                 match_id=msg.match_id,
                 sender_id=msg.sender_id,
@@ -175,34 +250,59 @@ async def get_chat_messages(match_id: str, current_user: User = Depends(get_curr
                 is_read=msg.is_read
             ))
 
-        print(f"=== RETURNING {len(response)} MESSAGES ===\n")
-        return response
+        # Built from validated models already: encode once, keep the cursor headers
+        return fast_response(result, response)
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error fetching messages: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching messages")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/{match_id}/read", response_model=ReadReceiptResponse)
+async def mark_chat_messages_read(
+    match_id: str,
+    receipt: ReadReceiptInput,
+    current_user: User = Depends(get_current_user)
+):
+    """Acknowledge messages as read, optionally only up to a watermark"""
+    try:
+        match = await _get_match(match_id)
+        if not match or (str(current_user.id) not in [match.user1_id, match.user2_id]):
+            raise HTTPException(status_code=403, detail="Not authorized to view this chat")
+
+        watermark = await _resolve_watermark(match_id, receipt.up_to, receipt.up_to_id)
+        read_at, read_count = await mark_messages_read(
+            match_id, str(current_user.id), *(watermark or (None, None))
+        )
+        if read_count:
+            await _push_read_receipt(
+                match_id, _other_participant(match, str(current_user.id)), str(current_user.id), read_at, read_count
+            )
+        return ReadReceiptResponse(
+            success=True,
+            read_count=read_count,
+            read_at=read_at if read_count else None
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error marking messages read")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/send", response_model=MessageResponse)
 async def send_message(message_data: MessageCreate, current_user: User = Depends(get_current_user)):
     """Send a message to a match"""
     try:
-        print(f"\n=== SEND MESSAGE ===")
-        print(f"User: {current_user.email}")
-        print(f"Match ID: {message_data.match_id}")
-        print(f"Content: {message_data.content}")
-        
         # Verify match exists and user is part of it
-        match = await Match.get(message_data.match_id)
+        match = await _get_match(message_data.match_id)
         if not match or (str(current_user.id) not in [match.user1_id, match.user2_id]):
-            print(f"❌ User not authorized for match {message_data.match_id}")
+            logger.debug("User %s not authorized for match %s", current_user.id, message_data.match_id)
             raise HTTPException(status_code=403, detail="Not authorized to send message to this chat")
 
         # Get receiver
-        receiver_id = match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
-        print(f"Receiver ID: {receiver_id}")
+        receiver_id = _other_participant(match, str(current_user.id))
         
         # Create message
         message = Message(
@@ -213,11 +313,11 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
             sent_at=datetime.utcnow()
         )
         await message.insert()
+        await record_message(match, message)
 
-        print(f"✅ Message sent: {message.id}")
-        print(f"=== MESSAGE SENT ===\n")
+        logger.debug("Message %s sent in match %s", message.id, message.match_id)
 
-        return MessageResponse(
+        result = MessageResponse(
             id=str(message.id),
             match_id=message.match_id,
             sender_id=message.sender_id,
@@ -227,10 +327,107 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
             sent_at=message.sent_at,
             is_read=message.is_read
         )
+        # Push to the receiver and the sender's other sockets - no polling needed
+        await chat_hub.push([receiver_id, message.sender_id], {
+            "type": "message",
+            "message": result.model_dump(mode="json"),
+        })
+        event_bus.publish(MESSAGE_SENT, {
+            "match_id": message.match_id,
+            "message_id": str(message.id),
+            "sender_id": message.sender_id,
+            "sender_username": current_user.username,
+            "receiver_id": receiver_id,
+            "content": message.content,
+        })
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error sending message: {e}")
-        traceback.print_exc()
+        logger.exception("Error sending message")
         raise HTTPException(status_code=500, detail=str(e))
+
+# ---- Real-time chat ----
+
+async def _chat_partner(partners: Dict[str, str], match_id: Optional[str], user_id: str) -> Optional[str]:
+    """Other participant of ``match_id`` if ``user_id`` is in it (memoized per socket)."""
+    if match_id in partners:
+        return partners[match_id]
+    match = await _get_match(match_id)
+    if not match or user_id not in (match.user1_id, match.user2_id):
+        return None
+    partners[match_id] = _other_participant(match, user_id)
+    return partners[match_id]
+
+@ws_router.websocket("/ws/chat")
+async def chat_ws(websocket: WebSocket, token: Optional[str] = None):
+    """One socket for all of the user's matches.
+
+    Authenticate with ``?token=<access token>`` (or an ``Authorization:
+    Bearer`` header). The server pushes ``message``, ``typing`` and
+    ``read_receipt`` events; the client may send
+    ``{"type": "typing", "match_id", "is_typing"}``,
+    ``{"type": "read", "match_id", "up_to_id"?}`` and ``{"type": "ping"}``.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else ""
+    try:
+        user = await authenticate_token(token)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    user_id = str(user.id)
+    conn = QueuedWebSocket(
+        websocket,
+        maxsize=CHAT_WS_SEND_QUEUE_SIZE,
+        timeout=CHAT_WS_SEND_TIMEOUT_SECONDS,
+        on_close=lambda dropped: chat_hub.unregister(user_id, dropped),
+    )
+    chat_hub.register(user_id, conn)
+    partners: Dict[str, str] = {}
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+                kind = frame["type"]
+            except (ValueError, KeyError, TypeError):
+                conn.send(dumps_text({"type": "error", "detail": "Malformed frame"}))
+                continue
+
+            if kind == "ping":
+                conn.send(dumps_text({"type": "pong"}))
+                continue
+
+            match_id = frame.get("match_id")
+            other_id = await _chat_partner(partners, match_id, user_id)
+            if other_id is None:
+                conn.send(dumps_text({"type": "error", "match_id": match_id, "detail": "Not authorized for this chat"}))
+                continue
+
+            if kind == "typing":
+                await chat_hub.push([other_id], {
+                    "type": "typing",
+                    "match_id": match_id,
+                    "user_id": user_id,
+                    "is_typing": bool(frame.get("is_typing", True)),
+                }, ephemeral=True)
+
+            elif kind == "read":
+                try:
+                    watermark = await _resolve_watermark(match_id, None, frame.get("up_to_id"))
+                except HTTPException as e:
+                    conn.send(dumps_text({"type": "error", "match_id": match_id, "detail": e.detail}))
+                    continue
+                read_at, read_count = await mark_messages_read(match_id, user_id, *(watermark or (None, None)))
+                if read_count:
+                    await _push_read_receipt(match_id, other_id, user_id, read_at, read_count)
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_hub.unregister(user_id, conn)
+        await conn.aclose()
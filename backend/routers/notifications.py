@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from backend.models import User
+from backend.routers.users import get_current_user
+from backend.schemas import NotificationCount, NotificationPublic, NotificationReadInput
+from backend.services.log import get_logger
+from backend.services.notifications import list_notifications, mark_read, to_public, unread_count
+from backend.services.pagination import InvalidCursor, decode_cursor, encode_cursor
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+router = APIRouter(tags=["notifications"])
+logger = get_logger("routers.notifications")
+
+
+@router.get("/", response_model=List[NotificationPublic])
+async def get_notifications(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """A page of notifications, newest first.
+
+    Pass the ``X-Before-Cursor`` header value as ``before`` for the next
+    (older) page; ``X-Has-More`` tells whether one exists.
+    """
+    try:
+        position = decode_cursor(before) if before else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    docs, has_more = await list_notifications(str(current_user.id), position, limit, unread_only)
+    if docs:
+        response.headers["X-Before-Cursor"] = encode_cursor(docs[-1]["created_at"], docs[-1]["_id"])
+    response.headers["X-Has-More"] = "true" if has_more else "false"
+    return [to_public(doc) for doc in docs]
+
+
+@router.get("/unread-count", response_model=NotificationCount)
+async def get_unread_count(current_user: User = Depends(get_current_user)):
+    """Unread badge count, read from the per-user counter"""
+    return NotificationCount(unread_count=await unread_count(str(current_user.id)))
+
+
+@router.post("/read", response_model=NotificationCount)
+async def mark_notifications_read(
+    body: NotificationReadInput,
+    current_user: User = Depends(get_current_user)
+):
+    """Mark the given notifications (or all of them) read"""
+    ids = None
+    if body.ids is not None:
+        try:
+            ids = [ObjectId(i) for i in body.ids]
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid notification id")
+
+    marked, remaining = await mark_read(str(current_user.id), ids)
+    logger.debug("User %s marked %d notifications read", current_user.id, marked)
+    return NotificationCount(unread_count=remaining)
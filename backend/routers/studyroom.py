@@ -1,106 +1,354 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import json
+import time
 from datetime import datetime
+from backend.config import (
+    STUDYROOM_BACKPLANE,
+    STUDYROOM_HEARTBEAT_SECONDS,
+    STUDYROOM_HISTORY_FLUSH_SECONDS,
+    STUDYROOM_HISTORY_SIZE,
+    STUDYROOM_SEND_QUEUE_SIZE,
+    STUDYROOM_SEND_TIMEOUT_SECONDS,
+)
+from backend.services.fast_json import dumps_text
+from backend.services.log import get_logger
+from backend.services.pomodoro import PHASE_SECONDS, PomodoroTimer
+from backend.services.room_backplane import Backplane, create_backplane
+from backend.services.room_history import RoomHistory, RoomHistoryWriter, load_history
+from backend.services.ws_connection import QueuedWebSocket
 
 router = APIRouter()
+logger = get_logger("routers.studyroom")
 
 class RoomManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        self.room_users: Dict[str, Set[str]] = {}
-        self.room_owners: Dict[str, str] = {}
-        self.room_timers: Dict[str, dict] = {}
-        self.room_messages: Dict[str, List[dict]] = {}  # NEW: Store chat messages
-
-    async def connect(self, room_id: str, username: str, websocket: WebSocket, is_owner: bool = False):
+    """Study rooms shared by every worker attached to ``backplane``.
+
+    Each worker owns its local sockets and a username -> joined_at map; the
+    other workers' users arrive as presence snapshots. The owner is the
+    earliest joiner, so every worker derives the same one without a vote.
+    """
+
+    def __init__(self, backplane: Backplane):
+        self.backplane = backplane
+        self.active_connections: Dict[str, List[QueuedWebSocket]] = {}
+        self.local_users: Dict[str, Dict[str, float]] = {}
+        self.remote_users: Dict[str, Dict[str, Tuple[float, Dict[str, float]]]] = {}  # room -> worker -> (seen, users)
+        self.room_timers: Dict[str, PomodoroTimer] = {}
+        self._timer_tasks: Dict[str, asyncio.Task] = {}  # one phase-end scheduler per running room
+        self.room_messages: Dict[str, RoomHistory] = {}  # NEW: Store chat messages
+        self.history_writer = RoomHistoryWriter(STUDYROOM_HISTORY_FLUSH_SECONDS)
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.dropped_connections = 0
+
+    async def start(self):
+        self.history_writer.start()
+        await self.backplane.start(self.handle_event)
+        if self.backplane.distributed and self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        await self.backplane.stop()
+        await self.history_writer.stop()
+
+    def room_users(self, room_id: str) -> Dict[str, float]:
+        users = dict(self.local_users.get(room_id, {}))
+        for _, remote in self.remote_users.get(room_id, {}).values():
+            for name, joined_at in remote.items():
+                users[name] = min(joined_at, users.get(name, joined_at))
+        return users
+
+    def owner(self, room_id: str) -> Optional[str]:
+        users = self.room_users(room_id)
+        return min(users, key=lambda name: (users[name], name)) if users else None
+
+    async def connect(
+        self, room_id: str, username: str, websocket: WebSocket, last_seq: Optional[int] = None
+    ) -> QueuedWebSocket:
         await websocket.accept()
-        self.active_connections.setdefault(room_id, []).append(websocket)
-        self.room_users.setdefault(room_id, set()).add(username)
-        if room_id not in self.room_owners:
-            self.room_owners[room_id] = username
-        if room_id not in self.room_timers:
-            self.room_timers[room_id] = {"running": False, "remaining": 1500, "start_time": None}
         if room_id not in self.room_messages:
-            self.room_messages[room_id] = []
-        
+            history = await self._load_history(room_id)
+            self.room_messages.setdefault(room_id, history)  # a concurrent join may have won
+        conn = QueuedWebSocket(
+            websocket,
+            maxsize=STUDYROOM_SEND_QUEUE_SIZE,
+            timeout=STUDYROOM_SEND_TIMEOUT_SECONDS,
+            on_close=lambda dropped: self._prune(room_id, dropped),
+        )
+        first_here = room_id not in self.active_connections
+        self.active_connections.setdefault(room_id, []).append(conn)
+        self.local_users.setdefault(room_id, {}).setdefault(username, time.time())
+        if room_id not in self.room_timers:
+            self.room_timers[room_id] = PomodoroTimer()
+
+        if first_here:
+            # Ask workers already serving this room for presence, timer and history
+            await self.backplane.publish(room_id, {"type": "sync_request"})
+        await self.publish_presence(room_id)
         await self.broadcast_users(room_id)
-        # Send previous messages to new user
-        await websocket.send_text(json.dumps({
-            "type": "chat_history",
-            "messages": self.room_messages[room_id]
-        }))
+        # Send previous messages to new user: only what a reconnecting client missed
+        history = self.room_messages[room_id]
+        delta = history.since(last_seq) if last_seq is not None else None
+        if delta is not None:
+            conn.send(dumps_text({"type": "chat_history", "messages": delta, "since_seq": last_seq}))
+        else:
+            conn.send(dumps_text({"type": "chat_history", "messages": list(history.messages)}))
+        return conn
+
+    async def _load_history(self, room_id: str) -> RoomHistory:
+        try:
+            return await load_history(room_id, STUDYROOM_HISTORY_SIZE)
+        except Exception:
+            logger.exception("Loading history for room %s failed", room_id)
+            return RoomHistory(STUDYROOM_HISTORY_SIZE)
 
-    def disconnect(self, room_id: str, username: str, websocket: WebSocket):
+    def _prune(self, room_id: str, conn: QueuedWebSocket):
+        """A slow or dead socket was closed; stop fanning out to it.
+
+        Presence is cleaned up by ``disconnect`` once its receive loop ends.
+        """
+        self.dropped_connections += 1
+        try:
+            self.active_connections.get(room_id, []).remove(conn)
+        except ValueError:
+            pass
+
+    async def disconnect(self, room_id: str, username: str, conn: QueuedWebSocket):
+        await conn.aclose()
         if room_id in self.active_connections:
             try:
-                self.active_connections[room_id].remove(websocket)
+                self.active_connections[room_id].remove(conn)
             except ValueError:
                 pass
-        if room_id in self.room_users:
-            self.room_users[room_id].discard(username)
-            if not self.room_users[room_id]:
-                self.room_users.pop(room_id)
-                self.room_timers.pop(room_id, None)
-                self.active_connections.pop(room_id, None)
-                self.room_owners.pop(room_id, None)
-                self.room_messages.pop(room_id, None)  # Clear messages when room empty
+        if room_id in self.local_users:
+            self.local_users[room_id].pop(username, None)
+            if not self.local_users[room_id]:
+                # A rejoin reloads history from the database: persist what is pending first
+                await self.history_writer.flush()
+            if not self.local_users.get(room_id):
+                self._forget_room(room_id)  # Clear state when no local users remain
             else:
-                if self.room_owners.get(room_id) == username:
-                    self.room_owners[room_id] = next(iter(self.room_users[room_id]))
+                self._schedule_timer(room_id)  # the owner may have moved
+        await self.publish_presence(room_id)
+
+    def _forget_room(self, room_id: str):
+        self.local_users.pop(room_id, None)
+        self.active_connections.pop(room_id, None)
+        self.remote_users.pop(room_id, None)
+        self.room_timers.pop(room_id, None)
+        self.room_messages.pop(room_id, None)
+        task = self._timer_tasks.pop(room_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def publish_presence(self, room_id: str):
+        await self.backplane.publish(room_id, {
+            "type": "presence",
+            # [name, joined_at] pairs: usernames are not safe as Mongo field names
+            "users": list(self.local_users.get(room_id, {}).items()),
+        })
 
     async def broadcast_users(self, room_id: str):
         if room_id in self.active_connections:
-            users = list(self.room_users[room_id])
-            await self.broadcast(room_id, {
+            users = self.room_users(room_id)
+            self._send_local(room_id, {
                 "type": "user_list",
-                "users": users,
-                "owner": self.room_owners[room_id]
+                "users": sorted(users, key=lambda name: (users[name], name)),
+                "owner": self.owner(room_id)
             })
 
     async def broadcast(self, room_id: str, message: dict):
-        for conn in self.active_connections.get(room_id, []):
-            await conn.send_text(json.dumps(message))
+        """Apply ``message`` to room state and deliver it on every worker."""
+        self._apply(room_id, message)
+        self._send_local(room_id, message)
+        await self.backplane.publish(room_id, {"type": "broadcast", "message": message})
+
+    def _apply(self, room_id: str, message: dict):
+        if message["type"] == "timer_update":
+            self.room_timers[room_id] = PomodoroTimer.from_dict(message["data"])
+            self._schedule_timer(room_id)
+        elif message["type"] == "chat_message" and room_id in self.room_messages:
+            self.room_messages[room_id].add(message)
+
+    def _send_local(self, room_id: str, message: dict):
+        """Serialize once and queue on every local socket; never waits on a client."""
+        text = dumps_text(message)
+        for conn in list(self.active_connections.get(room_id, [])):
+            conn.send(text)
 
     async def broadcast_chat(self, room_id: str, username: str, message: str):
         """NEW: Broadcast chat message"""
         chat_msg = {
             "type": "chat_message",
+            "seq": self.room_messages[room_id].next_seq(),
             "username": username,
             "message": message,
             "timestamp": datetime.now().isoformat()
         }
-        self.room_messages[room_id].append(chat_msg)
+        self.history_writer.enqueue(room_id, chat_msg)
         await self.broadcast(room_id, chat_msg)
 
-manager = RoomManager()
+    async def handle_event(self, worker: str, room_id: str, event: dict):
+        """Apply an event published by another worker."""
+        if room_id not in self.active_connections:
+            return  # nobody here is in that room
+
+        kind = event["type"]
+        if kind == "broadcast":
+            self._apply(room_id, event["message"])
+            self._send_local(room_id, event["message"])
+
+        elif kind == "presence":
+            workers = self.remote_users.setdefault(room_id, {})
+            if event["users"]:
+                workers[worker] = (time.monotonic(), dict(event["users"]))
+            else:
+                workers.pop(worker, None)
+            self._schedule_timer(room_id)
+            await self.broadcast_users(room_id)
+
+        elif kind == "sync_request":
+            await self.publish_presence(room_id)
+            # The owner's worker runs the timer scheduler, so its state is authoritative
+            if self.owner(room_id) in self.local_users.get(room_id, {}):
+                await self.backplane.publish(room_id, {
+                    "type": "state",
+                    "to": worker,
+                    "timer": self.room_timers[room_id].to_dict(time.time()),
+                    "messages": list(self.room_messages[room_id].messages),
+                    "floor_seq": self.room_messages[room_id].floor_seq,
+                })
+
+        elif kind == "state" and event["to"] == self.backplane.worker_id:
+            self.room_timers[room_id] = PomodoroTimer.from_dict(event["timer"])
+            self._schedule_timer(room_id)
+            history = self.room_messages[room_id]
+            history.merge(event["messages"], event["floor_seq"])  # may include unflushed messages
+            self._send_local(room_id, {"type": "timer_update", "data": event["timer"]})
+            self._send_local(room_id, {"type": "chat_history", "messages": list(history.messages)})
+
+    async def timer_command(self, room_id: str, action: str):
+        """Owner control: start / pause / reset / skip. Broadcasts only on change."""
+        timer = self.room_timers[room_id]
+        transition = {"start": timer.start, "pause": timer.pause, "reset": timer.reset, "skip": timer.skip}.get(action)
+        if transition is not None and transition(time.time()):
+            await self.broadcast_timer(room_id)
+
+    async def legacy_timer_update(self, room_id: str, data: dict):
+        """Map the whole-timer pushes of older clients onto transitions.
+
+        Those clients send ``{running: true}`` for Start and ``{running: false,
+        remaining: N}`` for "Reset 25min" (N = focus) and "Break 5min"
+        (N = break). They also pause at zero when their local countdown ends;
+        that push is ignored, since the server starts the next phase itself.
+        """
+        timer = self.room_timers[room_id]
+        now = time.time()
+        remaining = data.get("remaining")
+        if data.get("running"):
+            changed = timer.start(now)
+        elif remaining == 0:
+            changed = False
+        elif remaining == PHASE_SECONDS["focus"]:
+            changed = timer.reset(now)
+        elif remaining == PHASE_SECONDS["break"]:
+            changed = not (timer.phase == "break" and timer.remaining(now) == timer.duration and not timer.running)
+            if changed:
+                timer.reset(now)
+                timer.skip(now)  # a paused timer stays paused, now at the start of the break
+        else:
+            changed = timer.pause(now)
+        if changed:
+            await self.broadcast_timer(room_id)
+
+    async def broadcast_timer(self, room_id: str):
+        await self.broadcast(room_id, {
+            "type": "timer_update",
+            "data": self.room_timers[room_id].to_dict(time.time())
+        })
+
+    def _schedule_timer(self, room_id: str):
+        """(Re)arm the phase-end task, on the owner's worker only.
+
+        Clients count down locally from ``started_at``/``duration``, so the
+        server only wakes up (and broadcasts) when a phase actually ends.
+        """
+        task = self._timer_tasks.pop(room_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        timer = self.room_timers.get(room_id)
+        if timer is not None and timer.running and self.owner(room_id) in self.local_users.get(room_id, {}):
+            self._timer_tasks[room_id] = asyncio.create_task(self._run_timer(room_id, timer.ends_at))
+
+    async def _run_timer(self, room_id: str, ends_at: float):
+        await asyncio.sleep(max(0.0, ends_at - time.time()))
+        timer = self.room_timers.get(room_id)
+        if timer is None or timer.ends_at != ends_at:
+            return  # changed while we slept
+        # The next phase starts exactly when this one ended, so a worker that
+        # takes over scheduling derives the same state
+        timer.advance(ends_at)
+        try:
+            await self.broadcast_timer(room_id)
+        except Exception:
+            logger.exception("Timer transition failed for room %s", room_id)
+
+    async def _heartbeat_loop(self, interval: float = STUDYROOM_HEARTBEAT_SECONDS):
+        """Re-publish presence, and drop workers that stopped doing so (crashed)."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                expired_before = time.monotonic() - 3 * interval
+                for room_id in list(self.active_connections):
+                    await self.publish_presence(room_id)
+                    workers = self.remote_users.get(room_id, {})
+                    stale = [w for w, (seen, _) in workers.items() if seen < expired_before]
+                    for worker in stale:
+                        workers.pop(worker, None)
+                    if stale:
+                        self._schedule_timer(room_id)
+                        await self.broadcast_users(room_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Study room heartbeat failed")
+
+manager = RoomManager(create_backplane(STUDYROOM_BACKPLANE))
 
 @router.websocket("/ws/studyroom/{room_id}/{username}")
-async def studyroom_ws(websocket: WebSocket, room_id: str, username: str):
-    is_owner = False
-    if room_id not in manager.room_owners:
-        is_owner = True
-    await manager.connect(room_id, username, websocket, is_owner=is_owner)
+async def studyroom_ws(websocket: WebSocket, room_id: str, username: str, last_seq: Optional[int] = None):
+    """``?last_seq=`` (the last chat ``seq`` the client saw) replays only newer messages."""
+    conn = await manager.connect(room_id, username, websocket, last_seq)
     try:
-        await websocket.send_text(json.dumps({
+        conn.send(dumps_text({
             "type": "timer_update",
-            "data": manager.room_timers[room_id]
+            "data": manager.room_timers[room_id].to_dict(time.time())
         }))
         while True:
             msg = await websocket.receive_text()
             obj = json.loads(msg)
-            
-            if obj["type"] == "timer_update" and username == manager.room_owners[room_id]:
-                manager.room_timers[room_id] = obj["data"]
-                await manager.broadcast(room_id, {
-                    "type": "timer_update",
-                    "data": manager.room_timers[room_id]
-                })
-            
+
+            if obj["type"] == "timer_command" and username == manager.owner(room_id):
+                await manager.timer_command(room_id, obj.get("action"))
+
+            elif obj["type"] == "timer_update" and username == manager.owner(room_id):
+                await manager.legacy_timer_update(room_id, obj.get("data") or {})
+
             # NEW: Handle chat messages
             elif obj["type"] == "chat_message":
                 await manager.broadcast_chat(room_id, username, obj["message"])
-                
+
     except WebSocketDisconnect:
-        manager.disconnect(room_id, username, websocket)
+        pass
+    finally:
+        # Also reached when the manager closed a slow or dead socket
+        await manager.disconnect(room_id, username, conn)
         await manager.broadcast_users(room_id)
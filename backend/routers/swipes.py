@@ -1,72 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from models import User, Swipe, Match  # ✅ FIXED import
-from routers.users import get_current_user  # ✅ FIXED import
-from schemas import SwipeInput
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from backend.models import User
+from backend.routers.users import get_current_user
+from backend.schemas import SwipeInput, SwipeBatchInput, SwipeBatchResult
+from backend.services.chat_summary import ensure_chat
+from backend.services.matching import record_swipe, record_swipes
+from backend.services.log import get_logger
+from backend.services.recommendation_queue import next_page, remove_candidate, remove_candidates
+from backend.services.events import MATCH_CREATED, event_bus
+from backend.services import response_cache
+from backend.services.fast_json import fast_response
+from backend.services.response_cache import MATCHES_VERSION
 from typing import List
-from datetime import datetime
-import traceback
-from bson import ObjectId
 
 router = APIRouter(tags=["swipes"])  # ✅ NO PREFIX HERE
+logger = get_logger("routers.swipes")
+
+
+async def _match_created(match) -> None:
+    """Expire both users' cached match lists and notify them (delivered off-request)."""
+    await response_cache.bump([match.user1_id, match.user2_id], MATCHES_VERSION)
+    event_bus.publish(MATCH_CREATED, {
+        "match_id": str(match.id),
+        "user_ids": [match.user1_id, match.user2_id],
+    })
 
 
 @router.get("/recommendations", response_model=List[dict])
-async def get_recommendations(current_user: User = Depends(get_current_user)):
-    """Get user recommendations for swiping"""
+async def get_recommendations(
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a ranked page of user recommendations for swiping"""
     try:
-        print(f"Getting recommendations for user: {current_user.email}")
-        
-        # Get all swipes by current user to find who they've already swiped on
-        user_swipes = await Swipe.find({"swiper_id": str(current_user.id)}).to_list()
-        swiped_user_ids = [swipe.swipee_id for swipe in user_swipes]
-        
-        print(f"Already swiped user IDs: {swiped_user_ids}")
-        
-        # Exclude current user and already swiped users
-        exclude_ids = [str(current_user.id)] + swiped_user_ids
-        
-        # Convert string IDs to ObjectIds for MongoDB query
-        from bson import ObjectId
-        exclude_object_ids = []
-        for id_str in exclude_ids:
-            try:
-                exclude_object_ids.append(ObjectId(id_str))
-            except:
-                pass  # Skip invalid IDs
+        # Served from the precomputed ranked queue (refilled on a miss)
+        users = await next_page(current_user, limit=limit, offset=offset)
         
-        print(f"Excluding object IDs: {exclude_object_ids}")
-        
-        # Get other users - FIXED: Use limit() before to_list()
-        users = await User.find({"_id": {"$nin": exclude_object_ids}}).limit(10).to_list()
-        
-        print(f"Found {len(users)} potential matches")
+        logger.debug("Recommendations for user %s: %d candidates", current_user.id, len(users))
         
         # Convert to dict format
         recommendations = []
         for user in users:
-            user_dict = {
-                "id": str(user.id),
-                "_id": str(user.id),
-                "username": user.username,
-                "email": user.email,
-                "subjects": getattr(user, 'subjects', []),
-                "availability": getattr(user, 'availability', []),
-                "studyHabits": getattr(user, 'study_habits', []),
-                "interests": getattr(user, 'interests', []),
-                "bio": getattr(user, 'bio', ''),
-                "academicLevel": getattr(user, 'academic_level', ''),
-                "studyLocation": getattr(user, 'study_location', ''),
-                "preferredStudyTime": getattr(user, 'preferred_study_time', '')
-            }
-            recommendations.append(user_dict)
-            print(f"Added recommendation: {user_dict['username']}")
-        
-        print(f"Returning {len(recommendations)} recommendations")
-        return recommendations
+            recommendations.append({
+                "id": user["id"],
+                "_id": user["id"],
+                "username": user.get("username"),
+                "email": user.get("email"),
+                "subjects": user.get("subjects", []),
+                "availability": user.get("availability", []),
+                "studyHabits": user.get("study_habits", []),
+                "interests": user.get("interests", []),
+                "bio": user.get("bio", ''),
+                "academicLevel": user.get("academic_level", ''),
+                "studyLocation": user.get("study_location", ''),
+                "preferredStudyTime": user.get("preferred_study_time", ''),
+                "compatibility_score": user["compatibility_score"]
+            })
+        return fast_response(recommendations)
         
-    except Exception as e:
-        print(f"Error fetching recommendations: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error fetching recommendations")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch recommendations"
@@ -76,70 +69,74 @@ async def get_recommendations(current_user: User = Depends(get_current_user)):
 async def create_swipe(swipe_data: SwipeInput, current_user: User = Depends(get_current_user)):
     """Create a new swipe and check for matches"""
     try:
-        print(f"User {current_user.email} swiping {swipe_data.direction} on {swipe_data.swipee_id}")
-        
-        # Check if already swiped
-        existing = await Swipe.find_one({
-            "swiper_id": str(current_user.id),
-            "swipee_id": swipe_data.swipee_id
-        })
+        # Atomic swipe upsert + reciprocal check + conditional match upsert
+        result = await record_swipe(str(current_user.id), swipe_data.swipee_id, swipe_data.direction)
         
-        if existing:
+        if not result.created:
             return {"success": False, "message": "Already swiped"}
         
-        # Create swipe
-        swipe = Swipe(
-            swiper_id=str(current_user.id),
-            swipee_id=swipe_data.swipee_id,
-            direction=swipe_data.direction,
-            swiped_at=datetime.utcnow()
-        )
-        await swipe.insert()
-        print(f"Swipe created: {swipe.id}")
+        await remove_candidate(str(current_user.id), swipe_data.swipee_id)
+        logger.debug("Swipe %s: %s %s %s", result.swipe_id, current_user.id, swipe_data.direction, swipe_data.swipee_id)
         
-        # Check for match on right swipe
-        is_match = False
-        if swipe_data.direction == "right":
-            print("Checking for mutual swipe...")
-            mutual_swipe = await Swipe.find_one({
-                "swiper_id": swipe_data.swipee_id,
-                "swipee_id": str(current_user.id),
-                "direction": "right"
-            })
-            
-            if mutual_swipe:
-                print("Mutual swipe found! Creating match...")
-                # Check if match exists
-                existing_match = await Match.find_one({
-                    "$or": [
-                        {"user1_id": str(current_user.id), "user2_id": swipe_data.swipee_id},
-                        {"user1_id": swipe_data.swipee_id, "user2_id": str(current_user.id)}
-                    ]
-                })
-                
-                if not existing_match:
-                    match = Match(
-                        user1_id=str(current_user.id),
-                        user2_id=swipe_data.swipee_id,
-                        matched_at=datetime.utcnow()
-                    )
-                    await match.insert()
-                    print(f"Match created: {match.id}")
-                
-                is_match = True
+        if result.new_match:
+            await ensure_chat(result.new_match)
+            await _match_created(result.new_match)
+            logger.debug("Match created: %s", result.new_match.id)
         
         return {
             "success": True,
-            "swipe_id": str(swipe.id),
-            "is_match": is_match,
-            "message": "It's a match! 🎉" if is_match else "Swipe recorded"
+            "swipe_id": result.swipe_id,
+            "is_match": result.is_match,
+            "message": "It's a match! 🎉" if result.is_match else "Swipe recorded"
         }
         
     except Exception as e:
-        print(f"Error creating swipe: {e}")
-        traceback.print_exc()
+        logger.exception("Error creating swipe")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create swipe: {str(e)}"
         )
 
+@router.post("/batch", response_model=List[SwipeBatchResult])
+async def create_swipes_batch(batch: SwipeBatchInput, current_user: User = Depends(get_current_user)):
+    """Replay an ordered list of queued swipes; one result per swipe, in order"""
+    try:
+        logger.debug("User %s submitting %d swipes", current_user.id, len(batch.swipes))
+        
+        results = await record_swipes(
+            str(current_user.id),
+            [(swipe.swipee_id, swipe.direction) for swipe in batch.swipes]
+        )
+        
+        await remove_candidates(
+            str(current_user.id),
+            [swipe.swipee_id for swipe, result in zip(batch.swipes, results) if result.created]
+        )
+        for result in results:
+            if result.new_match:
+                await ensure_chat(result.new_match)
+                await _match_created(result.new_match)
+        
+        response = []
+        for swipe, result in zip(batch.swipes, results):
+            if not result.created:
+                message = "Already swiped"
+            elif result.is_match:
+                message = "It's a match! 🎉"
+            else:
+                message = "Swipe recorded"
+            response.append(SwipeBatchResult(
+                swipee_id=swipe.swipee_id,
+                success=result.created,
+                swipe_id=result.swipe_id,
+                is_match=result.is_match,
+                message=message
+            ))
+        return response
+        
+    except Exception as e:
+        logger.exception("Error creating swipes")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create swipes: {str(e)}"
+        )
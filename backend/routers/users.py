@@ -1,32 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from bson import ObjectId
-import traceback
+from pymongo.errors import DuplicateKeyError
 
-from models import User, Match, Swipe
-from schemas import UserCreate, UserLogin, UserPublic, TokenResponse, UserProfileUpdate, ProfileUpdateResponse
-from config import JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from backend.models import User, Match, MatchParticipants, Swipe, UserCard, UserIdView, match_pair_key
+from backend.schemas import UserCreate, UserLogin, UserPublic, TokenResponse, UserProfileUpdate, ProfileUpdateResponse
+from backend.config import JWT_SECRET, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from backend.services import auth_cache, response_cache
+from backend.services.log import get_logger
+from backend.services.matching import profile_index
+from backend.services.passwords import hash_password_async, verify_and_update_password_async
+from backend.services.recommendation_queue import invalidate_exhausted, invalidate_user
+from backend.services.user_loader import UserLoader, get_user_loader
+from backend.services.fast_json import fast_response
+from backend.services.response_cache import MATCHES_VERSION, PROFILE_VERSION
 
 router = APIRouter(tags=["users"])
-
-# ---------- Password Hashing (RENDER-SAFE) ----------
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+logger = get_logger("routers.users")
 
 # ---------- Authentication ----------
 security = HTTPBearer()
 
-def hash_password(password: str) -> str:
-    safe_password = password[:72]
-    return pwd_context.hash(safe_password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    safe_password = plain_password[:72]
-    return pwd_context.verify(safe_password, hashed_password)
-
 # ---------- JWT Helpers ----------
 def create_access_token(data: dict, expires_delta: int = None):
     to_encode = data.copy()
@@ -37,46 +34,48 @@ def create_access_token(data: dict, expires_delta: int = None):
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str):
+    # Verified tokens are memoized until they expire
+    cached_user_id = auth_cache.cached_token_subject(token)
+    if cached_user_id is not None:
+        return cached_user_id
+
     try:
-        print(f"🔍 DEBUG: Verifying token: {token[:30]}...")
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        print(f"✅ DEBUG: Payload decoded: {payload}")
         user_id: str = payload.get("sub")
-        print(f"✅ DEBUG: Extracted user_id: {user_id}")
         
         if user_id is None:
-            print("❌ DEBUG: No user_id in payload")
+            logger.debug("Token without sub claim")
             raise HTTPException(status_code=401, detail="No user_id in token")
+        auth_cache.remember_token(token, user_id, payload.get("exp"))
         return user_id
         
-    except jwt.ExpiredSignatureError as e:
-        print(f"❌ DEBUG: Token expired: {e}")
+    except jwt.ExpiredSignatureError:
+        logger.debug("Token expired")
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.JWTError as e:
-        print(f"❌ DEBUG: JWT Error: {e}")
-        print(f"❌ DEBUG: Full traceback: {traceback.format_exc()}")
+        logger.debug("Invalid token: %s", e)
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-    except Exception as e:
-        print(f"❌ DEBUG: Unexpected error: {e}")
-        print(f"❌ DEBUG: Full traceback: {traceback.format_exc()}")
+    except Exception:
+        logger.exception("Token verification failed")
         raise HTTPException(status_code=500, detail="Token verification failed")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    print(f"🔍 DEBUG: get_current_user called with scheme: {credentials.scheme}")
-    print(f"🔍 DEBUG: Token length: {len(credentials.credentials)}")
-    
-    token = credentials.credentials
+async def authenticate_token(token: str) -> User:
+    """Resolve a bearer token to its User (shared by HTTP and WebSocket auth)."""
     user_id = verify_token(token)
-    print(f"🔍 DEBUG: Looking up user: {user_id}")
-    
+    user = auth_cache.user_cache.get(user_id)
+    if user is not None:
+        return user
+
     user = await User.get(user_id)
     if user is None:
-        print(f"❌ DEBUG: User {user_id} not found in DB")
+        logger.debug("Authenticated user %s not found", user_id)
         raise HTTPException(status_code=401, detail="User not found")
-    
-    print(f"✅ DEBUG: Found user: {user.email}")
+    auth_cache.user_cache.set(user_id, user)
     return user
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
 # 🔥 CRITICAL NEW ENDPOINT - FIXES "SAVE & SWIPE" 405 ERROR
 class ProfileUpdateSchema(BaseModel):
     subjects: list[str] = []
@@ -96,9 +95,6 @@ async def update_profile(
 ):
     """Complete user profile setup after signup - FIXES 405 ERROR"""
     try:
-        print(f"🔥 UPDATING PROFILE for {current_user.email}")
-        print(f"Profile data: {profile_data.dict()}")
-        
         # Update user document with ALL profile fields
         update_dict = {
             "subjects": profile_data.subjects,
@@ -116,7 +112,11 @@ async def update_profile(
         update_dict = {k: v for k, v in update_dict.items() if v or v == False}
         
         await current_user.set(update_dict)
-        print(f"✅ Profile updated successfully for {current_user.username}")
+        auth_cache.invalidate_user(str(current_user.id))
+        await response_cache.profile_changed(str(current_user.id))
+        profile_index.upsert(str(current_user.id), current_user)
+        await invalidate_user(str(current_user.id))
+        logger.debug("Profile updated for user %s: %s", current_user.id, sorted(update_dict))
         
         return {
             "message": "Profile updated successfully",
@@ -124,19 +124,35 @@ async def update_profile(
             "username": current_user.username
         }
         
-    except Exception as e:
-        print(f"❌ Profile update error: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Profile update failed")
         raise HTTPException(status_code=500, detail="Profile update failed")
 
+async def backfill_email_keys() -> int:
+    """Give legacy accounts an email_key so the unique email constraint covers them.
+
+    The oldest account of an email gets the key; later duplicates are left
+    without one (they can still log in as before). Returns the number of
+    users updated.
+    """
+    collection = User.get_motor_collection()
+    updated = 0
+    async for user in collection.find({"email_key": {"$exists": False}}, {"email": 1}).sort("_id", 1):
+        try:
+            await collection.update_one({"_id": user["_id"]}, {"$set": {"email_key": user["email"]}})
+            updated += 1
+        except DuplicateKeyError:
+            pass
+    return updated
+
 # ---------- Routes (UNCHANGED - ALL WORKING) ----------
 @router.post("/signup", response_model=UserPublic)
 async def signup(user: UserCreate):
-    existing = await User.find_one(User.email == user.email)
+    existing = await User.find_one(User.email == user.email).project(UserIdView)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -144,7 +160,13 @@ async def signup(user: UserCreate):
         subjects=user.subjects or [],
         availability=user.availability or [],
     )
-    await db_user.insert()
+    try:
+        await db_user.insert()
+    except DuplicateKeyError:
+        # A concurrent signup with the same email got in after the check
+        raise HTTPException(status_code=400, detail="Email already registered")
+    profile_index.upsert(str(db_user.id), db_user)
+    await invalidate_exhausted()
 
     return UserPublic(
         id=str(db_user.id),
@@ -160,9 +182,15 @@ async def login(user: UserLogin):
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    if not verify_password(user.password, db_user.password):
+    valid, new_hash = await verify_and_update_password_async(user.password, db_user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
+    # Transparently upgrade outdated hashes (e.g. bcrypt -> argon2)
+    if new_hash:
+        await db_user.set({"password": new_hash})
+        auth_cache.invalidate_user(str(db_user.id))
+
     token_data = {"sub": str(db_user.id), "email": db_user.email}
     access_token = create_access_token(token_data)
 
@@ -185,7 +213,12 @@ async def login(user: UserLogin):
     return TokenResponse(access_token=access_token, user=user_data)
 
 @router.get("/profile", response_model=UserPublic)
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    return await response_cache.conditional(
+        request, response, current_user, "profile", (PROFILE_VERSION,), _profile_public
+    )
+
+def _profile_public(current_user: User) -> UserPublic:
     return UserPublic(
         id=str(current_user.id),
         username=current_user.username,
@@ -203,7 +236,12 @@ async def get_profile(current_user: User = Depends(get_current_user)):
     )
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    return await response_cache.conditional(
+        request, response, current_user, "me", (PROFILE_VERSION,), _me
+    )
+
+def _me(current_user: User) -> dict:
     return {
         "id": str(current_user.id),
         "username": current_user.username,
@@ -222,47 +260,55 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # 🔥 MATCHES ENDPOINT - Shows your DB matches!
 @router.get("/matches")
-async def get_user_matches(current_user: User = Depends(get_current_user)):
-    """Get current user's matches from database"""
-    print(f"🔍 Fetching matches for {current_user.username}")
-    
+async def get_user_matches(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    loader: UserLoader = Depends(get_user_loader)
+):
+    """Get current user's matches from database (conditional GET via ETag)"""
+    body = await response_cache.conditional(
+        request, response, current_user, "users.matches", (MATCHES_VERSION,), lambda user: _user_matches(user, loader)
+    )
+    return fast_response(body, response)
+
+async def _user_matches(current_user: User, loader: UserLoader) -> list:
     matches = await Match.find({
         "$or": [
             {"user1_id": str(current_user.id)},
             {"user2_id": str(current_user.id)}
         ]
-    }).to_list()
+    }).project(MatchParticipants).to_list()
     
-    print(f"Found {len(matches)} raw matches")
+    other_ids = [
+        match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
+        for match in matches
+    ]
+    # One batched lookup instead of a User.get per match
+    users = await loader.load_many(other_ids)
     
     result = []
-    for match in matches:
-        # Get other user ID
-        other_id = match.user2_id if match.user1_id == str(current_user.id) else match.user1_id
-        
-        # Fetch other user details
-        other_user = await User.get(other_id)
+    for match, other_id in zip(matches, other_ids):
+        other_user = users.get(other_id)
         if other_user:
             result.append({
                 "id": str(match.id),
                 "user_id": str(other_user.id),
                 "username": other_user.username,
                 "email": other_user.email,
-                "subjects": getattr(other_user, 'subjects', []),
-                "availability": getattr(other_user, 'availability', []),
-                "bio": getattr(other_user, 'bio', ''),
+                "subjects": other_user.subjects,
+                "availability": other_user.availability,
+                "bio": other_user.bio or '',
                 "matched_at": match.matched_at.isoformat() if match.matched_at else None
             })
     
-    print(f"✅ Returning {len(result)} formatted matches")
+    logger.debug("Matches for user %s: %d of %d", current_user.id, len(result), len(matches))
     return result
 
 # 🔥 RECOMMENDATIONS - Users to swipe on
 @router.get("/recommendations")
 async def get_recommendations(current_user: User = Depends(get_current_user)):
     """Get other users with matching subjects/availability"""
-    print(f"🔍 Getting recommendations for {current_user.username}")
-    
     if not getattr(current_user, 'profile_completed', False):
         return []
     
@@ -284,20 +330,21 @@ async def get_recommendations(current_user: User = Depends(get_current_user)):
         {"$limit": 20}
     ]
     
-    candidates = await User.aggregate(pipeline).to_list()
+    # projection_model appends a $project stage: only card fields come back
+    candidates = await User.aggregate(pipeline, projection_model=UserCard).to_list()
     
     result = []
     for user in candidates:
         result.append({
-            "id": str(user['_id']),
-            "username": user['username'],
-            "subjects": user.get('subjects', []),
-            "availability": user.get('availability', []),
-            "bio": user.get('bio', ''),
-            "profile_completed": user.get('profile_completed', False)
+            "id": str(user.id),
+            "username": user.username,
+            "subjects": user.subjects,
+            "availability": user.availability,
+            "bio": user.bio or '',
+            "profile_completed": user.profile_completed
         })
     
-    print(f"✅ {len(result)} recommendations")
+    logger.debug("Recommendations for user %s: %d", current_user.id, len(result))
     return result
 
 # 🔥 SWIPE ENDPOINT - Creates matches!
@@ -307,8 +354,6 @@ async def swipe_user(swipe_data: dict, current_user: User = Depends(get_current_
     target_id = swipe_data.get("user_id")
     direction = swipe_data.get("direction")
     
-    print(f"👆 {current_user.username} swiped {direction} on {target_id}")
-    
     if not target_id:
         raise HTTPException(400, "Missing user_id")
     
@@ -334,10 +379,12 @@ async def swipe_user(swipe_data: dict, current_user: User = Depends(get_current_
             match = Match(
                 user1_id=str(min(current_user.id, ObjectId(target_id))),
                 user2_id=str(max(current_user.id, ObjectId(target_id))),
-                matched_at=datetime.utcnow()
+                matched_at=datetime.utcnow(),
+                pair_key=match_pair_key(str(current_user.id), target_id)
             )
             await match.insert()
-            print(f"🎉 MATCH CREATED: {current_user.username} + {target_id}")
+            await response_cache.bump([match.user1_id, match.user2_id], MATCHES_VERSION)
+            logger.debug("Match created: %s + %s", current_user.id, target_id)
             return {"matched": True, "message": "It's a match! 🎉"}
     
     return {"swiped": True, "direction": direction}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -59,6 +59,16 @@ class SwipeResponse(BaseModel):
     is_match: bool = False
     message: Optional[str] = None
 
+class SwipeBatchInput(BaseModel):
+    swipes: List[SwipeInput] = Field(..., min_length=1, max_length=100)  # in swipe order
+
+class SwipeBatchResult(BaseModel):
+    swipee_id: str
+    success: bool
+    swipe_id: Optional[str] = None
+    is_match: bool = False
+    message: Optional[str] = None
+
 # ---------- Match ----------
 class MatchPublic(BaseModel):
     id: str
@@ -166,5 +176,13 @@ class NotificationBase(BaseModel):
 class NotificationPublic(NotificationBase):
     id: str
     user_id: str
+    ref_id: Optional[str] = None  # match_id for "match" / "message"
     read: bool = False
+    read_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
+
+class NotificationReadInput(BaseModel):
+    ids: Optional[List[str]] = None  # omit to mark everything read
+
+class NotificationCount(BaseModel):
+    unread_count: int
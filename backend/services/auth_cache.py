@@ -0,0 +1,37 @@
+import time
+from typing import Optional
+
+from backend.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_USER_CACHE_SIZE,
+    AUTH_USER_CACHE_TTL_SECONDS,
+    AUTH_TOKEN_CACHE_SIZE,
+)
+from backend.services.cache import TTLCache
+
+# Authenticated User documents by user ID. Invalidate on every write to a user.
+user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS)
+
+# Verified tokens -> user ID, kept until the token's own expiry
+token_cache = TTLCache(maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def cached_token_subject(token: str) -> Optional[str]:
+    return token_cache.get(token)
+
+
+def remember_token(token: str, user_id: str, exp: Optional[float]) -> None:
+    """Memoize a verified token until its ``exp`` (unix seconds)."""
+    if exp is None:
+        return
+    remaining = exp - time.time()
+    if remaining > 0:
+        token_cache.set(token, user_id, expires_at=time.monotonic() + remaining)
+
+
+def invalidate_user(user_id: str) -> None:
+    user_cache.pop(user_id)
+
+
+def stats() -> dict:
+    return {"users": user_cache.stats(), "tokens": token_cache.stats()}
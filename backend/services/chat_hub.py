@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from backend.config import CHAT_BACKPLANE, CHAT_PRESENCE_SECONDS
+from backend.services.fast_json import dumps_text
+from backend.services.log import get_logger
+from backend.services.room_backplane import Backplane, create_backplane
+from backend.services.ws_connection import QueuedWebSocket
+
+logger = get_logger("services.chat_hub")
+
+# Backplane key of presence events; every other key is a user ID
+PRESENCE = "*"
+
+
+class ChatHub:
+    """Registry of open /ws/chat sockets keyed by user ID.
+
+    A user may have several sockets (tabs/devices) and, with a distributed
+    backplane, they may live on other workers: ``push`` delivers locally and
+    forwards the event to the other workers under the user's ID.
+
+    Workers also publish which users are connected to them: shortly after a
+    user's first socket opens or last one closes, and every
+    ``presence_interval`` seconds. Ephemeral events (typing) are only
+    forwarded for users connected elsewhere.
+    """
+
+    def __init__(self, backplane: Backplane, presence_interval: float = CHAT_PRESENCE_SECONDS, presence_tick: float = 0.5):
+        self.backplane = backplane
+        self.connections: Dict[str, Set[QueuedWebSocket]] = {}
+        self.remote_online: Dict[str, Tuple[float, Set[str]]] = {}  # worker -> (seen, user IDs)
+        self.presence_interval = presence_interval
+        self.presence_tick = presence_tick  # batches the presence changes of a burst of connects
+        self._presence_changed = False
+        self._presence_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.backplane.start(self.handle_event)
+        if self.backplane.distributed and self._presence_task is None:
+            self._presence_task = asyncio.create_task(self._presence_loop())
+            # Workers already running answer with who is connected to them
+            await self.backplane.publish(PRESENCE, {"type": "sync_request"})
+
+    async def stop(self) -> None:
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+            try:
+                await self._presence_task
+            except asyncio.CancelledError:
+                pass
+            self._presence_task = None
+        await self.backplane.stop()
+
+    def register(self, user_id: str, conn: QueuedWebSocket) -> None:
+        if user_id not in self.connections:
+            self._presence_changed = True
+        self.connections.setdefault(user_id, set()).add(conn)
+
+    def unregister(self, user_id: str, conn: QueuedWebSocket) -> None:
+        conns = self.connections.get(user_id)
+        if conns is not None:
+            conns.discard(conn)
+            if not conns:
+                self.connections.pop(user_id, None)
+                self._presence_changed = True
+
+    def online_elsewhere(self, user_id: str) -> bool:
+        """Whether another worker reported a socket of ``user_id`` recently."""
+        expired_before = time.monotonic() - 3 * self.presence_interval
+        return any(user_id in users for seen, users in self.remote_online.values() if seen >= expired_before)
+
+    def _deliver(self, user_id: str, text: str) -> int:
+        return sum(conn.send(text) for conn in list(self.connections.get(user_id, ())))
+
+    async def push(self, user_ids: Iterable[str], event: dict, ephemeral: bool = False) -> int:
+        """Send ``event`` to every socket of each user. Returns local deliveries.
+
+        An ``ephemeral`` event is dropped for users with no socket on another
+        worker instead of being published: with the Mongo backplane every
+        publish is an insert, and typing frames arrive per keystroke.
+        """
+        text = dumps_text(event)
+        delivered = 0
+        for user_id in user_ids:
+            delivered += self._deliver(user_id, text)
+            if self.backplane.distributed and (not ephemeral or self.online_elsewhere(user_id)):
+                await self.backplane.publish(user_id, event)
+        return delivered
+
+    async def handle_event(self, worker: str, user_id: str, event: dict) -> None:
+        if user_id == PRESENCE:
+            if event["type"] == "online":
+                self.remote_online[worker] = (time.monotonic(), set(event["users"]))
+            elif event["type"] == "sync_request":
+                await self.publish_presence()
+            return
+        if user_id in self.connections:
+            self._deliver(user_id, dumps_text(event))
+
+    async def publish_presence(self) -> None:
+        await self.backplane.publish(PRESENCE, {"type": "online", "users": list(self.connections)})
+
+    async def _presence_loop(self) -> None:
+        """Publish presence on change and every interval; drop workers that went silent."""
+        published_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.presence_tick)
+            now = time.monotonic()
+            if not self._presence_changed and now - published_at < self.presence_interval:
+                continue
+            self._presence_changed = False
+            published_at = now
+            try:
+                await self.publish_presence()
+                expired_before = now - 3 * self.presence_interval
+                for worker in [w for w, (seen, _) in self.remote_online.items() if seen < expired_before]:
+                    self.remote_online.pop(worker, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Chat presence heartbeat failed")
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.connections),
+            "sockets": sum(len(conns) for conns in self.connections.values()),
+            "workers_seen": len(self.remote_online),
+        }
+
+
+chat_hub = ChatHub(create_backplane(CHAT_BACKPLANE, channel="chat"))
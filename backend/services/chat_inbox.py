@@ -0,0 +1,49 @@
+from typing import List
+from backend.models import Chat
+
+
+def build_inbox_pipeline(user_id: str) -> List[dict]:
+    """Aggregation over the denormalized chat summaries, newest first.
+
+    Uses the (participants, last_message_at) index for the match + sort and a
+    single $lookup for the other participant's username. Each row carries the
+    other participant's id/username, the last message, the unread count for
+    ``user_id`` and ``created_at``.
+    """
+    return [
+        {"$match": {"participants": user_id, "is_active": True}},
+        {"$sort": {"last_message_at": -1}},
+        {"$addFields": {
+            "other_user_id": {"$arrayElemAt": [
+                {"$filter": {"input": "$participants", "cond": {"$ne": ["$$this", user_id]}}}, 0
+            ]},
+        }},
+        {"$lookup": {
+            "from": "users",
+            "let": {"other_id": {
+                "$convert": {"input": "$other_user_id", "to": "objectId", "onError": None, "onNull": None}
+            }},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$other_id"]}}},
+                {"$project": {"_id": 0, "username": 1}},
+            ],
+            "as": "other_user",
+        }},
+        # Drop chats whose other participant no longer exists
+        {"$unwind": "$other_user"},
+        {"$project": {
+            "_id": 0,
+            "match_id": 1,
+            "other_user_id": 1,
+            "other_user_username": "$other_user.username",
+            "created_at": 1,
+            "last_message": 1,
+            "last_message_at": 1,
+            "unread_count": {"$ifNull": [f"$unread_counts.{user_id}", 0]},
+        }},
+    ]
+
+
+async def fetch_inbox(user_id: str) -> List[dict]:
+    """Run the inbox pipeline in one round trip."""
+    return await Chat.aggregate(build_inbox_pipeline(user_id)).to_list()
@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from backend.models import Chat, Match, Message
+
+# Keeps the denormalized per-match Chat documents in sync with `messages`.
+# All writes are single atomic updates keyed on the unique `match_id`.
+
+
+def _unread_field(user_id: str) -> str:
+    return f"unread_counts.{user_id}"
+
+
+async def ensure_chat(match: Match) -> None:
+    """Create the (empty) chat summary for a new match if it does not exist."""
+    await Chat.get_motor_collection().update_one(
+        {"match_id": str(match.id)},
+        {"$setOnInsert": {
+            "participants": [match.user1_id, match.user2_id],
+            "last_message": None,
+            "last_message_at": None,
+            "last_sender_id": None,
+            "created_at": match.matched_at or datetime.utcnow(),
+            "is_active": True,
+        }},
+        upsert=True,
+    )
+
+
+async def record_message(match: Match, message: Message) -> None:
+    """Update last message and bump the receiver's unread counter.
+
+    The last message only moves forward in ``sent_at``: when sends race, an
+    older message that lands second still counts as unread but does not
+    replace the newer one.
+    """
+    collection = Chat.get_motor_collection()
+    not_newer = {"match_id": message.match_id, "$or": [
+        {"last_message_at": None},
+        {"last_message_at": {"$lte": message.sent_at}},
+    ]}
+    last = {
+        "last_message": message.content,
+        "last_message_at": message.sent_at,
+        "last_sender_id": message.sender_id,
+        "is_active": True,
+    }
+    unread = {"$inc": {_unread_field(message.receiver_id): 1}}
+    try:
+        await collection.update_one(
+            not_newer,
+            {
+                "$set": last,
+                **unread,
+                "$setOnInsert": {
+                    "participants": [match.user1_id, match.user2_id],
+                    "created_at": match.matched_at or message.sent_at,
+                },
+            },
+            upsert=True,
+        )
+        return
+    except DuplicateKeyError:
+        pass  # The chat exists and shows a newer message, or was created concurrently
+    result = await collection.update_one(not_newer, {"$set": last, **unread})
+    if not result.matched_count:
+        await collection.update_one({"match_id": message.match_id}, unread)
+
+
+async def mark_chat_read(match_id: str, user_id: str, count: Optional[int] = None) -> None:
+    """Decrement ``user_id``'s unread counter by ``count`` (or reset it).
+
+    Decrementing by the number of messages actually flipped to read keeps the
+    counter exact when new messages arrive concurrently; it never goes below 0.
+    """
+    field = _unread_field(user_id)
+    if count is None:
+        update = {"$set": {field: 0}}
+    elif count <= 0:
+        return
+    else:
+        update = [{"$set": {field: {
+            "$max": [0, {"$subtract": [{"$ifNull": [f"${field}", 0]}, count]}]
+        }}}]
+    await Chat.get_motor_collection().update_one({"match_id": match_id}, update)
+
+
+async def rebuild_chat_summaries(match_ids: Optional[List[str]] = None) -> int:
+    """Regenerate the Chat summaries of ``match_ids`` (default: every match)
+    from `matches` + `messages`.
+
+    Returns the number of chat documents written.
+    """
+    messages_filter = {"match_id": {"$in": match_ids}} if match_ids is not None else {}
+    matches_filter = {"_id": {"$in": [ObjectId(m) for m in match_ids]}} if match_ids is not None else {}
+
+    last_messages = {}
+    pipeline = [
+        {"$match": messages_filter},
+        {"$sort": {"sent_at": -1}},
+        {"$group": {
+            "_id": "$match_id",
+            "last_message": {"$first": "$content"},
+            "last_message_at": {"$first": "$sent_at"},
+            "last_sender_id": {"$first": "$sender_id"},
+        }},
+    ]
+    async for row in Message.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        last_messages[row["_id"]] = row
+
+    unread = {}
+    pipeline = [
+        {"$match": {**messages_filter, "is_read": False}},
+        {"$group": {"_id": {"match_id": "$match_id", "receiver_id": "$receiver_id"}, "count": {"$sum": 1}}},
+    ]
+    async for row in Message.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        unread.setdefault(row["_id"]["match_id"], {})[row["_id"]["receiver_id"]] = row["count"]
+
+    operations = []
+    written = 0
+    async for match in Match.get_motor_collection().find(matches_filter):
+        match_id = str(match["_id"])
+        participants = [match["user1_id"], match["user2_id"]]
+        last = last_messages.get(match_id, {})
+        counts = unread.get(match_id, {})
+        operations.append(UpdateOne(
+            {"match_id": match_id},
+            {
+                "$set": {
+                    "participants": participants,
+                    "last_message": last.get("last_message"),
+                    "last_message_at": last.get("last_message_at"),
+                    "last_sender_id": last.get("last_sender_id"),
+                    "unread_counts": {uid: counts.get(uid, 0) for uid in participants},
+                    "is_active": True,
+                },
+                "$setOnInsert": {"created_at": match.get("matched_at") or datetime.utcnow()},
+            },
+            upsert=True,
+        ))
+        if len(operations) >= 1000:
+            await Chat.get_motor_collection().bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+
+    if operations:
+        await Chat.get_motor_collection().bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+
+async def backfill_missing_chats(batch_size: int = 1000) -> int:
+    """Create the summaries of matches that predate them (run at startup).
+
+    Matches that already have a Chat document are left alone. Returns the
+    number of chat documents written.
+    """
+    have = set()
+    async for chat in Chat.get_motor_collection().find({}, {"_id": 0, "match_id": 1}):
+        have.add(chat["match_id"])
+
+    written = 0
+    missing: List[str] = []
+    async for match in Match.get_motor_collection().find({}, {"_id": 1}):
+        if str(match["_id"]) not in have:
+            missing.append(str(match["_id"]))
+        if len(missing) >= batch_size:
+            written += await rebuild_chat_summaries(missing)
+            missing = []
+    if missing:
+        written += await rebuild_chat_summaries(missing)
+    return written
@@ -0,0 +1,90 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.config import EVENT_BUS_QUEUE_SIZE
+from backend.services.log import get_logger
+
+logger = get_logger("services.events")
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+# Event types
+MATCH_CREATED = "match.created"  # {"match_id", "user_ids"}
+MESSAGE_SENT = "message.sent"  # {"match_id", "message_id", "sender_id", "sender_username", "receiver_id", "content"}
+
+
+class EventBus:
+    """In-process publish/subscribe for side effects of a request.
+
+    ``publish`` only enqueues: handlers run one event at a time on the bus's
+    worker task, so publishers never wait on delivery and a failing handler
+    cannot fail the request that published. Events are lost on a crash.
+    """
+
+    def __init__(self, maxsize: int):
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def subscribe(self, event_type: str, handler: Handler) -> None:
+        if handler not in self._handlers[event_type]:
+            self._handlers[event_type].append(handler)
+
+    def publish(self, event_type: str, payload: dict) -> bool:
+        try:
+            self._queue.put_nowait((event_type, payload))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Event bus full; dropped %s", event_type)
+            return False
+        self.published += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            event_type, payload = await self._queue.get()
+            try:
+                for handler in self._handlers.get(event_type, ()):
+                    try:
+                        await handler(payload)
+                    except Exception:
+                        self.failed += 1
+                        logger.exception("Handler %s failed for %s", getattr(handler, "__name__", handler), event_type)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Event bus stopped with %d events pending", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # The queue is bound to this event loop; a restart (e.g. a new app
+        # lifespan in tests) gets a fresh one. Undrained events were lost anyway.
+        self._queue = asyncio.Queue(self._queue.maxsize)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "published": self.published,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+event_bus = EventBus(EVENT_BUS_QUEUE_SIZE)
@@ -0,0 +1,56 @@
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from pydantic import BaseModel
+
+# One encoder for HTTP bodies and WebSocket frames. orjson handles datetime,
+# UUID and numpy values natively; ObjectIds and pydantic models go through
+# _default, anything else falls back to str() like json.dumps(default=str).
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=OPTIONS)
+
+
+def dumps_text(obj: Any) -> str:
+    """Encode a WebSocket frame once; the same str is queued on every socket.
+
+    Frames stay text frames: browsers hand binary frames to ``onmessage`` as
+    Blobs, and clients ``JSON.parse(event.data)`` directly.
+    """
+    return dumps(obj).decode()
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """Default response class of the app (see main.py)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, response: Optional[Response] = None) -> Response:
+    """Serialize ``content`` once, skipping FastAPI's response_model pass.
+
+    For hot endpoints whose body is already built from validated data.
+    Headers set on the injected ``response`` (cursors, ETag) are carried
+    over, and a ready-made Response (e.g. a 304) is returned as is.
+    """
+    if isinstance(content, Response):
+        return content
+    fast = ORJSONResponse(content)
+    if response is not None:
+        fast.headers.raw.extend(response.headers.raw)
+    return fast
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+
+from backend.models import (
+    Chat, Match, Message, Notification, NotificationCounter, RecommendationQueue, StudyRoomMessage, Swipe, User,
+)
+
+# Query shapes issued by the routers, with placeholder values.
+# (document, filter, sort)
+_ID = str(ObjectId())
+_OTHER_ID = str(ObjectId())
+
+QUERY_SHAPES: List[Tuple[type, dict, Optional[list]]] = [
+    (User, {"email": "someone@example.com"}, None),
+    (User, {"_id": {"$in": [ObjectId(_ID)]}}, None),
+    (Swipe, {"swiper_id": _ID}, None),
+    (Swipe, {"swiper_id": _ID, "swipee_id": _OTHER_ID}, None),
+    (Swipe, {"swiper_id": _ID, "swipee_id": {"$in": [_OTHER_ID]}}, None),
+    (Swipe, {"swiper_id": _OTHER_ID, "swipee_id": _ID, "direction": "right"}, None),
+    (Match, {"$or": [{"user1_id": _ID}, {"user2_id": _ID}]}, None),
+    (Match, {"pair_key": f"{_ID}:{_OTHER_ID}"}, None),
+    (Message, {"match_id": _ID}, [("sent_at", -1), ("_id", -1)]),
+    (Message, {"match_id": _ID, "receiver_id": _ID, "is_read": False}, None),
+    (Message, {"match_id": {"$in": [_ID, _OTHER_ID]}}, [("sent_at", -1)]),
+    (Chat, {"match_id": _ID}, None),
+    (Chat, {"participants": _ID, "is_active": True}, [("last_message_at", -1)]),
+    (RecommendationQueue, {"user_id": _ID}, None),
+    (RecommendationQueue, {"candidates.id": _ID}, None),
+    (RecommendationQueue, {"exhausted": True, "stale": False}, None),
+    (RecommendationQueue, {
+        "last_requested_at": {"$gte": datetime(2024, 1, 1)},
+        "$or": [{"stale": True}, {"exhausted": False, "size": {"$lt": 50}}],
+    }, None),
+    (StudyRoomMessage, {"room_id": "room"}, [("seq", -1)]),
+    (Notification, {"user_id": _ID}, [("created_at", -1), ("_id", -1)]),
+    (Notification, {"user_id": _ID, "read": False}, [("created_at", -1), ("_id", -1)]),
+    (NotificationCounter, {"user_id": _ID}, None),
+]
+
+
+def _stages(plan: dict):
+    """Yield every stage name in a (possibly nested) winning plan."""
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def uncovered_query_shapes() -> List[dict]:
+    """Explain every known query shape and report the ones not using an index.
+
+    A shape is reported when its winning plan contains a COLLSCAN or an
+    in-memory SORT.
+    """
+    report = []
+    for document, query, sort in QUERY_SHAPES:
+        cursor = document.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # Newer servers wrap the classic plan in queryPlan
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        stages = set(_stages(winning_plan))
+        problems = sorted(stages & {"COLLSCAN", "SORT"})
+        if problems:
+            report.append({
+                "collection": document.get_motor_collection().name,
+                "filter": query,
+                "sort": sort,
+                "stages": problems,
+            })
+    return report
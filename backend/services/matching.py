@@ -1,51 +1,322 @@
-from typing import List
-from backend.models import User, Swipe, Match
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from backend.models import User, Swipe, Match, match_pair_key
+from backend.services.profile_index import ProfileIndex
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Weight of each profile list in the compatibility score
+SCORE_WEIGHTS: Dict[str, int] = {
+    "subjects": 2,
+    "availability": 1,
+    "interests": 1,
+    "study_habits": 1,
+}
+
+# Fields returned for each recommended user
+CANDIDATE_FIELDS = (
+    "username", "email", "subjects", "availability", "study_habits", "interests",
+    "bio", "academic_level", "study_location", "preferred_study_time",
+)
+
+# Candidate generation index, rebuilt at startup (see main.py)
+profile_index = ProfileIndex(SCORE_WEIGHTS)
+
+def _normalize(values: Optional[list]) -> List[str]:
+    return sorted(set([x.strip().lower() for x in values or []]))
 
 def _overlap(a: list, b: list) -> int:
     return len(set([x.strip().lower() for x in a]) & set([y.strip().lower() for y in b]))
 
-async def suggested_users_for(user: User, limit: int = 10) -> List[User]:
-    # Users already swiped
-    swiped_ids = set()
-    async for sw in Swipe.find(Swipe.from_user == str(user.id)):
-        swiped_ids.add(sw.to_user)
+def compatibility_score(user, other) -> int:
+    """Weighted overlap of subjects, availability, interests and study habits."""
+    return sum(
+        weight * _overlap(getattr(user, field, None) or [], getattr(other, field, None) or [])
+        for field, weight in SCORE_WEIGHTS.items()
+    )
+
+def _normalized_expr(field: str) -> dict:
+    return {"$setUnion": [{"$map": {
+        "input": {"$ifNull": [f"${field}", []]},
+        "in": {"$toLower": {"$trim": {"input": "$$this"}}},
+    }}]}
+
+def build_recommendation_pipeline(user, limit: int = 10, offset: int = 0) -> List[dict]:
+    """Rank every other user server-side by compatibility_score.
+
+    Users already swiped by ``user`` are excluded with an indexed $lookup on
+    swipes (swiper_id, swipee_id) instead of an ever-growing $nin list.
+    """
+    user_id = str(user.id)
+    score_terms = [
+        {"$multiply": [weight, {"$size": {"$setIntersection": [
+            _normalized_expr(field), {"$literal": _normalize(getattr(user, field, None))},
+        ]}}]}
+        for field, weight in SCORE_WEIGHTS.items()
+    ]
+    return [
+        {"$match": {"_id": {"$ne": user.id}}},
+        {"$addFields": {"_id_str": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": "swipes",
+            "localField": "_id_str",
+            "foreignField": "swipee_id",
+            "pipeline": [{"$match": {"swiper_id": user_id}}, {"$limit": 1}, {"$project": {"_id": 1}}],
+            "as": "already_swiped",
+        }},
+        {"$match": {"already_swiped": {"$size": 0}}},
+        {"$addFields": {"compatibility_score": {"$add": score_terms}}},
+        {"$sort": {"compatibility_score": -1, "_id": 1}},
+        {"$skip": offset},
+        {"$limit": limit},
+        {"$project": {"compatibility_score": 1, **{field: 1 for field in CANDIDATE_FIELDS}}},
+    ]
+
+async def _recommend_from_index(user, limit: int, offset: int) -> Optional[List[dict]]:
+    """Rank candidates from the inverted index and hydrate one page.
+
+    Swiped users are filtered chunk by chunk with an indexed ``$in`` on
+    swipes. Returns None when the index has fewer positive-score candidates
+    than the page needs (zero-score users are only ranked by the pipeline).
+    """
+    user_id = str(user.id)
+    ranked = profile_index.ranked(user, exclude_id=user_id)
+    wanted = offset + limit
+
+    page: List[tuple] = []
+    position = 0
+    while len(page) < wanted and position < len(ranked):
+        chunk = ranked[position:position + 2 * (wanted - len(page))]
+        position += len(chunk)
+        swiped = set()
+        async for sw in Swipe.get_motor_collection().find(
+            {"swiper_id": user_id, "swipee_id": {"$in": [cid for cid, _ in chunk]}},
+            {"swipee_id": 1}
+        ):
+            swiped.add(sw["swipee_id"])
+        page.extend(t for t in chunk if t[0] not in swiped)
+
+    if len(page) < wanted:
+        return None
+    page = page[offset:wanted]
+
+    docs = {}
+    projection = {field: 1 for field in CANDIDATE_FIELDS}
+    async for doc in User.get_motor_collection().find(
+        {"_id": {"$in": [ObjectId(cid) for cid, _ in page]}}, projection
+    ):
+        docs[str(doc.pop("_id"))] = doc
 
     candidates = []
-    async for u in User.find():
-        if str(u.id) == str(user.id) or str(u.id) in swiped_ids:
+    for candidate_id, score in page:
+        doc = docs.get(candidate_id)
+        if doc is not None:  # Deleted since it was indexed
+            candidates.append({"id": candidate_id, **doc, "compatibility_score": score})
+    return candidates
+
+async def recommend_users(user, limit: int = 10, offset: int = 0) -> List[dict]:
+    """Ranked page of users to swipe on, best match first.
+
+    Each dict carries ``id`` plus CANDIDATE_FIELDS and ``compatibility_score``.
+    Uses the in-process inverted index when it is built and can fill the
+    page, and the aggregation pipeline otherwise; both rank identically.
+    """
+    if profile_index.ready:
+        candidates = await _recommend_from_index(user, limit, offset)
+        if candidates is not None:
+            return candidates
+
+    pipeline = build_recommendation_pipeline(user, limit=limit, offset=offset)
+    candidates = await User.aggregate(pipeline).to_list()
+    for candidate in candidates:
+        candidate["id"] = str(candidate.pop("_id"))
+    return candidates
+
+class SwipeResult(NamedTuple):
+    created: bool  # False when the pair was already swiped (idempotent replay)
+    swipe_id: Optional[str]
+    is_match: bool
+    new_match: Optional[Match]  # Set only for the request that created the match
+
+async def upsert_match(user_a: str, user_b: str, matched_at: Optional[datetime] = None) -> Optional[Match]:
+    """Create the match for a pair unless it exists; safe under concurrency.
+
+    Keyed on the unique canonical pair_key, so simultaneous mutual swipes
+    produce exactly one match. Returns the new Match, or None if it existed.
+    """
+    matched_at = matched_at or datetime.utcnow()
+    pair_key = match_pair_key(user_a, user_b)
+    try:
+        result = await Match.get_motor_collection().update_one(
+            {"pair_key": pair_key},
+            {"$setOnInsert": {"user1_id": user_a, "user2_id": user_b, "matched_at": matched_at}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None  # Lost the race to a concurrent upsert of the same pair
+    if result.upserted_id is None:
+        return None
+    return Match(id=result.upserted_id, user1_id=user_a, user2_id=user_b,
+                 matched_at=matched_at, pair_key=pair_key)
+
+async def record_swipe(swiper_id: str, swipee_id: str, direction: str) -> SwipeResult:
+    """Record a swipe and create the match on a mutual right swipe.
+
+    The swipe is a single upsert on the unique (swiper_id, swipee_id) key, so
+    replays are no-ops. A right swipe adds one indexed reciprocal lookup and,
+    when mutual, one conditional match upsert.
+    """
+    swiped_at = datetime.utcnow()
+    try:
+        result = await Swipe.get_motor_collection().update_one(
+            {"swiper_id": swiper_id, "swipee_id": swipee_id},
+            {"$setOnInsert": {"direction": direction, "swiped_at": swiped_at}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return SwipeResult(False, None, False, None)
+    if result.upserted_id is None:
+        return SwipeResult(False, None, False, None)
+
+    swipe_id = str(result.upserted_id)
+    if direction != "right":
+        return SwipeResult(True, swipe_id, False, None)
+
+    reciprocal = await Swipe.get_motor_collection().find_one(
+        {"swiper_id": swipee_id, "swipee_id": swiper_id, "direction": "right"},
+        {"_id": 1}
+    )
+    if not reciprocal:
+        return SwipeResult(True, swipe_id, False, None)
+
+    match = await upsert_match(swiper_id, swipee_id, swiped_at)
+    return SwipeResult(True, swipe_id, True, match)
+
+async def record_swipes(swiper_id: str, swipes: List[tuple]) -> List[SwipeResult]:
+    """Batch version of record_swipe for an ordered list of (swipee_id, direction).
+
+    All swipes are written with one unordered bulk_write of upserts, mutual
+    right swipes are found with one query, and new matches are created with
+    one more bulk_write. Results are returned in input order; repeats of a
+    pair within the batch are reported as already swiped.
+    """
+    swiped_at = datetime.utcnow()
+    results: List[Optional[SwipeResult]] = [None] * len(swipes)
+
+    seen = set()
+    operations, positions = [], []
+    for position, (swipee_id, direction) in enumerate(swipes):
+        if swipee_id in seen:
+            results[position] = SwipeResult(False, None, False, None)
             continue
-        score = _overlap(user.subjects, u.subjects) * 2 + _overlap(user.availability, u.availability)
-        if score > 0:
-            candidates.append((score, u))
-
-    candidates.sort(key=lambda t: t[0], reverse=True)
-    return [u for _, u in candidates[:limit]]
-
-async def record_swipe(from_user_id: str, to_user_id: str, direction: str) -> bool:
-    if direction not in ("left", "right"):
-        raise ValueError("direction must be 'left' or 'right'")
-
-    # Record swipe
-    swipe = await Swipe.find_one({"from_user": from_user_id, "to_user": to_user_id})
-    if swipe:
-        swipe.direction = direction
-        await swipe.save()
-    else:
-        swipe = Swipe(from_user=from_user_id, to_user=to_user_id, direction=direction)
-        await swipe.insert()
-
-    # Check for mutual right swipe
-    if direction == "right":
-        reciprocal = await Swipe.find_one({"from_user": to_user_id, "to_user": from_user_id, "direction": "right"})
-        if reciprocal:
-            # Create match if not exists
-            existing_match = await Match.find_one(
-                {"user1_id": {"$in": [from_user_id, to_user_id]},
-                 "user2_id": {"$in": [from_user_id, to_user_id]}}
+        seen.add(swipee_id)
+        operations.append(UpdateOne(
+            {"swiper_id": swiper_id, "swipee_id": swipee_id},
+            {"$setOnInsert": {"direction": direction, "swiped_at": swiped_at}},
+            upsert=True,
+        ))
+        positions.append(position)
+
+    upserted = await _bulk_upserted_ids(Swipe, operations)
+
+    right_swipees = []
+    for op_index, position in enumerate(positions):
+        swipee_id, direction = swipes[position]
+        swipe_id = upserted.get(op_index)
+        results[position] = SwipeResult(swipe_id is not None, str(swipe_id) if swipe_id else None, False, None)
+        if swipe_id is not None and direction == "right":
+            right_swipees.append(swipee_id)
+
+    if not right_swipees:
+        return results
+
+    # One query for every reciprocal right swipe
+    mutual = set()
+    async for sw in Swipe.get_motor_collection().find(
+        {"swiper_id": {"$in": right_swipees}, "swipee_id": swiper_id, "direction": "right"},
+        {"swiper_id": 1}
+    ):
+        mutual.add(sw["swiper_id"])
+    if not mutual:
+        return results
+
+    mutual = [swipee_id for swipee_id in right_swipees if swipee_id in mutual]
+    operations = [
+        UpdateOne(
+            {"pair_key": match_pair_key(swiper_id, swipee_id)},
+            {"$setOnInsert": {"user1_id": swiper_id, "user2_id": swipee_id, "matched_at": swiped_at}},
+            upsert=True,
+        )
+        for swipee_id in mutual
+    ]
+    upserted = await _bulk_upserted_ids(Match, operations)
+    new_matches = {
+        mutual[op_index]: Match(id=match_id, user1_id=swiper_id, user2_id=mutual[op_index],
+                                matched_at=swiped_at, pair_key=match_pair_key(swiper_id, mutual[op_index]))
+        for op_index, match_id in upserted.items()
+    }
+
+    for position, (swipee_id, _) in enumerate(swipes):
+        result = results[position]
+        if result.created and swipee_id in mutual:
+            results[position] = result._replace(is_match=True, new_match=new_matches.get(swipee_id))
+    return results
+
+async def _bulk_upserted_ids(document, operations: list) -> Dict[int, ObjectId]:
+    """Run unordered upserts; return {operation index: upserted _id}.
+
+    Duplicate key errors (lost races with concurrent upserts) count as
+    "already existed"; any other write error is raised.
+    """
+    if not operations:
+        return {}
+    try:
+        result = await document.get_motor_collection().bulk_write(operations, ordered=False)
+        return dict(result.upserted_ids)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+async def dedupe_swipes(collection) -> int:
+    """Delete repeated swipes of a pair so the unique swipe index can be built.
+
+    Runs on the raw collection before init_beanie creates that index, and
+    only while it is missing. The first swipe of a pair is kept, as
+    record_swipe does for replays. Returns the number of swipes deleted.
+    """
+    for spec in (await collection.index_information()).values():
+        if spec["key"] == [("swiper_id", 1), ("swipee_id", 1)] and spec.get("unique"):
+            return 0
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": {"swiper_id": "$swiper_id", "swipee_id": "$swipee_id"}, "ids": {"$push": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    repeated = []
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        repeated.extend(group["ids"][1:])
+    if not repeated:
+        return 0
+    result = await collection.delete_many({"_id": {"$in": repeated}})
+    return result.deleted_count
+
+async def backfill_match_pair_keys() -> int:
+    """Give legacy matches a pair_key so the unique constraint covers them.
+
+    Later duplicates of an already-keyed pair are left without a key.
+    Returns the number of matches updated.
+    """
+    collection = Match.get_motor_collection()
+    updated = 0
+    async for match in collection.find({"pair_key": {"$exists": False}}, {"user1_id": 1, "user2_id": 1}):
+        try:
+            await collection.update_one(
+                {"_id": match["_id"]},
+                {"$set": {"pair_key": match_pair_key(match["user1_id"], match["user2_id"])}}
             )
-            if not existing_match:
-                match = Match(user1_id=from_user_id, user2_id=to_user_id)
-                await match.insert()
-            return True
-    return False
+            updated += 1
+        except DuplicateKeyError:
+            pass
+    return updated
@@ -0,0 +1,152 @@
+import bisect
+import contextvars
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from pymongo import monitoring
+
+# In-process request/DB metrics rendered in the Prometheus text format.
+# Deliberately dependency-free: config.py imports the command listener.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestDbStats:
+    """MongoDB work done on behalf of one request."""
+
+    __slots__ = ("queries", "documents", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.documents = 0
+        self.seconds = 0.0
+
+
+# Set by the metrics middleware for the duration of each HTTP request
+request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+_lock = threading.Lock()
+_request_latency: Dict[Tuple[str, str], Histogram] = {}
+_request_queries: Dict[Tuple[str, str], Histogram] = {}
+_requests_total: Dict[Tuple[str, str, str], int] = defaultdict(int)
+_command_latency: Dict[str, Histogram] = {}
+_command_documents: Dict[str, int] = defaultdict(int)
+_command_failures: Dict[str, int] = defaultdict(int)
+
+
+def _histogram(store: dict, key, buckets) -> Histogram:
+    histogram = store.get(key)
+    if histogram is None:
+        histogram = store[key] = Histogram(buckets)
+    return histogram
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, stats: RequestDbStats) -> None:
+    with _lock:
+        _histogram(_request_latency, (method, route), LATENCY_BUCKETS).observe(seconds)
+        _histogram(_request_queries, (method, route), QUERY_COUNT_BUCKETS).observe(stats.queries)
+        _requests_total[(method, route, str(status))] += 1
+
+
+def _returned_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "n" in reply and isinstance(reply.get("n"), int):
+        return reply["n"]  # count / write results
+    return 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """pymongo command monitoring: per-command and per-request DB metrics.
+
+    Motor runs commands on executor threads with the caller's context copied,
+    so ``request_db_stats`` resolves to the originating request.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event.command_name, event.duration_micros, _returned_documents(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with _lock:
+            _command_failures[event.command_name] += 1
+        self._record(event.command_name, event.duration_micros, 0)
+
+    def _record(self, command: str, duration_micros: int, documents: int) -> None:
+        seconds = duration_micros / 1e6
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.documents += documents
+            stats.seconds += seconds
+        with _lock:
+            _histogram(_command_latency, command, LATENCY_BUCKETS).observe(seconds)
+            _command_documents[command] += documents
+
+
+command_listener = CommandMetricsListener()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, store: dict, label_names: Tuple[str, ...]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(store.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        labels = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    with _lock:
+        _render_histogram(lines, "synapso_http_request_duration_seconds",
+                          "HTTP request latency by route.", _request_latency, ("method", "route"))
+        _render_histogram(lines, "synapso_http_request_db_queries",
+                          "MongoDB commands issued per HTTP request.", _request_queries, ("method", "route"))
+        lines.append("# HELP synapso_http_requests_total HTTP requests by route and status.")
+        lines.append("# TYPE synapso_http_requests_total counter")
+        for (method, route, status), count in sorted(_requests_total.items()):
+            lines.append(f"synapso_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        _render_histogram(lines, "synapso_mongo_command_duration_seconds",
+                          "MongoDB command latency by command.", _command_latency, ("command",))
+        lines.append("# HELP synapso_mongo_documents_returned_total Documents returned by MongoDB commands.")
+        lines.append("# TYPE synapso_mongo_documents_returned_total counter")
+        for command, count in sorted(_command_documents.items()):
+            lines.append(f"synapso_mongo_documents_returned_total{_labels(command=command)} {count}")
+        lines.append("# HELP synapso_mongo_command_failures_total Failed MongoDB commands.")
+        lines.append("# TYPE synapso_mongo_command_failures_total counter")
+        for command, count in sorted(_command_failures.items()):
+            lines.append(f"synapso_mongo_command_failures_total{_labels(command=command)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from backend.models import ChatHeaderUser, Notification, NotificationCounter
+from backend.schemas import NotificationPublic
+from backend.services.chat_hub import chat_hub
+from backend.services.events import MATCH_CREATED, MESSAGE_SENT, EventBus, event_bus
+from backend.services.pagination import keyset_filter
+from backend.services.user_loader import UserLoader
+
+# Durable per-user inbox fed by the event bus, with live push over /ws/chat.
+# Unread counts come from `notification_counters`, never from a count() scan.
+
+PREVIEW_LENGTH = 100
+
+
+def to_public(doc: dict) -> NotificationPublic:
+    return NotificationPublic(
+        id=str(doc["_id"]),
+        user_id=doc["user_id"],
+        type=doc["type"],
+        title=doc["title"],
+        message=doc["message"],
+        ref_id=doc.get("ref_id"),
+        read=doc.get("read", False),
+        read_at=doc.get("read_at"),
+        created_at=doc.get("created_at"),
+    )
+
+
+async def create_notification(
+    user_id: str, type: str, title: str, message: str, ref_id: Optional[str] = None
+) -> NotificationPublic:
+    doc = {
+        "user_id": user_id,
+        "type": type,
+        "title": title,
+        "message": message,
+        "ref_id": ref_id,
+        "read": False,
+        "created_at": datetime.utcnow(),
+    }
+    result = await Notification.get_motor_collection().insert_one(doc)
+    doc["_id"] = result.inserted_id
+    counter = await NotificationCounter.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"unread": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+    notification = to_public(doc)
+    await chat_hub.push([user_id], {
+        "type": "notification",
+        "notification": notification.model_dump(mode="json"),
+        "unread_count": counter["unread"],
+    })
+    return notification
+
+
+async def unread_count(user_id: str) -> int:
+    counter = await NotificationCounter.get_motor_collection().find_one(
+        {"user_id": user_id}, projection={"unread": 1}
+    )
+    return counter["unread"] if counter else 0
+
+
+async def list_notifications(
+    user_id: str,
+    before: Optional[Tuple[datetime, ObjectId]],
+    limit: int,
+    unread_only: bool = False,
+) -> Tuple[List[dict], bool]:
+    """One keyset page, newest first. Returns (docs, has_more)."""
+    query = {"user_id": user_id}
+    if unread_only:
+        query["read"] = False
+    if before is not None:
+        query.update(keyset_filter("created_at", *before, after=False))
+    docs = await Notification.get_motor_collection().find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    return docs[:limit], len(docs) > limit
+
+
+async def mark_read(user_id: str, ids: Optional[List[ObjectId]] = None) -> Tuple[int, int]:
+    """Mark ``ids`` (or everything) read. Returns (marked, unread remaining).
+
+    The counter is decremented by the number of notifications actually
+    flipped, so concurrent inserts are never lost; it never goes below 0.
+    """
+    query = {"user_id": user_id, "read": False}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    result = await Notification.get_motor_collection().update_many(
+        query, {"$set": {"read": True, "read_at": datetime.utcnow()}}
+    )
+    if not result.modified_count:
+        return 0, await unread_count(user_id)
+
+    counter = await NotificationCounter.get_motor_collection().find_one_and_update(
+        {"user_id": user_id},
+        [{"$set": {"unread": {"$max": [0, {"$subtract": [{"$ifNull": ["$unread", 0]}, result.modified_count]}]}}}],
+        return_document=ReturnDocument.AFTER,
+    )
+    remaining = counter["unread"] if counter else 0
+    # Keep the user's other devices' badges in sync
+    await chat_hub.push([user_id], {"type": "notification_count", "unread_count": remaining})
+    return result.modified_count, remaining
+
+
+# ---- Event handlers ----
+
+async def on_match_created(event: dict) -> None:
+    user_ids = event["user_ids"]
+    users = await UserLoader(ChatHeaderUser).load_many(user_ids)
+    for user_id in user_ids:
+        other_id = next((uid for uid in user_ids if uid != user_id), user_id)
+        other = users.get(other_id)
+        other_name = other.username if other else "someone"
+        await create_notification(
+            user_id, "match", "It's a match! 🎉", f"You matched with {other_name}", ref_id=event["match_id"]
+        )
+
+
+async def on_message_sent(event: dict) -> None:
+    content = event["content"]
+    if len(content) > PREVIEW_LENGTH:
+        content = content[:PREVIEW_LENGTH - 1] + "…"
+    await create_notification(
+        event["receiver_id"], "message", f"New message from {event['sender_username']}", content,
+        ref_id=event["match_id"],
+    )
+
+
+def register_handlers(bus: EventBus = event_bus) -> None:
+    bus.subscribe(MATCH_CREATED, on_match_created)
+    bus.subscribe(MESSAGE_SENT, on_message_sent)
@@ -0,0 +1,36 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Keyset pagination over (timestamp, _id). Cursors are opaque, URL-safe tokens
+# that identify one document's position, so pages stay stable while new
+# documents are inserted.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, doc_id: ObjectId) -> str:
+    raw = f"{timestamp.isoformat()}|{doc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, doc_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {token!r}")
+
+
+def keyset_filter(field: str, timestamp: datetime, doc_id: ObjectId, after: bool) -> dict:
+    """Documents strictly after (or before) the (field, _id) position."""
+    op = "$gt" if after else "$lt"
+    return {"$or": [
+        {field: {op: timestamp}},
+        {field: timestamp, "_id": {op: doc_id}},
+    ]}
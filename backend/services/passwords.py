@@ -0,0 +1,122 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+
+from backend.config import (
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_CONCURRENCY,
+)
+
+# ---------- Password Hashing (RENDER-SAFE) ----------
+pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
+# argon2/bcrypt take tens to hundreds of ms of CPU per call, so the async
+# helpers below run them on a bounded pool instead of the event loop.
+
+
+def hash_password(password: str) -> str:
+    safe_password = password[:72]
+    return pwd_context.hash(safe_password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    safe_password = plain_password[:72]
+    return pwd_context.verify(safe_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a fresh hash when the stored one is outdated."""
+    safe_password = plain_password[:72]
+    return pwd_context.verify_and_update(safe_password, hashed_password)
+
+
+class HashingMetrics:
+    def __init__(self):
+        self.completed = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def snapshot(self) -> dict:
+        done = self.completed or 1
+        return {
+            "executor": PASSWORD_HASH_EXECUTOR,
+            "workers": PASSWORD_HASH_WORKERS,
+            "concurrency_limit": PASSWORD_HASH_CONCURRENCY,
+            "completed": self.completed,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "wait_avg_ms": round(1000 * self.wait_seconds_total / done, 2),
+            "wait_max_ms": round(1000 * self.wait_seconds_max, 2),
+            "run_avg_ms": round(1000 * self.run_seconds_total / done, 2),
+        }
+
+
+metrics = HashingMetrics()
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+    return _executor
+
+
+async def _run(func, *args):
+    """Run ``func`` on the pool, at most PASSWORD_HASH_CONCURRENCY at a time."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+
+    queued_at = time.perf_counter()
+    metrics.waiting += 1
+    metrics.max_waiting = max(metrics.max_waiting, metrics.waiting)
+    try:
+        await _semaphore.acquire()
+    finally:
+        metrics.waiting -= 1
+
+    started = time.perf_counter()
+    wait = started - queued_at
+    metrics.wait_seconds_total += wait
+    metrics.wait_seconds_max = max(metrics.wait_seconds_max, wait)
+    metrics.in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        metrics.in_flight -= 1
+        metrics.completed += 1
+        metrics.run_seconds_total += time.perf_counter() - started
+        _semaphore.release()
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
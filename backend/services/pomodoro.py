@@ -0,0 +1,102 @@
+from typing import Optional
+
+from backend.config import STUDYROOM_BREAK_SECONDS, STUDYROOM_FOCUS_SECONDS
+
+PHASE_SECONDS = {"focus": STUDYROOM_FOCUS_SECONDS, "break": STUDYROOM_BREAK_SECONDS}
+NEXT_PHASE = {"focus": "break", "break": "focus"}
+
+
+class PomodoroTimer:
+    """Server-owned study room timer, described by transitions rather than ticks.
+
+    While running, ``started_at`` is the (pause-adjusted) unix time the phase
+    began, so anyone can compute ``duration - (now - started_at)`` locally.
+    While paused or stopped, ``started_at`` is None and ``paused_remaining``
+    holds what is left (None = the full ``duration``).
+    """
+
+    def __init__(
+        self,
+        phase: str = "focus",
+        started_at: Optional[float] = None,
+        duration: Optional[float] = None,
+        paused_remaining: Optional[float] = None,
+    ):
+        self.phase = phase
+        self.started_at = started_at
+        self.duration = duration if duration is not None else PHASE_SECONDS[phase]
+        self.paused_remaining = paused_remaining
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def ends_at(self) -> Optional[float]:
+        return self.started_at + self.duration if self.running else None
+
+    def remaining(self, now: float) -> float:
+        if self.running:
+            return max(0.0, self.ends_at - now)
+        return self.paused_remaining if self.paused_remaining is not None else self.duration
+
+    # Each transition returns False when it would not change anything
+
+    def start(self, now: float) -> bool:
+        if self.running:
+            return False
+        self.started_at = now - (self.duration - self.remaining(now))
+        self.paused_remaining = None
+        return True
+
+    def pause(self, now: float) -> bool:
+        if not self.running:
+            return False
+        self.paused_remaining = self.remaining(now)
+        self.started_at = None
+        return True
+
+    def reset(self, now: float) -> bool:
+        if self.phase == "focus" and not self.running and self.paused_remaining is None:
+            return False
+        self.phase = "focus"
+        self.duration = PHASE_SECONDS["focus"]
+        self.started_at = None
+        self.paused_remaining = None
+        return True
+
+    def skip(self, now: float) -> bool:
+        was_running = self.running
+        self.advance(now)
+        if not was_running:
+            self.started_at = None
+        return True
+
+    def advance(self, at: float) -> None:
+        """Move to the next phase, which starts (running) at ``at``."""
+        self.phase = NEXT_PHASE[self.phase]
+        self.duration = PHASE_SECONDS[self.phase]
+        self.started_at = at
+        self.paused_remaining = None
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "phase": self.phase,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "paused_remaining": self.paused_remaining,
+            "server_time": now,
+            # Snapshot fields for clients that still count down from timer_update
+            "running": self.running,
+            "remaining": round(self.remaining(now)),
+            "start_time": self.started_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PomodoroTimer":
+        return cls(
+            phase=data.get("phase", "focus"),
+            started_at=data.get("started_at"),
+            duration=data.get("duration"),
+            paused_remaining=data.get("paused_remaining"),
+        )
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.models import User
+
+
+def normalize_terms(values: Optional[Iterable[str]]) -> Set[str]:
+    return set([x.strip().lower() for x in values or []])
+
+
+class ProfileIndex:
+    """In-process inverted index: (field, normalized term) -> user ordinals.
+
+    Every indexed user gets a dense integer ordinal; postings are sets of
+    ordinals, so scoring a user only touches the postings of their own terms
+    instead of scanning every profile. Scores are the same weighted overlap
+    as ``matching.compatibility_score``.
+    """
+
+    def __init__(self, weights: Dict[str, int]):
+        self.weights = dict(weights)
+        self.ready = False
+        self._ordinals: Dict[str, int] = {}
+        self._user_ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._postings: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        self._terms: Dict[int, Dict[str, Set[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def _profile_terms(self, profile) -> Dict[str, Set[str]]:
+        get = profile.get if isinstance(profile, dict) else lambda f: getattr(profile, f, None)
+        return {field: normalize_terms(get(field)) for field in self.weights}
+
+    def upsert(self, user_id: str, profile) -> None:
+        """Add or re-index a user from a User document or a raw dict."""
+        self.remove(user_id)
+        ordinal = self._free.pop() if self._free else len(self._user_ids)
+        if ordinal == len(self._user_ids):
+            self._user_ids.append(user_id)
+        else:
+            self._user_ids[ordinal] = user_id
+        self._ordinals[user_id] = ordinal
+
+        terms = self._profile_terms(profile)
+        self._terms[ordinal] = terms
+        for field, values in terms.items():
+            for term in values:
+                self._postings[(field, term)].add(ordinal)
+
+    def remove(self, user_id: str) -> None:
+        ordinal = self._ordinals.pop(user_id, None)
+        if ordinal is None:
+            return
+        for field, values in self._terms.pop(ordinal).items():
+            for term in values:
+                posting = self._postings.get((field, term))
+                if posting is not None:
+                    posting.discard(ordinal)
+                    if not posting:
+                        del self._postings[(field, term)]
+        self._user_ids[ordinal] = None
+        self._free.append(ordinal)
+
+    def scores(self, profile, exclude_id: Optional[str] = None) -> Dict[str, int]:
+        """{user_id: score} for every user sharing at least one term with ``profile``."""
+        totals: Dict[int, int] = defaultdict(int)
+        for field, values in self._profile_terms(profile).items():
+            weight = self.weights[field]
+            for term in values:
+                for ordinal in self._postings.get((field, term), ()):
+                    totals[ordinal] += weight
+
+        exclude = self._ordinals.get(exclude_id) if exclude_id else None
+        return {self._user_ids[o]: score for o, score in totals.items() if o != exclude}
+
+    def ranked(self, profile, exclude_id: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Candidates with score > 0, best first, ties broken by user ID."""
+        return sorted(self.scores(profile, exclude_id).items(), key=lambda t: (-t[1], t[0]))
+
+    async def rebuild(self) -> int:
+        """Rebuild from the users collection. Returns the number of users indexed."""
+        fresh = ProfileIndex(self.weights)
+        projection = {field: 1 for field in self.weights}
+        async for doc in User.get_motor_collection().find({}, projection):
+            fresh.upsert(str(doc["_id"]), doc)
+        fresh.ready = True
+        # Swap in one step so readers never see a half-built index
+        self.__dict__.update(fresh.__dict__)
+        return len(self)
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Optional, Tuple
+from bson import ObjectId
+
+from backend.models import Message
+from backend.services.chat_summary import mark_chat_read
+
+
+def watermark_filter(sent_at: datetime, message_id: Optional[ObjectId] = None) -> dict:
+    """Messages at or before the (sent_at, _id) watermark."""
+    if message_id is None:
+        return {"sent_at": {"$lte": sent_at}}
+    return {"$or": [
+        {"sent_at": {"$lt": sent_at}},
+        {"sent_at": sent_at, "_id": {"$lte": message_id}},
+    ]}
+
+
+def is_within_watermark(message: Message, sent_at: Optional[datetime], message_id: Optional[ObjectId] = None) -> bool:
+    if sent_at is None:
+        return True
+    if message.sent_at != sent_at or message_id is None:
+        return message.sent_at <= sent_at
+    return message.id <= message_id
+
+
+async def mark_messages_read(
+    match_id: str,
+    reader_id: str,
+    up_to: Optional[datetime] = None,
+    up_to_id: Optional[ObjectId] = None,
+) -> Tuple[datetime, int]:
+    """Mark ``reader_id``'s unread messages in a chat as read with one update_many.
+
+    Only messages up to the optional ``(up_to, up_to_id)`` watermark are
+    touched, so clients can acknowledge incrementally. All messages share one
+    ``read_at``. Returns ``(read_at, modified_count)``.
+    """
+    read_at = datetime.utcnow()
+    query = {"match_id": match_id, "receiver_id": reader_id, "is_read": False}
+    if up_to is not None:
+        query.update(watermark_filter(up_to, up_to_id))
+
+    result = await Message.get_motor_collection().update_many(
+        query, {"$set": {"is_read": True, "read_at": read_at}}
+    )
+    await mark_chat_read(match_id, reader_id, result.modified_count)
+    return read_at, result.modified_count
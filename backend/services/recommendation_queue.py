@@ -0,0 +1,224 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+
+from backend.models import RecommendationQueue, ScoringProfile, Swipe, User
+from backend.config import (
+    RECOMMENDATION_QUEUE_SIZE,
+    RECOMMENDATION_REFRESH_SECONDS,
+    RECOMMENDATION_ACTIVE_MINUTES,
+)
+from backend.services.log import get_logger
+from backend.services.matching import recommend_users
+
+logger = get_logger("services.recommendation_queue")
+
+# Per-user ranked candidate queues in `recommendation_queues`.
+#
+# The endpoint serves pages straight from the queue. Swiping pulls the swiped
+# user out of the swiper's queue; profile edits mark affected queues stale.
+# A background task refills stale or short queues of recently active users.
+
+
+class QueueMetrics:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0  # pages beyond the queue depth, served by the engine
+        self.refills = 0
+        self.refill_seconds_total = 0.0
+        self.refill_seconds_max = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        served = self.hits + self.misses
+        return self.hits / served if served else 0.0
+
+    def record_refill(self, seconds: float) -> None:
+        self.refills += 1
+        self.refill_seconds_total += seconds
+        self.refill_seconds_max = max(self.refill_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(self.hit_rate, 4),
+            "refills": self.refills,
+            "refill_latency_avg_ms": round(1000 * self.refill_seconds_total / self.refills, 2) if self.refills else 0.0,
+            "refill_latency_max_ms": round(1000 * self.refill_seconds_max, 2),
+        }
+
+
+metrics = QueueMetrics()
+
+
+async def refill_queue(user) -> dict:
+    """Recompute ``user``'s queue and store it. Returns the queue document.
+
+    A swipe made while the candidates were computed pulls its user from the
+    old queue, which the ``$set`` then replaces; those users are pulled
+    again right after the write. Swipes made later pull from the new queue.
+    """
+    started = time.perf_counter()
+    candidates = await recommend_users(user, limit=RECOMMENDATION_QUEUE_SIZE)
+    now = datetime.utcnow()
+    queue = {
+        "user_id": str(user.id),
+        "candidates": candidates,
+        "size": len(candidates),
+        "exhausted": len(candidates) < RECOMMENDATION_QUEUE_SIZE,
+        "stale": False,
+        "refreshed_at": now,
+        "last_requested_at": now,
+    }
+    await RecommendationQueue.get_motor_collection().update_one(
+        {"user_id": queue["user_id"]}, {"$set": queue}, upsert=True
+    )
+    swiped = await swiped_since_ranking(queue["user_id"], [c["id"] for c in candidates])
+    if swiped:
+        for candidate_id in swiped:  # rare and few: one conditional $pull each
+            await remove_candidate(queue["user_id"], candidate_id)
+        queue["candidates"] = [c for c in candidates if c["id"] not in swiped]
+        queue["size"] = len(queue["candidates"])
+    metrics.record_refill(time.perf_counter() - started)
+    return queue
+
+
+async def swiped_since_ranking(user_id: str, candidate_ids: List[str]) -> List[str]:
+    """Candidates ``user_id`` has swiped; ranking excludes swiped users, so
+    any found here were swiped while the queue was being refilled."""
+    if not candidate_ids:
+        return []
+    cursor = Swipe.get_motor_collection().find(
+        {"swiper_id": user_id, "swipee_id": {"$in": candidate_ids}}, projection={"swipee_id": 1}
+    )
+    return [swipe["swipee_id"] async for swipe in cursor]
+
+
+async def next_page(user, limit: int = 10, offset: int = 0) -> List[dict]:
+    """Ranked page of candidates for ``user``, served from the queue when fresh.
+
+    Entries are not removed here: swiping removes them (see remove_candidate),
+    so a page that is fetched but not swiped is served again next time.
+    """
+    if offset + limit > RECOMMENDATION_QUEUE_SIZE:
+        metrics.bypasses += 1
+        return await recommend_users(user, limit=limit, offset=offset)
+
+    collection = RecommendationQueue.get_motor_collection()
+    queue = await collection.find_one_and_update(
+        {"user_id": str(user.id)},
+        {"$set": {"last_requested_at": datetime.utcnow()}},
+        projection={"candidates": {"$slice": [offset, limit]}, "size": 1, "exhausted": 1, "stale": 1},
+    )
+    if queue and not queue.get("stale") and (queue.get("size", 0) >= offset + limit or queue.get("exhausted")):
+        metrics.hits += 1
+        return queue["candidates"]
+
+    metrics.misses += 1
+    queue = await refill_queue(user)
+    return queue["candidates"][offset:offset + limit]
+
+
+async def remove_candidate(user_id: str, candidate_id: str) -> None:
+    """Drop a swiped user from ``user_id``'s queue."""
+    await RecommendationQueue.get_motor_collection().update_one(
+        {"user_id": user_id, "candidates.id": candidate_id},
+        {"$pull": {"candidates": {"id": candidate_id}}, "$inc": {"size": -1}},
+    )
+
+
+async def remove_candidates(user_id: str, candidate_ids: List[str]) -> None:
+    """Drop several swiped users from ``user_id``'s queue in one update."""
+    if not candidate_ids:
+        return
+    await RecommendationQueue.get_motor_collection().update_one(
+        {"user_id": user_id, "candidates.id": {"$in": candidate_ids}},
+        [
+            {"$set": {"candidates": {"$filter": {
+                "input": "$candidates",
+                "cond": {"$not": [{"$in": ["$$this.id", {"$literal": candidate_ids}]}]},
+            }}}},
+            {"$set": {"size": {"$size": "$candidates"}}},
+        ],
+    )
+
+
+async def invalidate_user(user_id: str) -> None:
+    """A profile changed: its own queue and every queue listing it are stale."""
+    await RecommendationQueue.get_motor_collection().update_many(
+        {"$or": [{"user_id": user_id}, {"candidates.id": user_id}]},
+        {"$set": {"stale": True}},
+    )
+
+
+async def invalidate_exhausted() -> None:
+    """A user signed up: queues that ran out of candidates may now have more.
+
+    Served by the partial index on exhausted queues; queues already marked
+    stale are skipped, so back-to-back signups don't rewrite them again.
+    """
+    await RecommendationQueue.get_motor_collection().update_many(
+        {"exhausted": True, "stale": False}, {"$set": {"stale": True}}
+    )
+
+
+async def refresh_due_queues(batch_size: int = 50) -> int:
+    """Refill stale or short queues of recently active users. Returns the count."""
+    active_since = datetime.utcnow() - timedelta(minutes=RECOMMENDATION_ACTIVE_MINUTES)
+    due = RecommendationQueue.get_motor_collection().find(
+        {
+            "last_requested_at": {"$gte": active_since},
+            "$or": [
+                {"stale": True},
+                {"exhausted": False, "size": {"$lt": RECOMMENDATION_QUEUE_SIZE // 2}},
+            ],
+        },
+        projection={"user_id": 1},
+    ).limit(batch_size)
+
+    refreshed = 0
+    async for queue in due:
+        user = await User.find_one({"_id": ObjectId(queue["user_id"])}).project(ScoringProfile)
+        if user is None:
+            continue
+        await refill_queue(user)
+        refreshed += 1
+    return refreshed
+
+
+async def refresh_loop(interval: float = RECOMMENDATION_REFRESH_SECONDS) -> None:
+    """Background worker started from main.py."""
+    while True:
+        try:
+            await refresh_due_queues()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Recommendation queue refresh failed")
+        await asyncio.sleep(interval)
+
+
+_worker: Optional[asyncio.Task] = None
+
+
+def start_worker() -> None:
+    global _worker
+    if _worker is None or _worker.done():
+        _worker = asyncio.create_task(refresh_loop())
+
+
+async def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.cancel()
+        try:
+            await _worker
+        except asyncio.CancelledError:
+            pass
+        _worker = None
@@ -0,0 +1,156 @@
+import hashlib
+import inspect
+from typing import Any, Callable, Iterable, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Request, Response
+
+from backend.config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_VERSION_TTL_SECONDS
+from backend.models import Match, User
+from backend.services.cache import TTLCache
+from backend.services import auth_cache
+
+# Conditional GET for per-user endpoints. ETags are derived from version
+# counters stored on the User document, not from the User that
+# get_current_user returns (usually this worker's auth cache entry).
+#
+# The counters are kept per worker for RESPONSE_VERSION_TTL_SECONDS, so a
+# revalidation that ends in a 304 does not touch MongoDB. bump() drops the
+# local copy, which keeps this worker exact after its own writes. A bump
+# made on *another* worker is only seen once the local copy expires: until
+# then this worker can answer 304 for a stale body. On a miss the counters
+# are read with one _id lookup projected to them.
+
+PROFILE_VERSION = "profile_version"
+MATCHES_VERSION = "matches_version"
+VERSION_FIELDS = (PROFILE_VERSION, MATCHES_VERSION)
+
+_bodies = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+_versions = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_VERSION_TTL_SECONDS)
+
+
+class ResponseCacheMetrics:
+    def __init__(self):
+        self.not_modified = 0
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self) -> dict:
+        served = self.not_modified + self.hits + self.misses
+        return {
+            "not_modified": self.not_modified,
+            "hits": self.hits,
+            "misses": self.misses,
+            # Requests answered without rebuilding the body
+            "hit_rate": round((self.not_modified + self.hits) / served, 4) if served else 0.0,
+            "entries": len(_bodies),
+            "versions": _versions.stats(),
+        }
+
+
+metrics = ResponseCacheMetrics()
+
+
+async def current_versions(user_id: ObjectId) -> dict:
+    versions = _versions.get(str(user_id))
+    if versions is None:
+        doc = await User.get_motor_collection().find_one(
+            {"_id": user_id}, projection={field: 1 for field in VERSION_FIELDS}
+        ) or {}
+        versions = {field: doc.get(field) or 0 for field in VERSION_FIELDS}
+        _versions.set(str(user_id), versions)
+    return versions
+
+
+def etag_for(user_id: str, route: str, fields: Tuple[str, ...], versions: dict) -> str:
+    versions = ":".join(str(versions.get(field) or 0) for field in fields)
+    digest = hashlib.blake2b(f"{route}:{user_id}:{versions}".encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+async def conditional(
+    request: Request,
+    response: Response,
+    user: User,
+    route: str,
+    fields: Tuple[str, ...],
+    build: Callable[[User], Any],
+) -> Any:
+    """Return 304 for a matching If-None-Match, else the (cached) body of ``build``.
+
+    ``build`` takes the User and may return the body or an awaitable of it.
+    """
+    versions = await current_versions(user.id)
+    etag = etag_for(str(user.id), route, fields, versions)
+    if _matches(request.headers.get("if-none-match", ""), etag):
+        metrics.not_modified += 1
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    key = (str(user.id), route)
+    entry = _bodies.get(key)
+    if entry is not None and entry[0] == etag:
+        metrics.hits += 1
+        body = entry[1]
+    else:
+        metrics.misses += 1
+        if any((getattr(user, field, 0) or 0) != (versions.get(field) or 0) for field in fields):
+            # Bumped on another worker since this User was cached here
+            auth_cache.invalidate_user(str(user.id))
+            user = await User.get(user.id) or user
+        body = build(user)
+        if inspect.isawaitable(body):
+            body = await body
+        _bodies.set(key, (etag, body))
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"  # always revalidate
+    return body
+
+
+async def bump(user_ids: Iterable[str], *fields: str) -> None:
+    """Invalidate the users' cached responses that depend on ``fields``."""
+    user_ids = list(dict.fromkeys(user_ids))
+    object_ids = []
+    for user_id in user_ids:
+        try:
+            object_ids.append(ObjectId(user_id))
+        except (InvalidId, TypeError):
+            continue
+    if not object_ids:
+        return
+    await User.get_motor_collection().update_many(
+        {"_id": {"$in": object_ids}}, {"$inc": {field: 1 for field in fields}}
+    )
+    for user_id in user_ids:
+        _versions.pop(user_id)
+        auth_cache.invalidate_user(user_id)  # so the next request sees the new versions
+
+
+async def match_partner_ids(user_id: str) -> list:
+    cursor = Match.get_motor_collection().find(
+        {"$or": [{"user1_id": user_id}, {"user2_id": user_id}]},
+        projection={"user1_id": 1, "user2_id": 1},
+    )
+    return [m["user2_id"] if m["user1_id"] == user_id else m["user1_id"] async for m in cursor]
+
+
+async def profile_changed(user_id: str) -> None:
+    """The user's own profile responses, and their partners' match lists, are stale."""
+    await bump([user_id], PROFILE_VERSION)
+    partners = await match_partner_ids(user_id)
+    if partners:
+        await bump(partners, MATCHES_VERSION)
+
+
+def stats() -> dict:
+    return metrics.snapshot()
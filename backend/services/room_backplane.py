@@ -0,0 +1,149 @@
+import abc
+import asyncio
+import copy
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+from backend.models import StudyRoomEvent
+from backend.services.log import get_logger
+
+logger = get_logger("services.room_backplane")
+
+# handler(worker_id, room_id, event) for events published by *other* workers
+EventHandler = Callable[[str, str, dict], Awaitable[None]]
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class Backplane(abc.ABC):
+    """Fans events out to the other workers, e.g. those serving the same study rooms.
+
+    ``publish`` delivers to every other worker's handler on the same
+    ``channel``; the publishing worker applies its own events locally and
+    never receives them back.
+    """
+
+    distributed = False
+
+    def __init__(self, channel: str = "studyroom"):
+        self.channel = channel
+        self.worker_id = new_worker_id()
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def publish(self, room_id: str, event: dict) -> None:
+        """Deliver ``event`` to the handlers of every other worker."""
+
+
+class InMemoryBackplane(Backplane):
+    """Workers in one process, delivering to the backplanes in ``peers``.
+
+    A single worker has no peers, so every connection is local and there is
+    nobody to tell. Backplanes created with the same ``peers`` list (tests,
+    benchmarks) see each other's events like separate processes would.
+    """
+
+    def __init__(self, channel: str = "studyroom", peers: Optional[List["InMemoryBackplane"]] = None):
+        super().__init__(channel)
+        self.peers = peers if peers is not None else []
+
+    async def start(self, handler: EventHandler) -> None:
+        await super().start(handler)
+        if self not in self.peers:
+            self.peers.append(self)
+
+    async def stop(self) -> None:
+        if self in self.peers:
+            self.peers.remove(self)
+
+    async def publish(self, room_id: str, event: dict) -> None:
+        for peer in list(self.peers):
+            if peer is self or peer.channel != self.channel:
+                continue
+            try:
+                # Each worker gets its own copy, as if it came off the wire
+                await peer._handler(self.worker_id, room_id, copy.deepcopy(event))
+            except Exception:
+                logger.exception("Backplane event failed on %s/%s", self.channel, room_id)
+
+
+class MongoBackplane(Backplane):
+    """Events are inserted into ``studyroom_events`` and read back by every
+    worker through a change stream.
+
+    Change streams need a replica set: Atlas always is one, and locally a
+    single-node ``mongod --replSet rs0`` is enough to run several workers.
+    """
+
+    distributed = True
+
+    def __init__(self, channel: str = "studyroom"):
+        super().__init__(channel)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler) -> None:
+        await super().start(handler)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, room_id: str, event: dict) -> None:
+        await StudyRoomEvent.get_motor_collection().insert_one({
+            "channel": self.channel,
+            "worker": self.worker_id,
+            "room_id": room_id,
+            "event": event,
+            "created_at": datetime.utcnow(),
+        })
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {
+            "operationType": "insert",
+            "fullDocument.channel": self.channel,
+            "fullDocument.worker": {"$ne": self.worker_id},
+        }}]
+        resume_token = None
+        while True:
+            try:
+                async with StudyRoomEvent.get_motor_collection().watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        try:
+                            await self._handler(doc["worker"], doc["room_id"], doc["event"])
+                        except Exception:
+                            logger.exception("Backplane event failed on %s/%s", self.channel, doc["room_id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Heartbeats re-publish presence, so a fresh stream heals any gap
+                logger.exception("Backplane change stream failed on %s; reconnecting", self.channel)
+                resume_token = None
+                await asyncio.sleep(1)
+
+
+def create_backplane(kind: str, channel: str = "studyroom") -> Backplane:
+    if kind == "mongo":
+        return MongoBackplane(channel)
+    if kind == "memory":
+        return InMemoryBackplane(channel)
+    raise ValueError(f"Unknown backplane: {kind!r}")
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from backend.models import StudyRoomMessage
+from backend.services.log import get_logger
+
+logger = get_logger("services.room_history")
+
+
+class RoomHistory:
+    """Bounded chat history of one study room, ordered by ``seq``.
+
+    ``seq`` is a microsecond timestamp bumped to stay strictly increasing, so
+    workers sharing a room assign compatible sequence numbers without a
+    round-trip. ``floor_seq`` is the newest seq that may be missing from the
+    buffer: a client that has seen it can be caught up with a delta.
+    """
+
+    def __init__(self, capacity: int):
+        self.messages: Deque[dict] = deque(maxlen=capacity)
+        self.floor_seq = 0
+
+    def next_seq(self) -> int:
+        last = self.messages[-1]["seq"] if self.messages else 0
+        return max(time.time_ns() // 1000, last + 1)
+
+    def add(self, message: dict) -> None:
+        seq = message["seq"]
+        index = len(self.messages)
+        while index and self.messages[index - 1]["seq"] > seq:
+            index -= 1  # a remote message that raced a local one
+        if index and self.messages[index - 1]["seq"] == seq:
+            return
+        if len(self.messages) == self.messages.maxlen:
+            if index == 0:
+                self.floor_seq = max(self.floor_seq, seq)
+                return  # older than everything we keep
+            self.floor_seq = max(self.floor_seq, self.messages.popleft()["seq"])
+            index -= 1
+        self.messages.insert(index, message)
+
+    def merge(self, messages: Iterable[dict], floor_seq: int = 0) -> None:
+        for message in messages:
+            self.add(message)
+        self.floor_seq = max(self.floor_seq, floor_seq)
+
+    def since(self, last_seq: int) -> Optional[List[dict]]:
+        """Messages after ``last_seq``, or None if some were already evicted."""
+        if last_seq < self.floor_seq:
+            return None
+        return [m for m in self.messages if m["seq"] > last_seq]
+
+
+async def load_history(room_id: str, capacity: int) -> RoomHistory:
+    """Seed a room's buffer with its newest persisted messages."""
+    history = RoomHistory(capacity)
+    docs = await StudyRoomMessage.get_motor_collection().find(
+        {"room_id": room_id},
+        projection={"_id": 0, "seq": 1, "username": 1, "message": 1, "timestamp": 1},
+    ).sort("seq", -1).limit(capacity).to_list(length=capacity)
+    docs.reverse()
+    history.merge({"type": "chat_message", **doc} for doc in docs)
+    if len(docs) == capacity:
+        # Older messages exist; a client must have seen our oldest to get a delta
+        history.floor_seq = docs[0]["seq"]
+    return history
+
+
+class RoomHistoryWriter:
+    """Persists room messages off the broadcast path in batched insert_many calls."""
+
+    def __init__(self, flush_interval: float, batch_size: int = 100):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, room_id: str, message: dict) -> None:
+        self._pending.append({
+            "room_id": room_id,
+            "seq": message["seq"],
+            "username": message["username"],
+            "message": message["message"],
+            "timestamp": message["timestamp"],
+            "created_at": datetime.utcnow(),
+        })
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            await StudyRoomMessage.get_motor_collection().insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # insert_many gave every document an _id, so the ones that made it
+            # come back as duplicates on a retry; only requeue real failures
+            failed = [batch[error["index"]] for error in e.details.get("writeErrors", [])
+                      if error.get("code") != 11000]
+            logger.error("Persisting %d of %d study room messages failed", len(failed), len(batch))
+            self._requeue(failed)
+            return len(batch) - len(failed)
+        except Exception:
+            logger.exception("Persisting %d study room messages failed", len(batch))
+            self._requeue(batch)
+            return 0
+        return len(batch)
+
+    def _requeue(self, failed: List[dict]) -> None:
+        # Retry next round, but never hold more than a few batches
+        self._pending = (failed + self._pending)[-10 * self.batch_size:]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
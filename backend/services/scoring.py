@@ -0,0 +1,107 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+from backend.models import User
+from backend.services.matching import SCORE_WEIGHTS
+from backend.services.profile_index import normalize_terms
+
+# Batch scoring for offline jobs (full re-ranks, all-pairs analyses). Online
+# recommendations go through matching.profile_index, which only touches the
+# postings of the requesting user's terms; nothing in the request path
+# imports this module.
+
+# Set bits in every byte value, for popcounts over packed rows
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class FeatureMatrix:
+    """Packed-bit profile features for batch compatibility scoring.
+
+    Each field (subjects, availability, ...) gets its own vocabulary of
+    normalized terms and an ``(n_users, ceil(n_terms / 8))`` uint8 matrix of
+    packed membership bits. Scores equal ``matching.compatibility_score``:
+    the weighted size of each field's normalized set intersection.
+    """
+
+    def __init__(self, user_ids: Sequence[str], profiles: Sequence, weights: Dict[str, int] = SCORE_WEIGHTS):
+        self.weights = dict(weights)
+        self.user_ids = list(user_ids)
+        self._rows = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self.vocabulary: Dict[str, Dict[str, int]] = {}
+        self.packed: Dict[str, np.ndarray] = {}
+
+        for field in self.weights:
+            terms = [normalize_terms(_get(profile, field)) for profile in profiles]
+            vocabulary = {term: i for i, term in enumerate(sorted(set().union(*terms)))}
+            dense = np.zeros((len(terms), max(len(vocabulary), 1)), dtype=bool)
+            for row, values in enumerate(terms):
+                dense[row, [vocabulary[t] for t in values]] = True
+            self.vocabulary[field] = vocabulary
+            self.packed[field] = np.packbits(dense, axis=1)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def encode(self, profile) -> Dict[str, np.ndarray]:
+        """Packed feature row for any profile; unknown terms cannot overlap."""
+        encoded = {}
+        for field, vocabulary in self.vocabulary.items():
+            dense = np.zeros(max(len(vocabulary), 1), dtype=bool)
+            columns = [vocabulary[t] for t in normalize_terms(_get(profile, field)) if t in vocabulary]
+            dense[columns] = True
+            encoded[field] = np.packbits(dense)
+        return encoded
+
+    def score_one(self, profile) -> np.ndarray:
+        """Scores of ``profile`` against every user, aligned with ``user_ids``."""
+        query = self.encode(profile)
+        scores = np.zeros(len(self), dtype=np.int64)
+        for field, weight in self.weights.items():
+            overlap = _POPCOUNT[self.packed[field] & query[field]].sum(axis=1, dtype=np.int64)
+            scores += weight * overlap
+        return scores
+
+    def rank(self, profile, exclude_id: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Users with score > 0, best first, ties broken by user ID."""
+        scores = self.score_one(profile)
+        if exclude_id in self._rows:
+            scores[self._rows[exclude_id]] = 0
+        rows = np.flatnonzero(scores > 0)
+        ranked = sorted(((self.user_ids[r], int(scores[r])) for r in rows), key=lambda t: (-t[1], t[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+    def all_pairs(self, chunk_size: int = 1024) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield ``(row_start, scores)`` blocks of the full n x n score matrix.
+
+        Each block is ``scores[row_start:row_start + chunk_size, :]``, computed
+        as one matrix product over the unpacked features. The values are small
+        integers, so float32 arithmetic is exact.
+        """
+        left, right = [], []
+        for field, weight in self.weights.items():
+            n_terms = max(len(self.vocabulary[field]), 1)
+            dense = np.unpackbits(self.packed[field], axis=1, count=n_terms).astype(np.float32)
+            left.append(dense)
+            right.append(dense * weight)
+        left = np.hstack(left)
+        right = np.hstack(right).T
+
+        for start in range(0, len(self), chunk_size):
+            block = left[start:start + chunk_size] @ right
+            yield start, np.rint(block).astype(np.int64)
+
+
+def _get(profile, field: str):
+    if isinstance(profile, dict):
+        return profile.get(field)
+    return getattr(profile, field, None)
+
+
+async def load_feature_matrix() -> FeatureMatrix:
+    """Build a FeatureMatrix for every user in the database."""
+    projection = {field: 1 for field in SCORE_WEIGHTS}
+    user_ids, profiles = [], []
+    async for doc in User.get_motor_collection().find({}, projection):
+        user_ids.append(str(doc["_id"]))
+        profiles.append(doc)
+    return FeatureMatrix(user_ids, profiles)
@@ -0,0 +1,68 @@
+from typing import Dict, Iterable, List, Optional, Set, Type
+from bson import ObjectId
+from bson.errors import InvalidId
+from pydantic import BaseModel
+
+from backend.models import ChatHeaderUser, MatchListUser, User
+
+
+class UserLoader:
+    """Per-request batch loader for users (DataLoader style).
+
+    IDs are collected with ``prime`` / ``load_many`` and fetched with a single
+    ``$in`` query projected onto ``view`` (a read model from models.py), so
+    only its fields are fetched and validated. Results are cached for the
+    lifetime of the loader, so each distinct user is fetched at most once per
+    request.
+    """
+
+    def __init__(self, view: Type[BaseModel] = MatchListUser):
+        self._view = view
+        self._cache: Dict[str, Optional[BaseModel]] = {}
+        self._pending: Set[str] = set()
+
+    def prime(self, user_ids: Iterable[str]) -> None:
+        """Queue IDs to be fetched on the next load."""
+        for user_id in user_ids:
+            if user_id and user_id not in self._cache:
+                self._pending.add(user_id)
+
+    async def load(self, user_id: str) -> Optional[BaseModel]:
+        users = await self.load_many([user_id])
+        return users.get(user_id)
+
+    async def load_many(self, user_ids: Iterable[str]) -> Dict[str, BaseModel]:
+        """Return {user_id: view} for every ID that exists."""
+        user_ids = list(user_ids)
+        self.prime(user_ids)
+        await self._flush()
+        return {uid: self._cache[uid] for uid in user_ids if self._cache.get(uid) is not None}
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, set()
+        object_ids: List[ObjectId] = []
+        for user_id in pending:
+            self._cache[user_id] = None
+            try:
+                object_ids.append(ObjectId(user_id))
+            except (InvalidId, TypeError):
+                pass  # Unknown/invalid IDs resolve to None
+
+        if not object_ids:
+            return
+
+        async for user in User.find({"_id": {"$in": object_ids}}).project(self._view):
+            self._cache[str(user.id)] = user
+
+
+def get_user_loader() -> UserLoader:
+    """FastAPI dependency: one loader per request."""
+    return UserLoader()
+
+
+def get_chat_header_loader() -> UserLoader:
+    """FastAPI dependency for listings that only show usernames."""
+    return UserLoader(ChatHeaderUser)
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Callable, Optional
+from fastapi import WebSocket
+
+from backend.services.log import get_logger
+
+logger = get_logger("services.ws_connection")
+
+# Close codes: 1011 = server error (dead socket), 1013 = try again later (too slow)
+CLOSE_SEND_FAILED = 1011
+CLOSE_SLOW_CONSUMER = 1013
+
+
+class QueuedWebSocket:
+    """A WebSocket with a bounded outbound queue drained by its own task.
+
+    ``send`` never awaits the client, so one slow or dead socket cannot stall
+    a broadcast to the others. A connection whose queue overflows, or whose
+    send exceeds ``timeout`` or raises, is closed and reported to ``on_close``.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        maxsize: int,
+        timeout: float,
+        on_close: Optional[Callable[["QueuedWebSocket"], None]] = None,
+    ):
+        self.websocket = websocket
+        self.timeout = timeout
+        self.on_close = on_close
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._sender = asyncio.create_task(self._drain())
+        self._closer: Optional[asyncio.Task] = None
+
+    def send(self, text: str) -> bool:
+        """Queue an already-serialized frame. False if the connection is gone."""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._fail("slow consumer", CLOSE_SLOW_CONSUMER)
+            return False
+        return True
+
+    async def _drain(self) -> None:
+        try:
+            # Also checked after each send: before 3.12, wait_for can swallow a
+            # cancel that races with the send completing
+            while not self.closed:
+                text = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._fail("send timeout", CLOSE_SLOW_CONSUMER)
+        except Exception:
+            self._fail("send failed", CLOSE_SEND_FAILED)
+
+    def _fail(self, reason: str, code: int) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        logger.info("Dropping WebSocket: %s", reason)
+        if self.on_close is not None:
+            self.on_close(self)
+        self._closer = asyncio.create_task(self._close(code))
+
+    async def _close(self, code: int) -> None:
+        self._sender.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.timeout)
+        except Exception:
+            pass  # already gone
+
+    async def aclose(self) -> None:
+        """Stop the sender after the client disconnected on its own."""
+        self.closed = True
+        self._sender.cancel()
+        try:
+            await self._sender
+        except asyncio.CancelledError:
+            pass
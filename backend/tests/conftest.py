@@ -0,0 +1,129 @@
+"""Test setup: an in-memory MongoDB (mongomock-motor) stands in for Atlas.
+
+backend.config builds its Motor client at import time, so the client class is
+swapped before anything from ``backend`` is imported.
+"""
+import asyncio
+import contextlib
+import os
+from collections import Counter
+from typing import List, Tuple
+
+import bson
+import motor.motor_asyncio
+import pytest
+from mongomock.filtering import filter_applies
+from mongomock_motor import AsyncMongoMockClient
+
+os.environ.setdefault("MONGO_URI", "mongodb+srv://synapso-test.invalid")
+
+
+def _mock_client(*args, **kwargs):
+    return AsyncMongoMockClient()
+
+
+REAL_MOTOR_CLIENT = motor.motor_asyncio.AsyncIOMotorClient  # for tests that need a real server
+motor.motor_asyncio.AsyncIOMotorClient = _mock_client
+
+from beanie import init_beanie  # noqa: E402
+
+from backend.config import MONGO_DB, client, db as app_db  # noqa: E402
+from backend.models import DOCUMENT_MODELS  # noqa: E402
+
+
+async def reset_database():
+    await client.drop_database(MONGO_DB)
+    await init_beanie(database=app_db, document_models=DOCUMENT_MODELS)
+
+
+@pytest.fixture
+def db():
+    """An empty database with every Beanie document initialized."""
+    asyncio.run(reset_database())
+    return app_db
+
+
+@pytest.fixture
+def round_trips(monkeypatch):
+    """Count calls per (collection, method), each yielding like a network round trip.
+
+    mongomock answers synchronously, so without the yield asyncio.gather would
+    run "concurrent" requests one after the other. Usage:
+    ``calls = round_trips(Swipe.get_motor_collection(), "update_one", "find_one")``
+    """
+    calls = Counter()
+
+    def patch(collection, *methods):
+        for method in methods:
+            original = getattr(collection, method)
+
+            async def call(*args, _original=original, _method=method, **kwargs):
+                calls[(collection.name, _method)] += 1
+                await asyncio.sleep(0)
+                result = await _original(*args, **kwargs)
+                await asyncio.sleep(0)
+                return result
+
+            monkeypatch.setattr(collection, method, call)
+        return calls
+
+    return patch
+
+
+class ChangeStreams:
+    """Change streams over mongomock, which has none: the replica-set stand-in.
+
+    Every insert is BSON round-tripped as it would be on the wire, then
+    handed to each open ``watch`` whose ``$match`` accepts the change.
+    """
+
+    def __init__(self, collection, monkeypatch):
+        self.streams: List[Tuple[dict, asyncio.Queue]] = []
+        self.inserted = []
+        insert_one = collection.insert_one
+
+        async def insert_and_notify(document, *args, **kwargs):
+            result = await insert_one(document, *args, **kwargs)
+            change = {"_id": {"_data": str(result.inserted_id)}, "operationType": "insert",
+                      "fullDocument": bson.decode(bson.encode(document))}
+            self.inserted.append(change["fullDocument"])
+            for match, queue in self.streams:
+                if filter_applies(match, change):
+                    queue.put_nowait(change)
+            return result
+
+        monkeypatch.setattr(collection, "insert_one", insert_and_notify)
+        monkeypatch.setattr(collection, "watch", self.watch)
+
+    @contextlib.asynccontextmanager
+    async def watch(self, pipeline, resume_after=None):
+        [stage] = pipeline
+        stream = _ChangeStream()
+        entry = (stage["$match"], stream.queue)
+        self.streams.append(entry)
+        try:
+            yield stream
+        finally:
+            self.streams.remove(entry)
+
+
+class _ChangeStream:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.resume_token = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        change = await self.queue.get()
+        self.resume_token = change["_id"]
+        return change
+
+
+@pytest.fixture
+def change_streams(monkeypatch):
+    """Give a mongomock collection change streams. Usage:
+    ``streams = change_streams(StudyRoomEvent.get_motor_collection())``
+    """
+    return lambda collection: ChangeStreams(collection, monkeypatch)
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from backend.models import StudyRoomEvent
+from backend.services.chat_hub import ChatHub
+from backend.services.room_backplane import MongoBackplane
+
+TICK = 0.01
+
+
+class FakeConnection:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, text):
+        self.frames.append(json.loads(text))
+        return True
+
+
+def test_typing_is_only_published_for_users_connected_to_another_worker(db, change_streams):
+    streams = change_streams(StudyRoomEvent.get_motor_collection())
+    typing = {"type": "typing", "match_id": "m1", "user_id": "ann", "is_typing": True}
+
+    def published(kind):
+        return [doc for doc in streams.inserted if doc["event"]["type"] == kind]
+
+    async def scenario():
+        one = ChatHub(MongoBackplane(channel="chat"), presence_tick=TICK)
+        two = ChatHub(MongoBackplane(channel="chat"), presence_tick=TICK)
+        await one.start()
+        await two.start()
+        await asyncio.sleep(5 * TICK)
+
+        # bob has no socket anywhere: keystrokes cost no inserts, messages still go out
+        for _ in range(10):
+            await one.push(["bob"], typing, ephemeral=True)
+        await one.push(["bob"], {"type": "message", "content": "hi"})
+        assert published("typing") == [] and len(published("message")) == 1
+
+        # bob connects to the other worker
+        bob = FakeConnection()
+        two.register("bob", bob)
+        await asyncio.sleep(5 * TICK)
+        assert one.online_elsewhere("bob")
+        await one.push(["bob"], typing, ephemeral=True)
+        await asyncio.sleep(5 * TICK)
+        assert len(published("typing")) == 1
+        assert bob.frames[-1] == typing
+
+        # ...and leaves again
+        two.unregister("bob", bob)
+        await asyncio.sleep(5 * TICK)
+        assert not one.online_elsewhere("bob")
+        await one.push(["bob"], typing, ephemeral=True)
+        assert len(published("typing")) == 1
+
+        await one.stop()
+        await two.stop()
+
+    asyncio.run(scenario())
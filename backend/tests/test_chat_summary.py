@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.models import Chat, Match, Message
+from backend.services.chat_summary import backfill_missing_chats, record_message
+
+
+def test_backfill_creates_summaries_only_for_matches_without_one(db):
+    at = datetime(2024, 5, 1, 12, 0)
+
+    async def scenario():
+        legacy = await Match.get_motor_collection().insert_one({"user1_id": "a", "user2_id": "b", "matched_at": at, "pair_key": "a:b"})
+        current = await Match.get_motor_collection().insert_one({"user1_id": "a", "user2_id": "c", "matched_at": at, "pair_key": "a:c"})
+        legacy_id, current_id = str(legacy.inserted_id), str(current.inserted_id)
+        await Message.get_motor_collection().insert_many([
+            {"match_id": legacy_id, "sender_id": "b", "receiver_id": "a", "content": "hi", "sent_at": at, "is_read": False},
+            {"match_id": legacy_id, "sender_id": "b", "receiver_id": "a", "content": "there?", "sent_at": at + timedelta(minutes=1), "is_read": False},
+            {"match_id": current_id, "sender_id": "c", "receiver_id": "a", "content": "yo", "sent_at": at, "is_read": False},
+        ])
+        await Chat.get_motor_collection().insert_one({
+            "match_id": current_id, "participants": ["a", "c"], "last_message": "kept", "unread_counts": {"a": 9}, "is_active": True,
+        })
+
+        written = await backfill_missing_chats(batch_size=1)
+        again = await backfill_missing_chats()
+        return written, again, legacy_id, current_id
+
+    written, again, legacy_id, current_id = asyncio.run(scenario())
+
+    assert (written, again) == (1, 0)
+    legacy_chat = asyncio.run(Chat.get_motor_collection().find_one({"match_id": legacy_id}))
+    assert legacy_chat["last_message"] == "there?"
+    assert legacy_chat["unread_counts"] == {"a": 2, "b": 0}
+    assert legacy_chat["created_at"] == at
+    current_chat = asyncio.run(Chat.get_motor_collection().find_one({"match_id": current_id}))
+    assert current_chat["last_message"] == "kept"
+
+
+def test_an_older_message_recorded_late_does_not_replace_the_last_message(db):
+    at = datetime(2024, 5, 1, 12, 0)
+    match = Match(user1_id="a", user2_id="b", matched_at=at, pair_key="a:b")
+
+    def message(content, minutes):
+        return Message(match_id="m1", sender_id="a", receiver_id="b", content=content, sent_at=at + timedelta(minutes=minutes))
+
+    async def scenario():
+        # Two racing sends: the newer one is recorded first, creating the chat
+        await record_message(match, message("second", 2))
+        await record_message(match, message("first", 1))
+        await record_message(match, message("third", 3))
+        await record_message(match, message("late", 0))
+        return await Chat.get_motor_collection().find_one({"match_id": "m1"})
+
+    chat = asyncio.run(scenario())
+    assert (chat["last_message"], chat["last_message_at"]) == ("third", at + timedelta(minutes=3))
+    assert chat["unread_counts"] == {"b": 4}
@@ -0,0 +1,83 @@
+import asyncio
+import sys
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models import User
+from backend.routers.users import backfill_email_keys, signup
+from backend.schemas import UserCreate
+from backend.services.matching import profile_index
+
+
+def test_startup_runs_against_the_initialized_documents(db):
+    # A legacy match without a pair_key: the startup backfill has to reach it
+    asyncio.run(db.matches.insert_one({"user1_id": "a", "user2_id": "b"}))
+    asyncio.run(db.users.insert_one({"username": "ann", "email": "ann@example.com", "password": "x", "subjects": ["math"]}))
+
+    with TestClient(app) as client:
+        assert client.get("/debug/studyrooms").status_code == 200
+
+    assert asyncio.run(db.matches.find_one({}))["pair_key"] == "a:b"
+    assert profile_index.ready and len(profile_index) == 1
+
+
+def test_startup_drops_repeated_swipes_before_the_unique_index(db):
+    async def legacy_swipes():
+        # Check-then-insert let these in before the constraint existed
+        await db.swipes.drop_indexes()
+        first = await db.swipes.insert_one({"swiper_id": "a", "swipee_id": "b", "direction": "right"})
+        await db.swipes.insert_many([
+            {"swiper_id": "a", "swipee_id": "b", "direction": "left"},
+            {"swiper_id": "b", "swipee_id": "a", "direction": "right"},
+        ])
+        return first.inserted_id
+
+    first = asyncio.run(legacy_swipes())
+
+    with TestClient(app) as client:
+        assert client.get("/debug/studyrooms").status_code == 200
+
+    assert [s["_id"] for s in asyncio.run(db.swipes.find({"swiper_id": "a"}).to_list(None))] == [first]
+    assert asyncio.run(db.swipes.count_documents({})) == 2
+
+
+def test_email_key_backfill_leaves_later_duplicates_out(db):
+    async def scenario():
+        # mongomock's create_indexes drops partialFilterExpression: rebuild the
+        # users indexes from their definitions with create_index
+        await db.users.drop_indexes()
+        for index in User.Settings.indexes:
+            options = {k: v for k, v in index.document.items() if k not in ("key", "name")}
+            await db.users.create_index(list(index.document["key"].items()), **options)
+        oldest = await db.users.insert_one({"username": "ann", "email": "ann@example.com", "password": "x"})
+        await db.users.insert_one({"username": "ann2", "email": "ann@example.com", "password": "x"})
+        await db.users.insert_one({"username": "bob", "email": "bob@example.com", "password": "x"})
+        updated = await backfill_email_keys()
+        again = await backfill_email_keys()
+        keyed = await db.users.find({"email_key": "ann@example.com"}).to_list(None)
+        return oldest.inserted_id, updated, again, keyed
+
+    oldest, updated, again, keyed = asyncio.run(scenario())
+
+    assert updated == 2 and again == 0
+    assert [u["_id"] for u in keyed] == [oldest]
+
+
+def test_concurrent_signups_with_one_email_get_a_400(db):
+    async def race():
+        # Password hashing yields, so both pass the existing-email check first
+        user = UserCreate(username="ann", email="ann@example.com", password="secret1")
+        return await asyncio.gather(signup(user), signup(user), return_exceptions=True)
+
+    results = asyncio.run(race())
+
+    assert sum(isinstance(r, HTTPException) and r.status_code == 400 for r in results) == 1
+    assert asyncio.run(db.users.count_documents({"email": "ann@example.com"})) == 1
+
+
+def test_modules_are_imported_under_one_root():
+    # A bare `models`/`services.*` import would be a second, uninitialized copy
+    bare = [name for name in sys.modules if name.split(".")[0] in ("models", "config", "routers", "services", "schemas")]
+    assert bare == []
@@ -0,0 +1,63 @@
+import asyncio
+
+from backend.models import Match, Swipe
+from backend.services.matching import record_swipe, record_swipes
+
+PAIRS = 500  # 1000 simultaneous swipes
+
+
+def test_simultaneous_mutual_swipes_create_exactly_one_match(db, round_trips):
+    calls = round_trips(Swipe.get_motor_collection(), "update_one", "find_one")
+    round_trips(Match.get_motor_collection(), "update_one")
+    pairs = [(f"a{i}", f"b{i}") for i in range(PAIRS)]
+
+    async def swipe_all():
+        return await asyncio.gather(*(
+            record_swipe(swiper, swipee, "right")
+            for a, b in pairs
+            for swiper, swipee in ((a, b), (b, a))
+        ))
+
+    results = asyncio.run(swipe_all())
+
+    assert all(r.created and r.is_match for r in results)
+    assert sum(r.new_match is not None for r in results) == PAIRS
+    assert asyncio.run(Match.get_motor_collection().count_documents({})) == PAIRS
+    for a, b in pairs[:10]:
+        assert asyncio.run(Match.get_motor_collection().count_documents({"pair_key": f"{a}:{b}"})) == 1
+    # Swipe upsert + reciprocal lookup + match upsert, instead of five round trips
+    assert sum(calls.values()) / len(results) <= 3
+
+
+def test_match_upsert_race_loses_gracefully(db, round_trips):
+    round_trips(Match.get_motor_collection(), "update_one")
+    asyncio.run(record_swipe("a", "b", "right"))
+
+    async def race():
+        # Both reciprocal swipes of b -> a, e.g. a double-submitted request
+        return await asyncio.gather(record_swipe("b", "a", "right"), record_swipe("b", "a", "right"))
+
+    first, second = asyncio.run(race())
+    assert [first.created, second.created].count(True) == 1
+    assert asyncio.run(Match.get_motor_collection().count_documents({})) == 1
+
+
+def test_reswipe_is_idempotent(db):
+    first = asyncio.run(record_swipe("a", "b", "left"))
+    again = asyncio.run(record_swipe("a", "b", "right"))
+
+    assert first.created and not again.created and not again.is_match
+    swipes = asyncio.run(Swipe.get_motor_collection().find({}).to_list(None))
+    assert [(s["swiper_id"], s["direction"]) for s in swipes] == [("a", "left")]
+
+
+def test_replayed_mutual_swipe_does_not_create_a_second_match(db):
+    asyncio.run(record_swipe("a", "b", "right"))
+    matched = asyncio.run(record_swipe("b", "a", "right"))
+    replay = asyncio.run(record_swipe("b", "a", "right"))
+    batch = asyncio.run(record_swipes("b", [("a", "right"), ("a", "right")]))
+
+    assert matched.new_match is not None
+    assert not replay.created and replay.new_match is None
+    assert [r.created for r in batch] == [False, False]
+    assert asyncio.run(Match.get_motor_collection().count_documents({})) == 1
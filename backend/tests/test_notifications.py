@@ -0,0 +1,28 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.models import NOTIFICATION_TTL_SECONDS, Notification
+from backend.services import notifications
+
+
+def test_mark_read_starts_the_expiry_clock(db):
+    async def scenario():
+        await notifications.create_notification("ann", "system", "Welcome", "hi")
+        await notifications.create_notification("ann", "system", "Tip", "hello")
+        # Created long before it is read: must not expire as soon as it is read
+        long_ago = datetime.utcnow() - timedelta(days=90)
+        await db.notifications.update_one({"title": "Welcome"}, {"$set": {"created_at": long_ago}})
+
+        unread = await db.notifications.find({}).to_list(None)
+        result = await notifications.mark_read("ann")
+        return unread, result, await db.notifications.find({}).to_list(None)
+
+    unread, result, read = asyncio.run(scenario())
+    assert all(doc.get("read_at") is None for doc in unread)
+    assert result == (2, 0)
+    assert all(doc["read"] and datetime.utcnow() - doc["read_at"] < timedelta(minutes=1) for doc in read)
+
+    [ttl] = [index.document for index in Notification.Settings.indexes if "expireAfterSeconds" in index.document]
+    assert dict(ttl["key"]) == {"read_at": 1}
+    assert ttl["expireAfterSeconds"] == NOTIFICATION_TTL_SECONDS and "partialFilterExpression" not in ttl
+
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from mongomock.filtering import filter_applies
+
+from backend.main import app
+from backend.models import Match, Message, User
+from backend.routers.users import create_access_token
+from backend.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+SENT_AT = datetime(2024, 5, 1, 12, 30, 15, 123000)
+
+
+def test_cursor_round_trip():
+    doc_id = ObjectId()
+    token = encode_cursor(SENT_AT, doc_id)
+
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert decode_cursor(token) == (SENT_AT, doc_id)
+
+
+@pytest.mark.parametrize("token", ["", "not a cursor", encode_cursor(SENT_AT, ObjectId())[:-4], "Zm9vfGJhcg"])
+def test_decode_cursor_rejects_garbage(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_keyset_filter_breaks_timestamp_ties_on_id():
+    ids = sorted(ObjectId() for _ in range(3))
+    docs = [{"_id": doc_id, "sent_at": SENT_AT} for doc_id in ids]
+    older = {"_id": ObjectId(), "sent_at": datetime(2024, 5, 1)}
+
+    after = keyset_filter("sent_at", SENT_AT, ids[1], after=True)
+    before = keyset_filter("sent_at", SENT_AT, ids[1], after=False)
+
+    assert [d["_id"] for d in docs if filter_applies(after, d)] == [ids[2]]
+    assert [d["_id"] for d in docs if filter_applies(before, d)] == [ids[0]]
+    assert filter_applies(before, older) and not filter_applies(after, older)
+
+
+async def _seed_chat(count):
+    ann = await User(username="ann", email="ann@example.com", password="x").insert()
+    bob = await User(username="bob", email="bob@example.com", password="x").insert()
+    match = await Match(
+        user1_id=str(ann.id), user2_id=str(bob.id), matched_at=SENT_AT, pair_key=f"{ann.id}:{bob.id}"
+    ).insert()
+    for i in range(count):
+        await _send(match, ann, bob, f"m{i}")
+    return match, ann, bob
+
+
+async def _send(match, sender, receiver, content):
+    # Every message shares one timestamp: only the _id tie-break orders them
+    await Message(
+        match_id=str(match.id), sender_id=str(sender.id), receiver_id=str(receiver.id),
+        content=content, sent_at=SENT_AT,
+    ).insert()
+
+
+def test_message_pages_survive_identical_timestamps_and_inserts(db):
+    match, ann, bob = asyncio.run(_seed_chat(25))
+    token = create_access_token({"sub": str(bob.id), "email": bob.email})
+    url = f"/messages/chat/{match.id}"
+
+    with TestClient(app, headers={"Authorization": f"Bearer {token}"}) as client:
+        latest = client.get(url, params={"limit": 10})
+        assert latest.status_code == 200
+        pages = [latest.json()]
+        newest_cursor = latest.headers["X-After-Cursor"]
+
+        # A message arrives while the user scrolls back through history
+        asyncio.run(_send(match, ann, bob, "late"))
+
+        response = latest
+        while response.headers["X-Has-More"] == "true":
+            response = client.get(url, params={"limit": 10, "before": response.headers["X-Before-Cursor"]})
+            assert response.status_code == 200
+            pages.insert(0, response.json())
+
+        history = [m["content"] for page in pages for m in page]
+        assert history == [f"m{i}" for i in range(25)]
+
+        newer = client.get(url, params={"limit": 10, "after": newest_cursor})
+        assert [m["content"] for m in newer.json()] == ["late"]
+        assert newer.headers["X-Has-More"] == "false"
+
+        assert client.get(url, params={"before": "garbage"}).status_code == 400
+
+
+def test_timezone_aware_read_watermark_is_compared_as_utc(db):
+    match, ann, bob = asyncio.run(_seed_chat(3))
+    token = create_access_token({"sub": str(bob.id), "email": bob.email})
+    url = f"/messages/chat/{match.id}"
+
+    with TestClient(app, headers={"Authorization": f"Bearer {token}"}) as client:
+        # What a browser sends via toISOString(): one second before the messages
+        early = client.get(url, params={"read_up_to": "2024-05-01T12:30:14.123Z"})
+        assert early.status_code == 200
+        assert [m["is_read"] for m in early.json()] == [False] * 3
+
+        # The same instant as sent_at, written in another offset
+        on_time = client.get(url, params={"read_up_to": "2024-05-01T14:30:15.123+02:00"})
+        assert on_time.status_code == 200
+        assert [m["is_read"] for m in on_time.json()] == [True] * 3
@@ -0,0 +1,37 @@
+from backend.services.pomodoro import PHASE_SECONDS, PomodoroTimer
+
+FOCUS, BREAK = PHASE_SECONDS["focus"], PHASE_SECONDS["break"]
+
+
+def test_transitions_report_whether_anything_changed():
+    timer = PomodoroTimer()
+    assert timer.start(100) and not timer.start(101)
+    assert timer.remaining(160) == FOCUS - 60
+
+    assert timer.pause(160) and not timer.pause(170)
+    assert timer.remaining(10_000) == FOCUS - 60  # frozen while paused
+
+    assert timer.start(200)  # resumes where it paused
+    assert timer.ends_at == 200 + FOCUS - 60
+
+    assert timer.reset(210) and not timer.reset(220)
+    assert (timer.phase, timer.running, timer.remaining(230)) == ("focus", False, FOCUS)
+
+
+def test_phase_end_and_skip():
+    timer = PomodoroTimer(started_at=0)
+    timer.advance(timer.ends_at)
+    assert (timer.phase, timer.started_at, timer.remaining(FOCUS + 10)) == ("break", FOCUS, BREAK - 10)
+
+    paused = PomodoroTimer()
+    assert paused.skip(50)
+    assert (paused.phase, paused.running, paused.remaining(60)) == ("break", False, BREAK)
+
+
+def test_round_trips_through_the_broadcast_payload():
+    timer = PomodoroTimer(started_at=100)
+    data = timer.to_dict(now=160)
+    assert (data["running"], data["remaining"], data["server_time"]) == (True, FOCUS - 60, 160)
+
+    copy = PomodoroTimer.from_dict(data)
+    assert (copy.phase, copy.started_at, copy.duration, copy.paused_remaining) == ("focus", 100, FOCUS, None)
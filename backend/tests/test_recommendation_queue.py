@@ -0,0 +1,75 @@
+import asyncio
+
+from bson import ObjectId
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models import RecommendationQueue, User
+from backend.services import matching, recommendation_queue
+
+
+def _add_users(db, *profiles):
+    asyncio.run(db.users.insert_many([
+        {"username": name, "email": f"{name}@example.com", "email_key": f"{name}@example.com", "password": "x", "subjects": subjects}
+        for name, subjects in profiles
+    ]))
+
+
+def test_refill_ranks_from_the_index_built_at_startup(db, monkeypatch):
+    _add_users(db, ("ann", ["Math", "Physics"]), ("bob", ["math"]), ("cy", ["physics", "math"]), ("dee", ["art"]))
+    with TestClient(app):
+        pass  # startup rebuilds matching.profile_index
+
+    def no_pipeline(*args, **kwargs):
+        raise AssertionError("fell back to the aggregation pipeline")
+
+    monkeypatch.setattr(matching, "build_recommendation_pipeline", no_pipeline)
+    monkeypatch.setattr(recommendation_queue, "RECOMMENDATION_QUEUE_SIZE", 2)
+
+    async def refill():
+        ann = await User.find_one(User.username == "ann")
+        return await recommendation_queue.refill_queue(ann)
+
+    queue = asyncio.run(refill())
+
+    assert recommendation_queue.recommend_users is matching.recommend_users
+    assert [(c["username"], c["compatibility_score"]) for c in queue["candidates"]] == [("cy", 4), ("bob", 2)]
+
+
+def test_signup_reopens_only_exhausted_queues(db):
+    asyncio.run(db.recommendation_queues.insert_many([
+        {"user_id": "full", "size": 100, "exhausted": False, "stale": False},
+        {"user_id": "done", "size": 3, "exhausted": True, "stale": False},
+        {"user_id": "again", "size": 3, "exhausted": True, "stale": True},
+    ]))
+    asyncio.run(recommendation_queue.invalidate_exhausted())
+
+    queues = asyncio.run(db.recommendation_queues.find({}, {"_id": 0, "user_id": 1, "stale": 1}).to_list(None))
+    assert {q["user_id"]: q["stale"] for q in queues} == {"full": False, "done": True, "again": True}
+
+    # mongomock drops partial filters, so check the declared index instead
+    assert any(
+        index.document["key"] == {"exhausted": 1, "stale": 1}
+        and index.document["partialFilterExpression"] == {"exhausted": True}
+        for index in RecommendationQueue.Settings.indexes
+    )
+
+
+def test_swipe_during_a_refill_does_not_bring_the_user_back(db, monkeypatch):
+    user = User(id=ObjectId(), username="ann", email="ann@example.com", password="x")
+    user_id = str(user.id)
+
+    async def ranking_while_swiping(user, limit):
+        # The swipe request lands while the candidates are being computed
+        await matching.record_swipe(user_id, "bob", "left")
+        await recommendation_queue.remove_candidate(user_id, "bob")
+        return [{"id": "bob", "compatibility_score": 3}, {"id": "cy", "compatibility_score": 2}]
+
+    monkeypatch.setattr(recommendation_queue, "recommend_users", ranking_while_swiping)
+
+    queue = asyncio.run(recommendation_queue.refill_queue(user))
+
+    stored = asyncio.run(db.recommendation_queues.find_one({"user_id": user_id}))
+    assert [c["id"] for c in queue["candidates"]] == [c["id"] for c in stored["candidates"]] == ["cy"]
+    assert stored["size"] == 1
@@ -0,0 +1,62 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models import Match, User, match_pair_key
+from backend.routers.users import create_access_token
+from backend.services import response_cache
+
+
+async def _seed():
+    ann = await User(username="ann", email="ann@example.com", password="x", bio="old").insert()
+    bob = await User(username="bob", email="bob@example.com", password="x").insert()
+    match = await Match(user1_id=str(ann.id), user2_id=str(bob.id), pair_key=match_pair_key(str(ann.id), str(bob.id))).insert()
+    return ann, str(match.id)
+
+
+def test_revalidation_is_answered_without_reading_mongo(db, round_trips):
+    ann, _ = asyncio.run(_seed())
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ann.id)})}"}
+
+    with TestClient(app, headers=headers) as client:
+        etag = client.get("/users/profile").headers["ETag"]
+        calls = round_trips(User.get_motor_collection(), "find_one", "find")
+        assert client.get("/users/profile", headers={"If-None-Match": etag}).status_code == 304
+        assert sum(calls.values()) == 0
+
+        # A write on this worker is seen at once
+        assert client.post("/users/profile", json={"bio": "new"}).status_code == 200
+        assert client.get("/users/profile", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_etag_follows_a_bump_made_by_another_worker(db):
+    ann, _ = asyncio.run(_seed())
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ann.id)})}"}
+
+    with TestClient(app, headers=headers) as client:
+        first = client.get("/users/profile")
+        etag = first.headers["ETag"]
+        assert first.json()["bio"] == "old"
+        assert client.get("/users/profile", headers={"If-None-Match": etag}).status_code == 304
+
+        # Another worker saves the profile: this worker's auth cache still holds the old User
+        asyncio.run(db.users.update_one({"_id": ann.id}, {"$set": {"bio": "new"}, "$inc": {"profile_version": 1}}))
+        # ...and its version counters, until they expire
+        assert client.get("/users/profile", headers={"If-None-Match": etag}).status_code == 304
+        response_cache._versions.clear()
+
+        fresh = client.get("/users/profile", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.headers["ETag"] != etag and fresh.json()["bio"] == "new"
+
+
+def test_sending_a_message_keeps_match_lists_cached(db):
+    ann, match_id = asyncio.run(_seed())
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ann.id)})}"}
+
+    with TestClient(app, headers=headers) as client:
+        etags = {url: client.get(url).headers["ETag"] for url in ("/users/matches", "/matches/users/matches")}
+        assert client.post("/messages/send", json={"match_id": match_id, "content": "hi"}).status_code == 200
+        for url, etag in etags.items():
+            assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
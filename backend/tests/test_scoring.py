@@ -0,0 +1,46 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend.services.matching import SCORE_WEIGHTS, compatibility_score
+from backend.services.scoring import FeatureMatrix
+
+TERMS = ["Math", "math ", "Physics", " physics", "art", "Mon AM", "mon am", "chess"]
+
+
+def _profiles(count, seed=3):
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        profile = {field: rng.sample(TERMS, rng.randint(0, 4)) for field in SCORE_WEIGHTS}
+        if rng.random() < 0.2:
+            profile.pop("interests")  # missing fields score as empty lists
+        profiles.append(profile)
+    return profiles
+
+
+def test_score_one_and_all_pairs_match_compatibility_score():
+    profiles = _profiles(60)
+    users = [SimpleNamespace(**p) for p in profiles]
+    matrix = FeatureMatrix([str(i) for i in range(len(profiles))], profiles)
+
+    expected = np.array([[compatibility_score(a, b) for b in users] for a in users])
+
+    for i, profile in enumerate(profiles):
+        assert matrix.score_one(profile).tolist() == expected[i].tolist()
+
+    blocks = dict(matrix.all_pairs(chunk_size=16))
+    assert sorted(blocks) == [0, 16, 32, 48]
+    assert np.vstack([blocks[start] for start in sorted(blocks)]).tolist() == expected.tolist()
+
+
+def test_rank_matches_the_full_scan_order():
+    profiles = _profiles(40, seed=11)
+    users = [SimpleNamespace(**p) for p in profiles]
+    matrix = FeatureMatrix([str(i) for i in range(len(profiles))], profiles)
+
+    scored = [(str(i), compatibility_score(users[0], u)) for i, u in enumerate(users) if i != 0]
+    expected = sorted([t for t in scored if t[1] > 0], key=lambda t: (-t[1], t[0]))
+    assert matrix.rank(profiles[0], exclude_id="0") == expected
+    assert matrix.rank(profiles[0], exclude_id="0", limit=5) == expected[:5]
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import pytest
+from beanie import init_beanie
+from pymongo.errors import AutoReconnect
+
+from backend.models import StudyRoomEvent, StudyRoomMessage
+from backend.routers.studyroom import RoomManager
+from backend.services.pomodoro import PHASE_SECONDS, PomodoroTimer
+from backend.services.room_backplane import Backplane, InMemoryBackplane, MongoBackplane
+from backend.services.room_history import RoomHistoryWriter
+from backend.tests.conftest import REAL_MOTOR_CLIENT, reset_database
+
+# A real replica set (change streams) for the Mongo backplane test, e.g. a
+# local single-node `mongod --replSet rs0`
+REPLICA_SET_URI = os.getenv("TEST_REPLICA_SET_URI")
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+    def of_type(self, kind):
+        return [frame for frame in self.frames if frame["type"] == kind]
+
+
+async def _settle():
+    await asyncio.sleep(0.01)  # let the per-socket sender tasks drain
+
+
+def test_backplane_is_abstract():
+    assert Backplane.__abstractmethods__ == {"publish"}
+
+
+async def _two_workers_share_a_room(one: RoomManager, two: RoomManager, settle: float = 0.01):
+    async def settled():
+        await asyncio.sleep(settle)
+
+    await one.start()
+    await two.start()
+    await settled()  # a Mongo backplane's change stream opens in the background
+
+    ann_ws, bob_ws = FakeWebSocket(), FakeWebSocket()
+    ann = await one.connect("room", "ann", ann_ws)
+    bob = await two.connect("room", "bob", bob_ws)
+    await settled()
+
+    # Joins: both workers list both users, with the earliest joiner as owner
+    for ws in (ann_ws, bob_ws):
+        assert ws.of_type("user_list")[-1] == {"type": "user_list", "users": ["ann", "bob"], "owner": "ann"}
+
+    # Chat from either worker reaches the other one and its history
+    await two.broadcast_chat("room", "bob", "hi from two")
+    await settled()
+    await one.broadcast_chat("room", "ann", "hi from one")
+    await settled()
+    for ws, manager in ((ann_ws, one), (bob_ws, two)):
+        assert [m["message"] for m in ws.of_type("chat_message")] == ["hi from two", "hi from one"]
+        assert [m["message"] for m in manager.room_messages["room"].messages] == ["hi from two", "hi from one"]
+
+    # Timer: the owner's worker starts it, the other worker follows
+    await one.timer_command("room", "start")
+    await settled()
+    assert bob_ws.of_type("timer_update")[-1]["data"]["running"] is True
+    assert two.room_timers["room"].running
+    assert two.room_timers["room"].started_at == one.room_timers["room"].started_at
+    assert "room" in one._timer_tasks and "room" not in two._timer_tasks  # only the owner schedules
+
+    # Leaving is seen too
+    await one.disconnect("room", "ann", ann)
+    await settled()
+    assert bob_ws.of_type("user_list")[-1] == {"type": "user_list", "users": ["bob"], "owner": "bob"}
+    assert "room" in two._timer_tasks  # bob's worker took over the schedule
+
+    await two.disconnect("room", "bob", bob)
+    await one.stop()
+    await two.stop()
+
+
+def test_room_managers_sharing_a_backplane_see_each_other(db):
+    async def scenario():
+        peers = []
+        await _two_workers_share_a_room(
+            RoomManager(InMemoryBackplane(peers=peers)), RoomManager(InMemoryBackplane(peers=peers))
+        )
+        assert peers == []
+
+    asyncio.run(scenario())
+
+
+def test_mongo_backplanes_share_a_room_through_change_streams(db, change_streams):
+    streams = change_streams(StudyRoomEvent.get_motor_collection())
+
+    asyncio.run(_two_workers_share_a_room(RoomManager(MongoBackplane()), RoomManager(MongoBackplane())))
+
+    kinds = {doc["event"]["type"] for doc in streams.inserted}
+    assert kinds == {"sync_request", "state", "presence", "broadcast"}
+    assert streams.streams == []  # both watchers closed on stop
+
+
+@pytest.mark.skipif(not REPLICA_SET_URI, reason="set TEST_REPLICA_SET_URI, e.g. mongodb://localhost:27017/?replicaSet=rs0")
+def test_mongo_backplanes_share_a_room_on_a_replica_set(db):
+    async def scenario():
+        client = REAL_MOTOR_CLIENT(REPLICA_SET_URI)
+        database = client[f"synapso_test_{uuid.uuid4().hex[:8]}"]
+        await init_beanie(database=database, document_models=[StudyRoomEvent, StudyRoomMessage])
+        try:
+            await _two_workers_share_a_room(RoomManager(MongoBackplane()), RoomManager(MongoBackplane()), settle=0.5)
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+            await reset_database()
+
+    asyncio.run(scenario())
+
+
+def test_history_retry_skips_messages_that_were_already_written(db, monkeypatch):
+    collection = StudyRoomMessage.get_motor_collection()
+    insert_many = collection.insert_many
+
+    async def lost_ack(documents, **kwargs):
+        await insert_many(documents, **kwargs)
+        raise AutoReconnect("connection closed before the reply")
+
+    async def scenario():
+        writer = RoomHistoryWriter(flush_interval=60)
+        for seq in (1, 2):
+            writer.enqueue("room", {"seq": seq, "username": "ann", "message": f"m{seq}", "timestamp": "t"})
+        monkeypatch.setattr(collection, "insert_many", lost_ack)
+        assert await writer.flush() == 0  # written, but we could not tell
+
+        monkeypatch.setattr(collection, "insert_many", insert_many)
+        writer.enqueue("room", {"seq": 3, "username": "ann", "message": "m3", "timestamp": "t"})
+        assert await writer.flush() == 3
+        assert await writer.flush() == 0  # nothing requeued
+        return await collection.find({}, {"_id": 0, "seq": 1}).sort("seq", 1).to_list(None)
+
+    assert asyncio.run(scenario()) == [{"seq": 1}, {"seq": 2}, {"seq": 3}]
+
+
+def test_pending_history_is_persisted_before_an_empty_room_is_forgotten(db):
+    async def scenario():
+        manager = RoomManager(InMemoryBackplane())
+        manager.history_writer.flush_interval = 60
+        await manager.start()
+        ws = FakeWebSocket()
+        conn = await manager.connect("room", "ann", ws)
+        await manager.broadcast_chat("room", "ann", "still here?")
+        await manager.disconnect("room", "ann", conn)
+        assert "room" not in manager.room_messages
+
+        again = FakeWebSocket()
+        conn = await manager.connect("room", "ann", again)
+        await _settle()
+        await manager.disconnect("room", "ann", conn)
+        await manager.stop()
+        return again.of_type("chat_history")[-1]["messages"]
+
+    assert [m["message"] for m in asyncio.run(scenario())] == ["still here?"]
+
+
+def test_timer_broadcasts_once_per_transition_and_never_per_tick(db):
+    async def scenario():
+        manager = RoomManager(InMemoryBackplane())
+        await manager.start()
+        ws = FakeWebSocket()
+        conn = await manager.connect("room", "ann", ws)
+
+        async def updates(step):
+            before = len(ws.of_type("timer_update"))
+            await step()
+            await _settle()
+            return ws.of_type("timer_update")[before:]
+
+        assert len(await updates(lambda: manager.timer_command("room", "start"))) == 1
+        assert await updates(lambda: manager.timer_command("room", "start")) == []
+        assert await updates(lambda: asyncio.sleep(0.05)) == []  # running: no ticks
+
+        # Older clients: every-second pushes while running, and a pause at zero
+        legacy = manager.legacy_timer_update
+        assert await updates(lambda: legacy("room", {"running": True, "remaining": 1499})) == []
+        assert await updates(lambda: legacy("room", {"running": False, "remaining": 0})) == []
+        assert manager.room_timers["room"].running
+
+        [brk] = await updates(lambda: legacy("room", {"running": False, "remaining": PHASE_SECONDS["break"]}))
+        assert (brk["data"]["phase"], brk["data"]["running"], brk["data"]["remaining"]) == ("break", False, PHASE_SECONDS["break"])
+        assert await updates(lambda: legacy("room", {"running": False, "remaining": PHASE_SECONDS["break"]})) == []
+
+        [reset] = await updates(lambda: legacy("room", {"running": False, "remaining": PHASE_SECONDS["focus"]}))
+        assert (reset["data"]["phase"], reset["data"]["running"]) == ("focus", False)
+        assert await updates(lambda: manager.timer_command("room", "reset")) == []
+
+        # A phase ending on its own is one broadcast, from the server
+        manager.room_timers["room"] = PomodoroTimer(started_at=time.time() - PHASE_SECONDS["focus"] + 0.05)
+        manager._schedule_timer("room")
+        [ended] = await updates(lambda: asyncio.sleep(0.2))
+        assert (ended["data"]["phase"], ended["data"]["running"]) == ("break", True)
+
+        await manager.disconnect("room", "ann", conn)
+        await manager.stop()
+
+    asyncio.run(scenario())
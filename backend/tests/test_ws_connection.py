@@ -0,0 +1,51 @@
+import asyncio
+
+from backend.services.ws_connection import QueuedWebSocket
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        await asyncio.sleep(0)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        pass
+
+
+def test_sender_stops_once_closed_even_if_the_cancel_was_lost():
+    async def scenario():
+        ws = RecordingSocket()
+        conn = QueuedWebSocket(ws, maxsize=4, timeout=1)
+        assert conn.send("a")
+        await asyncio.sleep(0)
+        # What aclose() leaves behind when wait_for swallows its cancel
+        conn.closed = True
+        await asyncio.wait_for(conn._sender, 1)
+        assert ws.sent == ["a"]
+        assert not conn.send("b")
+
+    asyncio.run(scenario())
+
+
+def test_slow_socket_is_dropped_without_delaying_the_others():
+    async def scenario():
+        class Stalled(RecordingSocket):
+            async def send_text(self, text):
+                await asyncio.sleep(10)
+
+        fast, stalled = RecordingSocket(), Stalled()
+        dropped = []
+        conns = [QueuedWebSocket(ws, maxsize=4, timeout=0.05, on_close=dropped.append) for ws in (stalled, fast)]
+        for i in range(3):
+            for conn in conns:
+                conn.send(str(i))
+        await asyncio.sleep(0.1)
+
+        assert fast.sent == ["0", "1", "2"]
+        assert dropped == [conns[0]] and conns[0].close_reason == "send timeout"
+        await conns[1].aclose()
+
+    asyncio.run(scenario())
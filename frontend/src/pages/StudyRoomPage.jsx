@@ -47,7 +47,9 @@ function StudyRoomPage() {
   const peerConnections = useRef({});
   
   // Timer/chat state (unchanged)
-  const [timer, setTimer] = useState({ running: false, remaining: 1500, start_time: null });
+  // Server-owned timer: it broadcasts only transitions, we count down locally
+  const [timer, setTimer] = useState({ phase: "focus", running: false, started_at: null, duration: 1500, paused_remaining: null });
+  const clockOffset = useRef(0); // server clock - our clock, in seconds
   const [timeLeft, setTimeLeft] = useState(1500);
   const intervalRef = useRef();
   const [messages, setMessages] = useState([]);
@@ -123,8 +125,8 @@ function StudyRoomPage() {
     
     // Rest unchanged...
     if (msg.type === "timer_update") {
+      clockOffset.current = msg.data.server_time - Date.now() / 1000;
       setTimer(msg.data);
-      setTimeLeft(msg.data.remaining);
     }
     if (msg.type === "chat_message") {
       setMessages(prev => [...prev, { ...msg, timestamp: Date.now() }]);
@@ -203,7 +205,7 @@ function StudyRoomPage() {
   };
 
   // Timer/chat functions (unchanged)
-  const sendTimer = (newTimer) => ws?.readyState === WebSocket.OPEN && ws.send(JSON.stringify({ type: "timer_update", data: newTimer }));
+  const sendTimerCommand = (action) => ws?.readyState === WebSocket.OPEN && ws.send(JSON.stringify({ type: "timer_command", action }));
   const sendMessage = () => {
     if (messageInput.trim() && ws?.readyState === WebSocket.OPEN) {
       ws.send(JSON.stringify({ type: "chat_message", message: messageInput, username }));
@@ -211,8 +213,6 @@ function StudyRoomPage() {
     }
   };
   
-  const startTimer = () => sendTimer({ running: true, remaining: timeLeft, start_time: Date.now() });
-  const resetTimer = (sec = 1500) => sendTimer({ running: false, remaining: sec, start_time: null });
   const fmt = (n) => String(Math.floor(n / 60)).padStart(2, '0') + ':' + String(n % 60).padStart(2, '0');
   const isOwner = username === owner;
 
@@ -226,16 +226,17 @@ function StudyRoomPage() {
   // Timer effects (unchanged)
   useEffect(() => { chatEndRef.current?.scrollIntoView({ behavior: "smooth" }); }, [messages]);
   useEffect(() => {
-    if (timer.running) {
-      clearInterval(intervalRef.current);
-      intervalRef.current = setInterval(() => setTimeLeft(p => p > 0 ? p - 1 : 0), 1000);
-    } else {
-      clearInterval(intervalRef.current);
-      setTimeLeft(timer.remaining);
+    // No push at zero: the server starts the next phase and broadcasts it
+    const remaining = () => timer.started_at != null
+      ? Math.max(0, Math.ceil(timer.duration - (Date.now() / 1000 + clockOffset.current - timer.started_at)))
+      : Math.round(timer.paused_remaining ?? timer.duration);
+    clearInterval(intervalRef.current);
+    setTimeLeft(remaining());
+    if (timer.started_at != null) {
+      intervalRef.current = setInterval(() => setTimeLeft(remaining()), 1000);
     }
     return () => clearInterval(intervalRef.current);
-  }, [timer.running, timer.remaining]);
-  useEffect(() => { if (timer.running && timeLeft === 0) sendTimer({ ...timer, running: false, remaining: 0 }); }, [timeLeft]);
+  }, [timer]);
 
   return (
     <div style={{ minHeight: "100vh", background: "linear-gradient(135deg,#d9c096,#b59175 30%,#886355 70%,#3d302d 100%)" }}>
@@ -288,9 +289,9 @@ function StudyRoomPage() {
             <div style={{ fontFamily: "monospace", fontWeight: 800, fontSize: 80, color: "#886355", marginBottom: 24 }}>{fmt(timeLeft)}</div>
             {isOwner && (
               <div style={{ display: "flex", gap: 14, justifyContent: "center", flexWrap: "wrap" }}>
-                <button onClick={startTimer} style={timerBtnStyle}>Start</button>
-                <button onClick={() => resetTimer(1500)} style={timerBtnStyle}>Reset 25min</button>
-                <button onClick={() => resetTimer(300)} style={timerBtnStyle}>Break 5min</button>
+                <button onClick={() => sendTimerCommand(timer.running ? "pause" : "start")} style={timerBtnStyle}>{timer.running ? "Pause" : "Start"}</button>
+                <button onClick={() => sendTimerCommand("reset")} style={timerBtnStyle}>Reset 25min</button>
+                <button onClick={() => sendTimerCommand("skip")} style={timerBtnStyle}>{timer.phase === "break" ? "Skip break" : "Break 5min"}</button>
               </div>
             )}
             <button onClick={leaveRoom} style={{